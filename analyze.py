@@ -1,31 +1,21 @@
-import pandas as pd
+import os
+import sys
 
-# Load the CSV file
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backtesting"))
+from results_store import open_results_store
+
+# Load the results, a CSV results log is imported into the store on first use
 file_path = "finetune_results_2024-01-01.csv"
-df = pd.read_csv(file_path)
+store = open_results_store(file_path.replace(".csv", ".db"), file_path)
 
 # Define the number of top unique final values to analyze
 top_n = 3
 
-# Sort the dataframe by final_value in descending order
-sorted_df = df.sort_values(by="final_value", ascending=False)
-
-# Get the top N unique final values
-top_n_final_values = sorted_df["final_value"].unique()[:top_n]
-
-# Filter the dataframe to include only rows with the top N final values
-top_n_df = sorted_df[sorted_df["final_value"].isin(top_n_final_values)]
+# Get the rows with the top N unique final values, read through the final_value index
+top_n_df = store.top_unique(top_n)
 
 # Count the occurrences of each parameter value for the top N final values
-parameter_columns = [
-    "bollinger_period",
-    "bollinger_std",
-    "bollinger_width_threshold",
-    "rsi_upper",
-    "rsi_lower",
-    "atr_multiplier",
-    "final_value",
-]
+parameter_columns = store.parameter_names + ["final_value"]
 
 parameter_counts = {}
 for param in parameter_columns:
@@ -35,3 +25,8 @@ for param in parameter_columns:
 for param, counts in parameter_counts.items():
     print(f"\nCounts for {param} in the top {top_n} unique final values:")
     print(counts)
+
+# Display how much of the final_value variance each parameter explains
+print("\nParameter importance:")
+print(store.importance())
+store.close()
@@ -0,0 +1,239 @@
+"""
+Shared scheduler for Alpaca API calls.
+
+The budget counts HTTP requests, as Alpaca does: every request takes a token
+from one bucket refilled at the account's per-minute budget, so concurrent
+stages and order threads never exceed it. The live clients' sessions send
+through `Scheduler.send`, so each page of a paginated read (bars are paged
+with `page_token` inside one get_stock_bars call) takes its own token and is
+retried on its own. Clients without a session, like the benchmark fakes,
+take one token per method call instead.
+
+Rate limited (429) requests are retried after Retry-After or a jittered
+exponential backoff. Reads are also retried on server and connection errors,
+writes are not, as they may have gone through. Identical reads that are in
+flight at the same time share one call.
+"""
+
+import datetime
+import json
+import random
+import threading
+import time
+from concurrent.futures import Future
+import metrics
+
+
+class TokenBucket:
+    """
+    Allow `rate` calls per second on average, with bursts of up to `capacity`
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waiting = 0
+
+    def acquire(self) -> float:
+        """
+        Take a token, waiting for one if the bucket is empty. Returns the
+        seconds waited.
+        """
+        start = time.monotonic()
+        with self.lock:
+            self.waiting += 1
+            metrics.peak("scheduler_queue_depth", self.waiting)
+        try:
+            while True:
+                with self.lock:
+                    now = time.monotonic()
+                    self.tokens = min(
+                        self.capacity, self.tokens + (now - self.updated) * self.rate
+                    )
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return now - start
+                    wait = (1 - self.tokens) / self.rate
+                time.sleep(wait)
+        finally:
+            with self.lock:
+                self.waiting -= 1
+
+
+def status_code(error: Exception):
+    """
+    HTTP status of an API error, None for connection errors
+    """
+    return getattr(error, "status_code", None)
+
+
+def is_retryable(error: Exception, read: bool) -> bool:
+    status = status_code(error)
+    if status == 429:
+        return True
+    if not read:
+        return False
+    if status is not None:
+        return status >= 500
+    # Connection errors and timeouts of the HTTP session
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(
+        error
+    ).__module__.startswith("requests")
+
+
+def retry_after(response):
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After")
+    return float(value) if value else None
+
+
+class Scheduler:
+    def __init__(
+        self,
+        requests_per_minute: int,
+        burst: int,
+        max_retries: int,
+        retry_delay: float,
+    ):
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def call(self, method, read: bool, *args, paced: bool = True, **kwargs):
+        """
+        Run an API call, coalescing identical reads. A `paced` call takes a token
+        per attempt and is retried as described above, otherwise the client's
+        session does both for every HTTP request it sends.
+        """
+        if not read:
+            return self._call(method, read, paced, *args, **kwargs)
+        key = (method.__qualname__, request_key(args, kwargs))
+        with self.lock:
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+        if not owner:
+            metrics.increment("scheduler_coalesced")
+            return future.result()
+        try:
+            result = self._call(method, read, paced, *args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+    def _call(self, method, read: bool, paced: bool, *args, **kwargs):
+        if not paced:
+            return method(*args, **kwargs)
+        for attempt in range(self.max_retries + 1):
+            self._take_token()
+            try:
+                return method(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e, read):
+                    raise
+                self._back_off(attempt, getattr(e, "response", None))
+
+    def send(self, send, request):
+        """
+        Send one HTTP request within the rate budget, `send` is the adapter's
+        own send. Returns the last response once it succeeds or runs out of
+        retries, the client raises its error.
+        """
+        read = request.method in ("GET", "HEAD")
+        for attempt in range(self.max_retries + 1):
+            self._take_token()
+            try:
+                response = send(request)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e, read):
+                    raise
+                self._back_off(attempt, None)
+                continue
+            status = response.status_code
+            retryable = status == 429 or (read and status >= 500)
+            if attempt == self.max_retries or not retryable:
+                return response
+            response.close()
+            self._back_off(attempt, response)
+
+    def _take_token(self):
+        waited = self.bucket.acquire()
+        metrics.increment("scheduler_wait_ms", waited * 1000)
+
+    def _back_off(self, attempt: int, response):
+        metrics.increment("scheduler_retries")
+        # Full jitter: a random delay up to the exponential backoff
+        delay = retry_after(response) or random.uniform(
+            0, self.retry_delay * 2**attempt
+        )
+        time.sleep(delay)
+
+
+def request_key(args: tuple, kwargs: dict) -> str:
+    """
+    Hashable key of call arguments, request models are compared by their fields.
+    Times are truncated to the minute, so reads for the same bars made moments
+    apart share one call.
+    """
+
+    def normalize(value):
+        if hasattr(value, "model_dump"):
+            value = value.model_dump()
+        if isinstance(value, dict):
+            return {k: normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        if isinstance(value, datetime.datetime):
+            return value.replace(second=0, microsecond=0)
+        return value
+
+    return json.dumps(
+        normalize([args, kwargs]),
+        sort_keys=True,
+        # Time frames, datetimes, UUIDs and other values without a JSON type
+        default=lambda value: getattr(value, "value", str(value)),
+    )
+
+
+class ScheduledClient:
+    """
+    Proxy of an API client that runs every method call through the scheduler.
+    Clients whose session sends through the scheduler (see
+    http_pool.configure_session) are not `paced` per call.
+    """
+
+    def __init__(self, client, scheduler: Scheduler, paced: bool = True):
+        # The scheduler owns retries, turn off the client's own 429 retry loop
+        if hasattr(client, "_retry"):
+            client._retry = 0
+        self._client = client
+        self._scheduler = scheduler
+        self._paced = paced
+
+    def __getattr__(self, attribute):
+        value = getattr(self._client, attribute)
+        if not callable(value) or attribute.startswith("_"):
+            return value
+
+        def scheduled(*args, **kwargs):
+            return self._scheduler.call(
+                value,
+                attribute.startswith("get_"),
+                *args,
+                paced=self._paced,
+                **kwargs,
+            )
+
+        return scheduled
@@ -1,127 +1,303 @@
+import argparse
 import itertools
-import os
-import csv
+import math
+import multiprocessing
 import traceback
 import backtrader as bt
-import pandas as pd
-import yfinance as yf
-import numpy as np
 
-from bollinger_strategy import BollingerBandsRSI
+from strat import SwingStrategy, load_prices, make_feeds
+from indicator_cache import IndicatorCache, indicator_key, warmup_period
+from vector_engine import run_vector_backtest
+from results_store import ResultsStore, normalize_parameter, open_results_store
 from parameters import *
 
 
+# Price panel, indicator cache and engine shared by sweep workers,
+# set once per worker process
+_worker_data = None
+_worker_cache = None
+_worker_engine = "backtrader"
+
+
+def _init_worker(data, engine):
+    """Keep the price panel in the worker (inherited without copying under fork)."""
+    global _worker_data, _worker_cache, _worker_engine
+    _worker_data = data
+    _worker_cache = IndicatorCache(data)
+    _worker_engine = engine
+
+
+def run_backtest(data, params, tickers=TICKERS, cache=None, trades=False):
+    """
+    Run SwingStrategy with the given parameters and return the final broker value.
+    With `trades` also return the completed orders as (date, ticker, size, price).
+    """
+    cerebro = bt.Cerebro()
+
+    # add data to cerebro
+    for ticker, feed in make_feeds(data, tickers, cache=cache, **params).items():
+        cerebro.adddata(feed, name=ticker)
+    cerebro.broker.set_cash(CASH)
+    cerebro.addstrategy(SwingStrategy, **params, backtesting=True)
+    cerebro.run()
+    if not trades:
+        return cerebro.broker.getvalue()
+    return cerebro.broker.getvalue(), [
+        (
+            bt.num2date(order.executed.dt).date(),
+            order.data._name,
+            order.executed.size,
+            order.executed.price,
+        )
+        for order in cerebro.broker.orders
+        if order.status == order.Completed
+    ]
+
+
+def run_vector(data, params, tickers=TICKERS, cache=None):
+    """Run the SwingStrategy rules on the vectorized engine, without backtrader."""
+    return run_vector_backtest(data, tickers, cache=cache, **params)
+
+
+# Backtest functions by engine name, both return the final portfolio value
+ENGINES = {"backtrader": run_backtest, "vector": run_vector}
+
+
+def _run_worker_backtest(params):
+    return params, ENGINES[_worker_engine](_worker_data, params, cache=_worker_cache)
+
+
+def run_combinations(data, pending, workers=1, engine="backtrader"):
+    """
+    Backtest parameter combinations on one price panel, yielding
+    (params, final_value) as runs finish
+    """
+    if workers > 1:
+        # Workers get the price panel once and stream results back to this process
+        chunksize = max(1, len(pending) // (workers * 4))
+        with multiprocessing.Pool(
+            workers, initializer=_init_worker, initargs=(data, engine)
+        ) as pool:
+            yield from pool.imap_unordered(
+                _run_worker_backtest, pending, chunksize=chunksize
+            )
+    else:
+        cache = IndicatorCache(data)
+        for params in pending:
+            yield params, ENGINES[engine](data, params, cache=cache)
+
+
 class Backtester:
-    def finetune(self, **kwargs):
+    def finetune(self, workers=1, engine="backtrader", **kwargs):
         print("=" * 80)
         print("BacktestFineTuner with parameters:")
         for key, value in kwargs.items():
             setattr(self, key, value)
             print(f"{key} = {value}")
+        print(f"workers = {workers}")
+        print(f"engine = {engine}")
         print("=" * 80)
 
-        csv_file_path = f"finetune_results_{START_DATE}.csv"
-        file_exists = os.path.isfile(csv_file_path)
-
         list_attrs = {k: v for k, v in vars(self).items()}
-        fieldnames = list(list_attrs.keys())
-        fieldnames.append("final_value")
-
-        with open(csv_file_path, mode="a", newline="") as file:
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-
-            if not file_exists:
-                writer.writeheader()
-                file.flush()
-
-            # remove any rows with nan final_value
-            df = pd.read_csv(csv_file_path)
-            df = df.dropna(subset=["final_value"])
-            df.to_csv(csv_file_path, index=False)
-
-            data = yf.download(
-                TICKERS,
-                start=START_DATE,
-                interval="1d",
-                progress=False,
-            )
+        parameter_names = list(list_attrs.keys())
 
-            for combination in itertools.product(*list_attrs.values()):
-                # skip if combination is already in csv and has final_value != nan
-                # check if combination is already in csv
-                skip = False
-                with open(csv_file_path, mode="r") as file:
-                    reader = csv.DictReader(file)
-                    for row in reader:
-                        if (
-                            all(
-                                str(row[key]) == str(value)
-                                for key, value in zip(fieldnames[:-1], combination)
-                            )
-                            and row["final_value"] != "nan"
-                        ):
-                            skip = True
-                            break
-                if skip:
-                    continue
+        # Results live in a SQLite store, seeded once from an older CSV log
+        store = open_results_store(
+            f"finetune_results_{START_DATE}.db",
+            f"finetune_results_{START_DATE}.csv",
+            parameter_names,
+        )
 
+        # Completed combinations are loaded once and kept up to date in memory
+        completed = store.completed(parameter_names)
+        print(f"Resuming with {len(completed)} completed combinations")
+        pending = [
+            dict(zip(parameter_names, combination))
+            for combination in itertools.product(*list_attrs.values())
+            if tuple(normalize_parameter(value) for value in combination)
+            not in completed
+        ]
+        print(f"{len(pending)} combinations to run")
+        if not pending:
+            store.close()
+            return
+        # Run combinations sharing indicator parameters together, so each
+        # worker's chunks mostly reuse indicators already in its cache
+        pending.sort(key=indicator_key)
+
+        data = load_prices()
+
+        # This process is the only writer of the results store
+        with store:
+            for params, final_value in run_combinations(data, pending, workers, engine):
                 # print parameters for this run
-                for key, value in zip(fieldnames, combination):
+                for key, value in params.items():
                     print(f"{key} = {value}")
 
-                cerebro = bt.Cerebro()
-
-                # add data to cerebro
-                for ticker in TICKERS:
-                    df = data.loc[:, (slice(None), ticker)].copy()
-                    df.columns = df.columns.droplevel(1)
-                    feed = bt.feeds.PandasData(dataname=df)
-                    cerebro.adddata(feed, name=ticker)
-                cerebro.broker.set_cash(CASH)
-                params = {
-                    key: value for key, value in zip(fieldnames[:-1], combination)
-                }
-                cerebro.addstrategy(BollingerBandsRSI, **params, backtesting=True)
-                cerebro.run()
-
-                d = {key: value for key, value in zip(fieldnames, combination)}
-                d["final_value"] = cerebro.broker.getvalue()
-                writer.writerow(d)
+                # Results are written in batches, a crash loses at most
+                # one batch which the next run picks up again
+                store.add(params, final_value)
+                completed.add(
+                    tuple(normalize_parameter(value) for value in params.values())
+                )
 
                 print("-" * 40)
 
+    def search(self, workers=1, engine="backtrader", eta=3, rungs=3, **kwargs):
+        """
+        Successive halving over the parameter grid. Every combination is first
+        backtested on the most recent 1/eta**(rungs-1) of the data, the best 1/eta
+        of them move on to a window eta times longer, and the survivors of the
+        last rung run on the full data. Combinations already in the results store
+        are not rerun, they compete in the final ranking with their stored value.
+        Returns the best (params, final_value).
+        """
+        print("=" * 80)
+        print("Successive halving search with parameters:")
+        for key, value in kwargs.items():
+            print(f"{key} = {value}")
+        print(f"workers = {workers}, engine = {engine}, eta = {eta}, rungs = {rungs}")
+        print("=" * 80)
+
+        parameter_names = list(kwargs.keys())
+        grid = [
+            dict(zip(parameter_names, combination))
+            for combination in itertools.product(*kwargs.values())
+        ]
+        store = open_results_store(
+            f"finetune_results_{START_DATE}.db",
+            f"finetune_results_{START_DATE}.csv",
+            parameter_names,
+        )
+        with store:
+            # Full-length results from earlier sweeps are prior observations
+            priors = store.results().dropna(subset=parameter_names)
+        known = {
+            tuple(normalize_parameter(value) for value in row[:-1]): row[-1]
+            for row in priors[parameter_names + ["final_value"]].itertuples(index=False)
+        }
+        candidates = [
+            params
+            for params in grid
+            if tuple(normalize_parameter(value) for value in params.values())
+            not in known
+        ]
+        candidates.sort(key=indicator_key)
+        print(f"{len(grid) - len(candidates)} combinations known from earlier sweeps")
+
+        data = load_prices()
+        # Short windows still need room for the longest indicator warm-up
+        min_bars = 2 * max(warmup_period(**params) for params in grid)
+        backtests = 0
+        full_length_equivalents = 0.0
+        results = {}
+        for rung in range(rungs):
+            if not candidates:
+                break
+            bars = max(len(data) // eta ** (rungs - 1 - rung), min_bars)
+            window = data.iloc[-bars:] if rung < rungs - 1 else data
+            results = dict(
+                (tuple(params.items()), final_value)
+                for params, final_value in run_combinations(
+                    window, candidates, workers, engine
+                )
+            )
+            backtests += len(candidates)
+            full_length_equivalents += len(candidates) * len(window) / len(data)
+            print(f"Rung {rung}: {len(candidates)} combinations on {len(window)} bars")
+            if rung < rungs - 1:
+                keep = max(1, math.ceil(len(candidates) / eta))
+                ranked = sorted(results, key=results.get, reverse=True)[:keep]
+                candidates = sorted(
+                    (dict(items) for items in ranked), key=indicator_key
+                )
+
+        # Only full-length results are comparable with the stored ones
+        with ResultsStore(f"finetune_results_{START_DATE}.db") as store:
+            for items, final_value in results.items():
+                store.add(dict(items), final_value)
+                known[tuple(normalize_parameter(value) for _, value in items)] = (
+                    final_value
+                )
+
+        in_grid = {
+            tuple(normalize_parameter(value) for value in params.values()): params
+            for params in grid
+        }
+        best_key = max(
+            (key for key in known if key in in_grid), key=known.get, default=None
+        )
+        print(
+            f"{backtests} backtests ({full_length_equivalents:.1f} full-length "
+            f"equivalents) instead of {len(grid)} for the full grid"
+        )
+        if best_key is None:
+            return None
+        print(f"Best final_value {known[best_key]} with {in_grid[best_key]}")
+        return in_grid[best_key], known[best_key]
+
     def analyze_parameters(self):
-        df = pd.read_csv(f"finetune_results_{START_DATE}.csv")
-        # if nan in final_value, return
-        if df["final_value"].isnull().values.any():
-            print("Some final_value is nan, please run finetune() again")
-            return
         parameters_analysis = {}
-        # get params from row with top 3 final_value
-        top_3 = df.nlargest(3, "final_value")
-        print(top_3)
-
-        # get mean final_value for each parameter using top 10% of final_value
-        for parameter in df.columns[:-1]:
-            top_n = int(len(df) * 0.1) if len(df) > 10 else len(df)
-            df = df.nlargest(top_n, "final_value")
-            results = df.groupby(parameter)["final_value"].mean()
-            results = results.sort_values(ascending=False)
-            parameters_analysis[parameter] = results
-            print(results)
+        with ResultsStore(f"finetune_results_{START_DATE}.db") as store:
+            # get params from row with top 3 final_value
+            top_3 = store.top(3)
+            print(top_3)
+
+            # get mean final_value for each parameter using top 10% of final_value
+            for parameter in store.parameter_names:
+                results = store.top_marginal_means(parameter, fraction=0.1)
+                parameters_analysis[parameter] = results
+                print(results)
+
+            # share of final_value variance explained by each parameter
+            print(store.importance())
         return parameters_analysis
 
 
-backtester = Backtester()
-backtester.finetune(
-    # bollinger_period=[10, 14],
-    # bollinger_std=[0.5, 0.8, 1, 1.2, 1.5],
-    # bollinger_width_threshold=[.07, .08],
-    # rsi_period = [7, 14],
-    # rsi_upper=[60, 65, 70, 75, 80],
-    # rsi_lower=[25, 30, 35],
-    # atr_period = [7, 14],
-    # atr_multiplier=[1.5, 2],
-    cash_multiplier=[0.1, 0.2, 0.25, 0.3, 0.4, 0.5, 0.6, 0.7, 0.75, 0.8, 0.9],
-)
-backtester.analyze_parameters()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Finetune SwingStrategy parameters")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes for the parameter sweep",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=sorted(ENGINES),
+        default="backtrader",
+        help="backtest engine, vector runs the same rules without backtrader",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="successive halving search instead of running the full grid",
+    )
+    parser.add_argument(
+        "--eta",
+        type=int,
+        default=3,
+        help="search keeps the best 1/eta of combinations at each rung",
+    )
+    args = parser.parse_args()
+
+    parameter_grid = dict(
+        # bollinger_period=[10, 14],
+        # bollinger_std=[0.5, 0.8, 1, 1.2, 1.5],
+        # bollinger_width_threshold=[.07, .08],
+        # rsi_period = [7, 14],
+        # rsi_upper=[60, 65, 70, 75, 80],
+        # rsi_lower=[25, 30, 35],
+        # atr_period = [7, 14],
+        # atr_multiplier=[1.5, 2],
+        cash_multiplier=[0.1, 0.2, 0.25, 0.3, 0.4, 0.5, 0.6, 0.7, 0.75, 0.8, 0.9],
+    )
+
+    backtester = Backtester()
+    if args.search:
+        backtester.search(
+            workers=args.workers, engine=args.engine, eta=args.eta, **parameter_grid
+        )
+    else:
+        backtester.finetune(workers=args.workers, engine=args.engine, **parameter_grid)
+    backtester.analyze_parameters()
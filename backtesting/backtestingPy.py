@@ -1,7 +1,12 @@
+import os
+import sys
 import pandas as pd
 from backtesting import Backtest, Strategy
 from backtesting.test import GOOG
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import indicators
+
 
 class BB_RSI_Strategy(Strategy):
     bollinger_period = 14
@@ -15,28 +20,23 @@ class BB_RSI_Strategy(Strategy):
     cash_multiplier = 0.7
 
     def init(self):
+        # Indicators are computed once over the whole history with the shared
+        # vectorized kernels, Wilder smoothing as in the backtrader backtests
+        close = pd.Series(self.data.Close)
         self.rsi = self.I(
-            lambda x: pd.Series(x)
-            .rolling(self.rsi_period)
-            .apply(lambda s: pd.Series(s).mean(), raw=False),
-            self.data.Close,
-        )
-        self.bb_mid = self.I(
-            lambda x: pd.Series(x).rolling(self.bollinger_period).mean(),
-            self.data.Close,
-        )
-        self.bb_std = self.I(
-            lambda x: pd.Series(x).rolling(self.bollinger_period).std(), self.data.Close
-        )
-        self.bb_upper = self.I(
-            lambda mid, std: mid + self.bollinger_std * std, self.bb_mid, self.bb_std
-        )
-        self.bb_lower = self.I(
-            lambda mid, std: mid - self.bollinger_std * std, self.bb_mid, self.bb_std
+            indicators.rsi,
+            close,
+            self.rsi_period,
+            indicators.SMOOTHING_WILDER,
+            name="RSI",
         )
-        self.bb_width = self.I(
-            lambda upper, lower: (upper - lower) / lower, self.bb_upper, self.bb_lower
+        mid, top, bot = indicators.bollinger_bands(
+            close, self.bollinger_period, self.bollinger_std, ddof=1
         )
+        self.bb_mid = self.I(lambda: mid, name="BB mid")
+        self.bb_upper = self.I(lambda: top, name="BB upper")
+        self.bb_lower = self.I(lambda: bot, name="BB lower")
+        self.bb_width = self.I(lambda: (top - bot) / bot, name="BB width")
 
     def next(self):
         if self.position:
@@ -59,8 +59,9 @@ class BB_RSI_Strategy(Strategy):
                 self.sell()
 
 
-bt = Backtest(GOOG, BB_RSI_Strategy, cash=1000, commission=0)
-stats = bt.run()
-print(stats)
-if stats["Return [%]"] > 0:
-    bt.plot()
+if __name__ == "__main__":
+    bt = Backtest(GOOG, BB_RSI_Strategy, cash=1000, commission=0)
+    stats = bt.run()
+    print(stats)
+    if stats["Return [%]"] > 0:
+        bt.plot()
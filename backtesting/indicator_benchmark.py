@@ -0,0 +1,89 @@
+"""
+Time the shared vectorized indicator kernels against the per-window
+rolling.apply path BB_RSI_Strategy used for its RSI line.
+
+    python indicator_benchmark.py
+    python indicator_benchmark.py --lengths 1000 10000 100000 --repeat 5
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from parameters import *
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import indicators
+
+
+def rolling_apply_rsi(close: pd.Series, period: int) -> pd.Series:
+    """
+    The former BB_RSI_Strategy RSI line: a Series built per window, and a plain
+    moving average
+    """
+    return close.rolling(period).apply(lambda s: pd.Series(s).mean(), raw=False)
+
+
+def random_walk(length: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))
+    spread = close * rng.uniform(0, 0.02, length)
+    return pd.DataFrame({"High": close + spread, "Low": close - spread, "Close": close})
+
+
+def best_time(function, repeat: int) -> float:
+    """
+    Best wall time of `repeat` calls in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the indicator kernels")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'bars':>8} {'rolling.apply':>15} {'rsi':>10} {'bollinger':>10} "
+        f"{'atr':>10} {'speedup':>9}"
+    )
+    for length in args.lengths:
+        bars = random_walk(length)
+        close = bars["Close"]
+        old = best_time(
+            lambda: rolling_apply_rsi(close, RSI_PERIOD),
+            1 if length > 10000 else args.repeat,
+        )
+        rsi = best_time(
+            lambda: indicators.rsi(close, RSI_PERIOD, indicators.SMOOTHING_WILDER),
+            args.repeat,
+        )
+        bollinger = best_time(
+            lambda: indicators.bollinger_bands(
+                close, BOLLINGER_PERIOD, BOLLINGER_STD, ddof=1
+            ),
+            args.repeat,
+        )
+        atr = best_time(
+            lambda: indicators.atr(
+                bars["High"],
+                bars["Low"],
+                close,
+                ATR_PERIOD,
+                indicators.SMOOTHING_WILDER,
+            ),
+            args.repeat,
+        )
+        print(
+            f"{length:>8} {old * 1000:>12.1f} ms {rsi * 1000:>7.2f} ms "
+            f"{bollinger * 1000:>7.2f} ms {atr * 1000:>7.2f} ms {old / rsi:>8.0f}x"
+        )
@@ -0,0 +1,139 @@
+"""
+Indicator lines shared across the parameter combinations of a sweep, for
+both the backtrader and the vectorized engine. Does not import backtrader.
+"""
+
+import os
+import sys
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+from parameters import *
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import indicators
+
+
+class IndicatorCache:
+    """
+    Indicator lines of one price panel, computed once per
+    (line, period, std, ticker) and shared by every parameter combination of a sweep.
+    `data` is a yfinance download with (field, ticker) columns.
+    """
+
+    def __init__(self, data, max_frames=INDICATOR_CACHE_FRAMES):
+        self.data = data
+        self.lines = {}
+        # Frames only regroup cached lines, so the least recently used are dropped
+        self.frames = OrderedDict()
+        self.max_frames = max_frames
+        self.price_arrays = {}
+        self.computed = 0
+
+    def prices(self, tickers) -> dict:
+        """
+        Get open, high, low and close as contiguous dates x tickers arrays
+        """
+        key = tuple(tickers)
+        if key not in self.price_arrays:
+            self.price_arrays[key] = {
+                field: np.ascontiguousarray(
+                    self.data[field.capitalize()][tickers].to_numpy("f8")
+                )
+                for field in ("open", "high", "low", "close")
+            }
+        return self.price_arrays[key]
+
+    def _compute(self, indicator, period, std, tickers):
+        """
+        Compute one indicator for the given tickers at once, returns {line: panel}
+        """
+        close = self.data["Close"][tickers]
+        if indicator == "rsi":
+            return {"rsi": indicators.rsi(close, period, indicators.SMOOTHING_WILDER)}
+        if indicator == "atr":
+            high, low = self.data["High"][tickers], self.data["Low"][tickers]
+            return {
+                "atr": indicators.atr(
+                    high, low, close, period, indicators.SMOOTHING_WILDER
+                )
+            }
+        mid, top, bot = indicators.bollinger_bands(close, period, std)
+        return {
+            "bb_mid": mid,
+            "bb_top": top,
+            "bb_bot": bot,
+            "bb_width": (top - bot) / mid,
+        }
+
+    def get(self, indicator, line, period, std, tickers) -> pd.DataFrame:
+        """
+        Get an indicator line as a dates x tickers frame, computing it only for
+        missing tickers
+        """
+        frame_key = (line, period, std, tuple(tickers))
+        if frame_key in self.frames:
+            self.frames.move_to_end(frame_key)
+            return self.frames[frame_key]
+        missing = [
+            ticker
+            for ticker in tickers
+            if (line, period, std, ticker) not in self.lines
+        ]
+        if missing:
+            for name, panel in self._compute(indicator, period, std, missing).items():
+                for ticker in missing:
+                    self.lines[(name, period, std, ticker)] = panel[ticker]
+            self.computed += len(missing)
+        frame = pd.DataFrame(
+            {ticker: self.lines[(line, period, std, ticker)] for ticker in tickers}
+        )
+        self.frames[frame_key] = frame
+        if len(self.frames) > self.max_frames:
+            self.frames.popitem(last=False)
+        return frame
+
+    def indicators(self, tickers, **kwargs) -> dict:
+        """
+        Get every indicator line SwingStrategy uses for one parameter combination
+        """
+        rsi_period = kwargs.get("rsi_period", RSI_PERIOD)
+        atr_period = kwargs.get("atr_period", ATR_PERIOD)
+        bollinger_period = kwargs.get("bollinger_period", BOLLINGER_PERIOD)
+        bollinger_std = kwargs.get("bollinger_std", BOLLINGER_STD)
+        computed = {
+            "rsi": self.get("rsi", "rsi", rsi_period, None, tickers),
+            "atr": self.get("atr", "atr", atr_period, None, tickers),
+        }
+        for line in ("bb_top", "bb_mid", "bb_bot", "bb_width"):
+            computed[line] = self.get(
+                "bollinger", line, bollinger_period, bollinger_std, tickers
+            )
+        return computed
+
+
+def indicator_key(params: dict) -> tuple:
+    """
+    Sort key grouping parameter combinations that share indicator lines
+    """
+    return tuple(
+        params.get(name, default)
+        for name, default in (
+            ("bollinger_period", BOLLINGER_PERIOD),
+            ("bollinger_std", BOLLINGER_STD),
+            ("atr_period", ATR_PERIOD),
+            ("rsi_period", RSI_PERIOD),
+        )
+    )
+
+
+def warmup_period(**kwargs) -> int:
+    """
+    Number of bars the indicators need before SwingStrategy trades
+    """
+    return max(
+        kwargs.get("rsi_period", RSI_PERIOD) + 1,
+        kwargs.get("atr_period", ATR_PERIOD) + 1,
+        kwargs.get("bollinger_period", BOLLINGER_PERIOD),
+    )
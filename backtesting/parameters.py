@@ -1,6 +1,15 @@
 CASH = 1000
 START_DATE = "2024-10-08"
 
+# Local price store, set PRICE_STORE_OFFLINE to only use bars already on disk,
+# or PRICE_STORE_FIXTURE to run on generated bars without the network
+PRICE_STORE_DIR = "price_data"
+PRICE_STORE_OFFLINE = False
+PRICE_STORE_FIXTURE = False
+
+# Indicator frames kept per sweep, six are used per parameter combination
+INDICATOR_CACHE_FRAMES = 60
+
 BOLLINGER_PERIOD = 14
 BOLLINGER_STD = 0.8
 BOLLINGER_WIDTH_THRESHOLD = 0.07
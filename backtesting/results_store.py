@@ -0,0 +1,307 @@
+"""
+SQLite store for finetune results.
+
+Every parameter is a REAL column next to final_value, with an index on
+final_value and one per parameter. Per parameter value counts and sums of
+final_value are kept up to date on every write, so marginal means and
+parameter importance are read from a small summary table instead of a scan
+over all results.
+"""
+
+import csv
+import math
+import os
+import sqlite3
+import time
+from collections import defaultdict
+import pandas as pd
+
+RESULTS_TABLE = "results"
+MARGINALS_TABLE = "marginals"
+# Results are committed every WRITE_BATCH_SIZE results or WRITE_INTERVAL seconds,
+# whichever comes first, so a crash loses at most one small batch
+WRITE_BATCH_SIZE = 50
+WRITE_INTERVAL = 2.0
+
+
+def normalize_parameter(value):
+    """Normalize a parameter value so that e.g. 10, 10.0 and "10" compare equal."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def quote(name: str) -> str:
+    """Quote a column name for SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class ResultsStore:
+    def __init__(
+        self,
+        path: str,
+        parameter_names=None,
+        batch_size=WRITE_BATCH_SIZE,
+        interval=WRITE_INTERVAL,
+    ):
+        """
+        Open or create the store at `path`. Parameter columns not in the store
+        yet are added, rows written before have no value for them.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending = []
+        self.flushed_at = time.monotonic()
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # Every commit is synced to disk, batches keep that to a few syncs per second
+        self.connection.execute("PRAGMA synchronous=FULL")
+        with self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {RESULTS_TABLE} "
+                "(final_value REAL NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_final_value "
+                f"ON {RESULTS_TABLE} (final_value)"
+            )
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {MARGINALS_TABLE} ("
+                "parameter TEXT NOT NULL, value REAL NOT NULL, count INTEGER NOT NULL, "
+                "total REAL NOT NULL, total_sq REAL NOT NULL, "
+                "PRIMARY KEY (parameter, value))"
+            )
+            for name in parameter_names or []:
+                if name not in self.parameter_names:
+                    self._add_parameter(name)
+
+    @property
+    def parameter_names(self) -> list:
+        columns = self.connection.execute(f"PRAGMA table_info({RESULTS_TABLE})")
+        return [column[1] for column in columns if column[1] != "final_value"]
+
+    def _add_parameter(self, name: str):
+        self.connection.execute(
+            f"ALTER TABLE {RESULTS_TABLE} ADD COLUMN {quote(name)} REAL"
+        )
+        # (parameter, final_value) covers both filtering and per-value top-N
+        self.connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote('idx_' + name)} "
+            f"ON {RESULTS_TABLE} ({quote(name)}, final_value)"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Write pending results and close the connection
+        """
+        self.flush()
+        self.connection.close()
+
+    def add(self, params: dict, final_value: float):
+        """
+        Queue one result, results are written in batches of `batch_size` or
+        once `interval` seconds have passed since the last write
+        """
+        if final_value is None or math.isnan(final_value):
+            return
+        self.pending.append((params, float(final_value)))
+        if (
+            len(self.pending) >= self.batch_size
+            or time.monotonic() - self.flushed_at >= self.interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """
+        Write queued results and their marginal sums in one transaction
+        """
+        self.flushed_at = time.monotonic()
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        with self.connection:
+            names = self.parameter_names
+            for name in sorted(
+                set().union(*(params for params, _ in pending)) - set(names)
+            ):
+                self._add_parameter(name)
+                names.append(name)
+            rows = []
+            marginals = defaultdict(lambda: [0, 0.0, 0.0])
+            for params, final_value in pending:
+                row = [None] * len(names) + [final_value]
+                for position, name in enumerate(names):
+                    if name in params:
+                        value = row[position] = normalize_parameter(params[name])
+                        marginal = marginals[(name, value)]
+                        marginal[0] += 1
+                        marginal[1] += final_value
+                        marginal[2] += final_value * final_value
+                rows.append(row)
+            columns = names + ["final_value"]
+            self.connection.executemany(
+                f"INSERT INTO {RESULTS_TABLE} ({', '.join(map(quote, columns))}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                rows,
+            )
+            self.connection.executemany(
+                f"INSERT INTO {MARGINALS_TABLE} "
+                "(parameter, value, count, total, total_sq) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (parameter, value) DO UPDATE SET "
+                "count = count + excluded.count, total = total + excluded.total, "
+                "total_sq = total_sq + excluded.total_sq",
+                [(name, value, *sums) for (name, value), sums in marginals.items()],
+            )
+
+    def import_csv(self, csv_file_path: str) -> int:
+        """
+        Import a CSV results log. Rows with a nan or missing final_value,
+        including a row torn by a crash, are skipped. Returns the rows imported.
+        """
+        imported = 0
+        with open(csv_file_path, mode="r", newline="") as file:
+            for row in csv.DictReader(file):
+                try:
+                    final_value = float(row.pop("final_value"))
+                except (TypeError, ValueError, KeyError):
+                    continue
+                if math.isnan(final_value) or None in row.values():
+                    continue
+                self.add(row, final_value)
+                imported += 1
+        self.flush()
+        return imported
+
+    def count(self) -> int:
+        self.flush()
+        return self.connection.execute(
+            f"SELECT COUNT(*) FROM {RESULTS_TABLE}"
+        ).fetchone()[0]
+
+    def completed(self, parameter_names: list) -> set:
+        """
+        Get the parameter combinations already stored, as normalized tuples
+        """
+        self.flush()
+        existing = self.parameter_names
+        columns = [
+            quote(name) if name in existing else "NULL" for name in parameter_names
+        ]
+        rows = self.connection.execute(
+            f"SELECT {', '.join(columns)} FROM {RESULTS_TABLE}"
+        )
+        return {tuple(normalize_parameter(value) for value in row) for row in rows}
+
+    def _select_columns(self) -> str:
+        return ", ".join(map(quote, self.parameter_names + ["final_value"]))
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        self.flush()
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+    def results(self) -> pd.DataFrame:
+        """
+        Get all results
+        """
+        return self.query(f"SELECT {self._select_columns()} FROM {RESULTS_TABLE}")
+
+    def top(self, n: int = 10) -> pd.DataFrame:
+        """
+        Get the n results with the highest final_value
+        """
+        return self.query(
+            f"SELECT {self._select_columns()} FROM {RESULTS_TABLE} "
+            "ORDER BY final_value DESC LIMIT ?",
+            (n,),
+        )
+
+    def top_unique(self, n: int = 3) -> pd.DataFrame:
+        """
+        Get every result whose final_value is one of the n highest distinct values
+        """
+        return self.query(
+            f"SELECT {self._select_columns()} FROM {RESULTS_TABLE} "
+            "WHERE final_value >= (SELECT MIN(final_value) FROM "
+            f"(SELECT DISTINCT final_value FROM {RESULTS_TABLE} "
+            "ORDER BY final_value DESC LIMIT ?)) ORDER BY final_value DESC",
+            (n,),
+        )
+
+    def marginal_means(self, parameter: str) -> pd.DataFrame:
+        """
+        Get the mean final_value and result count for each value of a parameter
+        """
+        return self.query(
+            f"SELECT value AS {quote(parameter)}, count, "
+            "total / count AS mean_final_value "
+            f"FROM {MARGINALS_TABLE} WHERE parameter = ? "
+            "ORDER BY mean_final_value DESC",
+            (parameter,),
+        )
+
+    def top_marginal_means(self, parameter: str, fraction: float = 0.1) -> pd.DataFrame:
+        """
+        Get the mean final_value for each value of a parameter within the top
+        `fraction` of results, or within all results when there are 10 or fewer
+        """
+        total = self.count()
+        n = int(total * fraction) if total > 10 else total
+        return self.query(
+            f"SELECT {quote(parameter)}, COUNT(*) AS count, "
+            "AVG(final_value) AS mean_final_value "
+            f"FROM (SELECT {quote(parameter)}, final_value FROM {RESULTS_TABLE} "
+            "ORDER BY final_value DESC LIMIT ?) "
+            f"GROUP BY {quote(parameter)} ORDER BY mean_final_value DESC",
+            (n,),
+        )
+
+    def importance(self) -> pd.DataFrame:
+        """
+        Rank parameters by the share of final_value variance explained by their
+        values alone (the main effect), computed from the marginal sums
+        """
+        marginals = self.query(f"SELECT * FROM {MARGINALS_TABLE}")
+        rows = []
+        for parameter, group in marginals.groupby("parameter"):
+            count = group["count"].sum()
+            mean = group["total"].sum() / count
+            total_variance = group["total_sq"].sum() - count * mean * mean
+            between = (
+                group["count"] * (group["total"] / group["count"] - mean) ** 2
+            ).sum()
+            rows.append(
+                {
+                    "parameter": parameter,
+                    "values": len(group),
+                    "importance": (
+                        between / total_variance if total_variance > 0 else 0.0
+                    ),
+                }
+            )
+        return pd.DataFrame(
+            rows, columns=["parameter", "values", "importance"]
+        ).sort_values("importance", ascending=False, ignore_index=True)
+
+
+def open_results_store(db_path: str, csv_file_path: str = None, parameter_names=None):
+    """
+    Open the results store, seeding a new store from an existing CSV results log.
+
+    Results are committed (and synced) in batches: a crash or power loss loses
+    at most the results queued since the last commit, fewer than
+    WRITE_BATCH_SIZE and, once a later result arrives, none older than
+    WRITE_INTERVAL seconds. Those combinations are simply run again on resume.
+    """
+    store = ResultsStore(db_path, parameter_names)
+    if csv_file_path and os.path.isfile(csv_file_path) and store.count() == 0:
+        imported = store.import_csv(csv_file_path)
+        print(f"Imported {imported} results from {csv_file_path}")
+    return store
@@ -1,9 +1,95 @@
 import datetime
+import os
+import sys
 import yfinance as yf
 import backtrader as bt
+import pandas as pd
 
 from parameters import *
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from price_store import PriceStore, fixture_bars
+from indicator_cache import IndicatorCache, warmup_period
+
+INDICATOR_LINES = ("rsi", "atr", "bb_top", "bb_mid", "bb_bot", "bb_width")
+
+
+class IndicatorData(bt.feeds.PandasData):
+    """PandasData feed carrying precomputed indicator columns."""
+
+    lines = INDICATOR_LINES
+    params = tuple((line, -1) for line in INDICATOR_LINES)
+
+
+def fetch_yfinance(tickers, start, end):
+    """
+    Download daily bars from yfinance for the price store, `end` inclusive
+    """
+    data = yf.download(
+        tickers,
+        start=start,
+        end=end + datetime.timedelta(days=1),
+        interval="1d",
+        progress=False,
+    )
+    bars = {}
+    for ticker in tickers:
+        if isinstance(data.columns, pd.MultiIndex):
+            df = data.loc[:, (slice(None), ticker)].copy()
+            df.columns = df.columns.droplevel(1)
+        else:
+            df = data.copy()
+        df.columns = [column.lower() for column in df.columns]
+        bars[ticker] = df
+    # yfinance logs failed downloads instead of raising. The exchange never
+    # closes for a whole week, so no bars over one means the download failed.
+    if data.empty and len(pd.bdate_range(start, end)) >= 5:
+        raise IOError(f"yfinance returned no bars for {tickers} from {start} to {end}")
+    return bars
+
+
+def fetch_fixture(tickers, start, end):
+    """
+    Generate deterministic bars with fixture_bars for the price store, `end` inclusive
+    """
+    return fixture_bars(tickers, start, len(pd.bdate_range(start, end)))
+
+
+def load_prices(tickers=TICKERS, start=START_DATE, end=None):
+    """
+    Load daily bars from the local price store, downloading only missing ranges.
+    With PRICE_STORE_FIXTURE the bars are generated instead, in a store of their own.
+    """
+    if PRICE_STORE_FIXTURE:
+        store = PriceStore(
+            os.path.join(PRICE_STORE_DIR, "fixture"), fetch=fetch_fixture
+        )
+    else:
+        store = PriceStore(
+            PRICE_STORE_DIR, fetch=None if PRICE_STORE_OFFLINE else fetch_yfinance
+        )
+    tickers = [tickers] if isinstance(tickers, str) else tickers
+    return store.load_frame(tickers, start, end)
+
+
+def make_feeds(data, tickers, cache=None, **kwargs):
+    """
+    Compute indicators for all tickers at once and build one feed per ticker.
+    `data` is a yfinance download with (field, ticker) columns, pass an
+    IndicatorCache of the same data to reuse indicators across calls.
+    """
+    if cache is None:
+        cache = IndicatorCache(data)
+    computed = cache.indicators(tickers, **kwargs)
+    feeds = {}
+    for ticker in tickers:
+        df = data.loc[:, (slice(None), ticker)].copy()
+        df.columns = df.columns.droplevel(1)
+        for line in INDICATOR_LINES:
+            df[line] = computed[line][ticker]
+        feeds[ticker] = IndicatorData(dataname=df)
+    return feeds
+
 
 class SwingStrategy(bt.Strategy):
     def __init__(self, **kwargs):
@@ -19,28 +105,19 @@ class SwingStrategy(bt.Strategy):
         self.params.atr_multiplier = kwargs.get("atr_multiplier", ATR_MULTIPLIER)
         self.params.backtesting = kwargs.get("backtesting", False)
 
-        # Initialize indicators
-        self.rsi = {
-            data: bt.indicators.RSI(data, period=self.params.rsi_period)
-            for data in self.datas
-        }
-        self.atr = {
-            data: bt.indicators.ATR(data, period=self.params.atr_period, plot=False)
-            for data in self.datas
-        }
-        self.bollinger = {
-            data: bt.indicators.BollingerBands(
-                data,
-                period=self.params.bollinger_period,
-                devfactor=self.params.bollinger_std,
-            )
-            for data in self.datas
-        }
-        self.bollinger_width = {
-            data: (self.bollinger[data].lines.top - self.bollinger[data].lines.bot)
-            / self.bollinger[data].lines.mid
-            for data in self.datas
-        }
+        # Indicators are precomputed by make_feeds and carried as feed lines
+        self.rsi = {data: data.rsi for data in self.datas}
+        self.atr = {data: data.atr for data in self.datas}
+        self.bollinger_top = {data: data.bb_top for data in self.datas}
+        self.bollinger_bot = {data: data.bb_bot for data in self.datas}
+        self.bollinger_width = {data: data.bb_width for data in self.datas}
+        # Feed lines do not set a minimum period like indicators do,
+        # so next() waits for the indicator warm-up itself
+        self.warmup_period = warmup_period(
+            rsi_period=self.params.rsi_period,
+            atr_period=self.params.atr_period,
+            bollinger_period=self.params.bollinger_period,
+        )
 
     def log(self, txt):
         if not self.params.backtesting:
@@ -71,6 +148,9 @@ class SwingStrategy(bt.Strategy):
             self.log(f"{action:<8} {stock_name:<10} {price:<12} {size:<8} {reason}")
 
     def next(self):
+        if len(self) < self.warmup_period:
+            return
+
         # Check positions and decide whether to sell
         self.handle_sell_signals()
 
@@ -84,7 +164,7 @@ class SwingStrategy(bt.Strategy):
         for data in self.datas:
             # Previous candle conditions
             is_prev_candle_close_below_lower_band = (
-                data.close[-1] < self.bollinger[data].lines.bot[-1]
+                data.close[-1] < self.bollinger_bot[data][-1]
             )
             is_prev_rsi_below_lower_threshold = (
                 self.rsi[data][-1] < self.params.rsi_lower
@@ -135,7 +215,7 @@ class SwingStrategy(bt.Strategy):
             if pos.size:  # If there's an open position
                 # Previous candle conditions
                 is_prev_candle_close_above_upper_band = (
-                    data.close[-1] > self.bollinger[data].lines.top[-1]
+                    data.close[-1] > self.bollinger_top[data][-1]
                 )
                 is_prev_rsi_above_upper_threshold = (
                     self.rsi[data][-1] > self.params.rsi_upper
@@ -222,24 +302,13 @@ def run():
     cerebro = bt.Cerebro(
         oldbuysell=True,
     )
-    data = yf.download(
-        TICKERS,
-        start=START_DATE,
-        interval="1d",
-        progress=False,
-    )
+    data = load_prices()
     data = data.dropna(axis=1)
 
     # add data to cerebro
-    if isinstance(TICKERS, str):
-        feed = bt.feeds.PandasData(dataname=data)
-        cerebro.adddata(feed, name=TICKERS)
-    else:
-        for ticker in TICKERS:
-            df = data.loc[:, (slice(None), ticker)].copy()
-            df.columns = df.columns.droplevel(1)
-            feed = bt.feeds.PandasData(dataname=df)
-            cerebro.adddata(feed, name=ticker)
+    tickers = data.columns.get_level_values(1).unique().tolist()
+    for ticker, feed in make_feeds(data, tickers).items():
+        cerebro.adddata(feed, name=ticker)
     cerebro.broker.set_cash(CASH)
     cerebro.addstrategy(SwingStrategy)
     cerebro.run()
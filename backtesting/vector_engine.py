@@ -0,0 +1,291 @@
+"""
+Vectorized engine for the SwingStrategy rules.
+
+Indicators and the Bollinger entry/exit signals are computed as array
+operations over the whole price panel. Only the path dependent part (order
+acceptance, cash, positions and the ATR trailing stops) runs bar by bar, in a
+loop that mirrors backtrader's BackBroker:
+
+- orders placed on a bar are checked against cash at their creation price on
+  the next bar and rejected if cash would go negative
+- market orders fill at the next open, trailing stops at the open on a gap or
+  at the stop price, and a stop that did not fill trails the close
+- a sell signal cancels every pending sell order, as SwingStrategy does
+
+The loop only uses NumPy arrays and scalars so it is compiled with numba when
+numba is installed.
+"""
+
+import numpy as np
+
+from parameters import *
+from indicator_cache import IndicatorCache, warmup_period
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, fall back to the plain Python loop
+
+    def njit(*args, **kwargs):
+        return lambda function: function
+
+
+MARKET = 0
+STOP_TRAIL = 1
+
+SUBMITTED = 0
+ACCEPTED = 1
+DONE = 2
+
+
+def compute_signals(data, tickers, cache=None, **kwargs):
+    """
+    Compute buy/sell signals and trailing stop percentages for every bar and ticker.
+    Returns (buy_signal, sell_signal, trail_percent, first bar next() runs on).
+    """
+    if cache is None:
+        cache = IndicatorCache(data)
+    computed = cache.indicators(tickers, **kwargs)
+    return signals_from_indicators(
+        cache.prices(tickers)["close"],
+        computed["bb_top"].to_numpy("f8"),
+        computed["bb_bot"].to_numpy("f8"),
+        computed["atr"].to_numpy("f8"),
+        atr_multiplier=kwargs.get("atr_multiplier", ATR_MULTIPLIER),
+        start=warmup_period(**kwargs) - 1,
+    )
+
+
+def signals_from_indicators(close, bb_top, bb_bot, atr, atr_multiplier, start):
+    """
+    SwingStrategy entry/exit rules: buy when the previous close was below the
+    lower band, sell when it was above the upper band
+    """
+    buy_signal = np.zeros(close.shape, dtype=np.bool_)
+    sell_signal = np.zeros(close.shape, dtype=np.bool_)
+    buy_signal[1:] = close[:-1] < bb_bot[:-1]
+    sell_signal[1:] = close[:-1] > bb_top[:-1]
+    trail_percent = atr * atr_multiplier / 100
+    return buy_signal, sell_signal, trail_percent, start
+
+
+@njit(cache=True)
+def _position_update(size, price, old_size, old_price):
+    """backtrader Position.update: returns (new size, new price, opened, closed)."""
+    new_size = old_size + size
+    if new_size == 0:
+        return new_size, 0.0, 0.0, size
+    if old_size == 0:
+        return new_size, price, size, 0.0
+    if old_size > 0:
+        if size > 0:
+            return new_size, (old_price * old_size + size * price) / new_size, size, 0.0
+        if new_size > 0:
+            return new_size, old_price, 0.0, size
+        return new_size, price, new_size, -old_size
+    if size < 0:
+        return new_size, (old_price * old_size + size * price) / new_size, size, 0.0
+    if new_size < 0:
+        return new_size, old_price, 0.0, size
+    return new_size, price, new_size, -old_size
+
+
+@njit(cache=True)
+def simulate(
+    open, high, low, close, buy_signal, sell_signal, trail_percent, start, cash
+):
+    """
+    Run the order, cash and trailing stop bookkeeping bar by bar.
+    Returns the final portfolio value and the executions as rows of
+    (bar, ticker, size, price).
+    """
+    n_bars, n_tickers = close.shape
+    max_orders = 3 * n_bars * n_tickers + 1
+    order_ticker = np.empty(max_orders, dtype=np.int64)
+    order_kind = np.empty(max_orders, dtype=np.int64)
+    order_size = np.empty(max_orders, dtype=np.float64)
+    order_price = np.empty(max_orders, dtype=np.float64)
+    order_trail = np.empty(max_orders, dtype=np.float64)
+    order_bar = np.empty(max_orders, dtype=np.int64)
+    order_status = np.empty(max_orders, dtype=np.int64)
+    filled = np.empty(max_orders, dtype=np.int64)
+    eligible = np.empty(n_tickers, dtype=np.int64)
+    affordable = np.empty(n_tickers, dtype=np.int64)
+    trades = np.empty((max_orders, 4), dtype=np.float64)
+    n_orders = 0
+    n_trades = 0
+    first_live = 0
+
+    position = np.zeros(n_tickers)
+    position_price = np.zeros(n_tickers)
+
+    for t in range(n_bars):
+        while first_live < n_orders and order_status[first_live] == DONE:
+            first_live += 1
+
+        # Accept orders submitted on the previous bar if cash allows,
+        # pseudo-executing them at their creation price in submission order
+        check_cash = cash
+        check_position = position.copy()
+        check_price = position_price.copy()
+        for k in range(first_live, n_orders):
+            if order_status[k] != SUBMITTED:
+                continue
+            j = order_ticker[k]
+            price = order_price[k]
+            new_size, new_price, opened, closed = _position_update(
+                order_size[k], price, check_position[j], check_price[j]
+            )
+            check_position[j] = new_size
+            check_price[j] = new_price
+            if closed != 0:
+                check_cash -= closed * price
+            if opened != 0:
+                check_cash -= opened * price
+            order_status[k] = ACCEPTED if check_cash >= 0.0 else DONE
+
+        # Execute accepted orders in acceptance order
+        n_filled = 0
+        for k in range(first_live, n_orders):
+            if order_status[k] != ACCEPTED:
+                continue
+            j = order_ticker[k]
+            if order_kind[k] == MARKET:
+                if order_bar[k] >= t:
+                    continue
+                price = open[t, j]
+            elif open[t, j] <= order_price[k]:
+                price = open[t, j]
+            elif low[t, j] <= order_price[k]:
+                price = order_price[k]
+            else:
+                # Not triggered, trail the close
+                trailed = close[t, j] - close[t, j] * order_trail[k]
+                if trailed > order_price[k]:
+                    order_price[k] = trailed
+                continue
+
+            size = order_size[k]
+            _, _, opened, closed = _position_update(
+                size, price, position[j], position_price[j]
+            )
+            if closed != 0:
+                cash -= closed * price
+            executed_opened = opened
+            if opened != 0:
+                remaining = cash - opened * price
+                if remaining < 0.0:
+                    executed_opened = 0.0
+                else:
+                    cash = remaining
+            executed = closed + executed_opened
+            if executed != 0:
+                position[j], position_price[j], _, _ = _position_update(
+                    executed, price, position[j], position_price[j]
+                )
+                trades[n_trades, 0] = t
+                trades[n_trades, 1] = j
+                trades[n_trades, 2] = executed
+                trades[n_trades, 3] = price
+                n_trades += 1
+            order_status[k] = DONE
+            if opened == executed_opened and size > 0:
+                filled[n_filled] = k
+                n_filled += 1
+
+        if t < start:
+            continue
+
+        # notify_order: a completed buy places a trailing stop for its size
+        for f in range(n_filled):
+            k = filled[f]
+            j = order_ticker[k]
+            order_ticker[n_orders] = j
+            order_kind[n_orders] = STOP_TRAIL
+            order_size[n_orders] = -order_size[k]
+            order_trail[n_orders] = trail_percent[t, j]
+            order_price[n_orders] = close[t, j] - close[t, j] * trail_percent[t, j]
+            order_bar[n_orders] = t
+            order_status[n_orders] = SUBMITTED
+            n_orders += 1
+
+        # handle_sell_signals
+        for j in range(n_tickers):
+            if position[j] == 0 or not sell_signal[t, j]:
+                continue
+            for k in range(first_live, n_orders):
+                if order_status[k] == ACCEPTED and order_size[k] < 0:
+                    order_status[k] = DONE
+            order_ticker[n_orders] = j
+            order_kind[n_orders] = MARKET
+            order_size[n_orders] = -position[j]
+            order_price[n_orders] = close[t, j]
+            order_bar[n_orders] = t
+            order_status[n_orders] = SUBMITTED
+            n_orders += 1
+
+        # handle_buy_signals
+        n_eligible = 0
+        for j in range(n_tickers):
+            if buy_signal[t, j]:
+                eligible[n_eligible] = j
+                n_eligible += 1
+        budget_cash = cash * 0.9
+        num_affordable = n_eligible
+        n_affordable = 0
+        for e in range(n_eligible):
+            j = eligible[e]
+            if close[t, j] <= budget_cash / num_affordable:
+                affordable[n_affordable] = j
+                n_affordable += 1
+            else:
+                num_affordable -= 1
+        if n_affordable == 0:
+            continue
+        budget_per_stock = budget_cash / n_affordable
+        for a in range(n_affordable):
+            j = affordable[a]
+            size = int(budget_per_stock / close[t, j])
+            if size > 0:
+                order_ticker[n_orders] = j
+                order_kind[n_orders] = MARKET
+                order_size[n_orders] = size
+                order_price[n_orders] = close[t, j]
+                order_bar[n_orders] = t
+                order_status[n_orders] = SUBMITTED
+                n_orders += 1
+
+    value = 0.0
+    for j in range(n_tickers):
+        value += position[j] * close[n_bars - 1, j]
+    return cash + value, trades[:n_trades]
+
+
+def run_vector_backtest(data, tickers, cache=None, trades=False, **kwargs):
+    """
+    Run the SwingStrategy rules over a yfinance-shaped download and return the
+    final portfolio value, like cerebro.broker.getvalue().
+    With `trades` also return the executions as (date, ticker, size, price).
+    """
+    if cache is None:
+        cache = IndicatorCache(data)
+    panel = cache.prices(tickers)
+    buy_signal, sell_signal, trail_percent, start = compute_signals(
+        data, tickers, cache=cache, **kwargs
+    )
+    value, executions = simulate(
+        panel["open"],
+        panel["high"],
+        panel["low"],
+        panel["close"],
+        buy_signal,
+        sell_signal,
+        trail_percent,
+        start,
+        float(CASH),
+    )
+    if not trades:
+        return value
+    return value, [
+        (data.index[int(bar)].date(), tickers[int(ticker)], size, price)
+        for bar, ticker, size, price in executions
+    ]
@@ -0,0 +1,186 @@
+"""
+Walk-forward evaluation of SwingStrategy parameters.
+
+History is split into rolling train/test windows. On each train window every
+parameter combination is backtested and the best one is scored on the test
+window that follows it.
+
+Indicators only look back, so signals are computed once per combination over
+the whole price panel, and each window runs the vector engine on row slices
+(views) of those arrays instead of re-slicing the download or re-running the
+full history.
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import pandas as pd
+
+from parameters import *
+from indicator_cache import IndicatorCache, indicator_key
+from strat import load_prices
+from vector_engine import compute_signals, simulate
+
+# Price arrays, dates, combinations and their signals shared by window
+# workers, set once per process
+_prices = None
+_dates = None
+_combinations = None
+_signals = None
+
+
+def _init_walk_forward(prices, dates, combinations, signals):
+    """Keep the shared arrays in the worker (inherited without copying under fork)."""
+    global _prices, _dates, _combinations, _signals
+    _prices, _dates, _combinations, _signals = prices, dates, combinations, signals
+
+
+def walk_forward_windows(n_bars, train_bars, test_bars, step=None) -> list:
+    """
+    Split n_bars into rolling (train_start, test_start, test_end) windows,
+    each test window directly following its train window
+    """
+    step = step or test_bars
+    return [
+        (start, start + train_bars, start + train_bars + test_bars)
+        for start in range(0, n_bars - train_bars - test_bars + 1, step)
+    ]
+
+
+def simulate_slice(index, start, end) -> float:
+    """
+    Backtest one combination on bars [start, end) of the shared arrays
+    """
+    buy_signal, sell_signal, trail_percent, warmup_start = _signals[index]
+    window = slice(start, end)
+    value, _ = simulate(
+        _prices["open"][window],
+        _prices["high"][window],
+        _prices["low"][window],
+        _prices["close"][window],
+        buy_signal[window],
+        sell_signal[window],
+        trail_percent[window],
+        max(warmup_start - start, 0),
+        float(CASH),
+    )
+    return value
+
+
+def evaluate_window(window) -> dict:
+    """
+    Pick the best combination on the train window and score it on the test window
+    """
+    train_start, test_start, test_end = window
+    train_values = [
+        simulate_slice(index, train_start, test_start)
+        for index in range(len(_combinations))
+    ]
+    best = max(range(len(_combinations)), key=train_values.__getitem__)
+    test_values = [
+        simulate_slice(index, test_start, test_end)
+        for index in range(len(_combinations))
+    ]
+    close = _prices["close"]
+    # Equal-weight buy and hold of every ticker over the test window
+    benchmark = (close[test_end - 1] / close[test_start]).mean()
+    return {
+        "train_start": _dates[train_start],
+        "test_start": _dates[test_start],
+        "test_end": _dates[test_end - 1],
+        **_combinations[best],
+        "train_return_pct": (train_values[best] / CASH - 1) * 100,
+        "test_return_pct": (test_values[best] / CASH - 1) * 100,
+        "best_test_return_pct": (max(test_values) / CASH - 1) * 100,
+        # Share of combinations the train pick beat on the test window
+        "test_percentile": sum(value < test_values[best] for value in test_values)
+        / len(test_values)
+        * 100,
+        "benchmark_return_pct": (benchmark - 1) * 100,
+    }
+
+
+def walk_forward(
+    data, tickers, grid: dict, train_bars=126, test_bars=42, step=None, workers=1
+) -> pd.DataFrame:
+    """
+    Run the walk-forward evaluation of a parameter grid and return one row of
+    metrics per window
+    """
+    combinations = sorted(
+        (
+            dict(zip(grid.keys(), values))
+            for values in itertools.product(*grid.values())
+        ),
+        key=indicator_key,
+    )
+    cache = IndicatorCache(data)
+    signals = [
+        compute_signals(data, tickers, cache=cache, **params) for params in combinations
+    ]
+    prices = cache.prices(tickers)
+    windows = walk_forward_windows(len(data), train_bars, test_bars, step)
+    print(f"{len(combinations)} combinations over {len(windows)} windows")
+
+    shared = (prices, list(data.index), combinations, signals)
+    if workers > 1:
+        with multiprocessing.Pool(
+            workers, initializer=_init_walk_forward, initargs=shared
+        ) as pool:
+            metrics = pool.map(evaluate_window, windows)
+    else:
+        _init_walk_forward(*shared)
+        metrics = [evaluate_window(window) for window in windows]
+    return pd.DataFrame(metrics)
+
+
+def summarize(metrics: pd.DataFrame):
+    """
+    Print robustness numbers across all test windows
+    """
+    print("\nWalk-forward Summary")
+    print("-" * 40)
+    print(f"Windows:                 {len(metrics)}")
+    print(f"Mean Test Return:        {metrics['test_return_pct'].mean():.2f}%")
+    print(f"Median Test Return:      {metrics['test_return_pct'].median():.2f}%")
+    print(
+        f"Profitable Windows:      {(metrics['test_return_pct'] > 0).mean() * 100:.0f}%"
+    )
+    print(f"Mean Benchmark Return:   {metrics['benchmark_return_pct'].mean():.2f}%")
+    print(f"Mean Test Percentile:    {metrics['test_percentile'].mean():.0f}")
+    print("-" * 40)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Walk-forward SwingStrategy evaluation"
+    )
+    parser.add_argument("--train-bars", type=int, default=126)
+    parser.add_argument("--test-bars", type=int, default=42)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes, windows run in parallel",
+    )
+    args = parser.parse_args()
+
+    parameter_grid = dict(
+        bollinger_period=[10, 14, 20],
+        bollinger_std=[0.5, 0.8, 1, 1.5],
+        atr_period=[7, 14],
+        atr_multiplier=[1, 1.5, 2],
+    )
+    data = load_prices().dropna(axis=1)
+    tickers = data.columns.get_level_values(1).unique().tolist()
+    metrics = walk_forward(
+        data,
+        tickers,
+        parameter_grid,
+        train_bars=args.train_bars,
+        test_bars=args.test_bars,
+        workers=args.workers,
+    )
+    print(metrics.to_string())
+    metrics.to_csv(f"walk_forward_{START_DATE}.csv", index=False)
+    summarize(metrics)
@@ -0,0 +1,478 @@
+"""
+In-process stand-ins for the alpaca-py clients the strategy uses.
+
+FakeBroker implements the TradingClient calls (positions, account, orders
+with filters, order submission and cancellation) and FakeMarketData the
+StockHistoricalDataClient bars request, both with configurable latency.
+They are built from a recorded day: a JSON file of the account, positions,
+orders and daily bars, as written by `record_day` or `synthetic_day`.
+"""
+
+import dataclasses
+import datetime
+import json
+import threading
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from alpaca.common.exceptions import APIError
+from alpaca.data.models import BarSet
+from alpaca.trading.enums import (
+    OrderSide,
+    OrderStatus,
+    OrderType,
+    QueryOrderStatus,
+    TimeInForce,
+)
+
+OPEN_STATUSES = {
+    OrderStatus.NEW,
+    OrderStatus.ACCEPTED,
+    OrderStatus.PENDING_NEW,
+    OrderStatus.PARTIALLY_FILLED,
+    OrderStatus.HELD,
+}
+
+
+@dataclasses.dataclass
+class FakePosition:
+    symbol: str
+    qty: str
+    qty_available: str
+    avg_entry_price: str = "0"
+
+
+@dataclasses.dataclass
+class FakeAsset:
+    symbol: str
+    exchange: str = "NASDAQ"
+    tradable: bool = True
+    fractionable: bool = True
+
+
+@dataclasses.dataclass
+class FakeAccount:
+    cash: str
+    buying_power: str
+    equity: str
+
+
+@dataclasses.dataclass
+class FakeOrder:
+    symbol: str
+    side: OrderSide
+    type: OrderType
+    status: OrderStatus
+    submitted_at: datetime.datetime
+    qty: str = None
+    notional: str = None
+    trail_percent: str = None
+    time_in_force: TimeInForce = TimeInForce.DAY
+    filled_at: datetime.datetime = None
+    filled_qty: str = "0"
+    filled_avg_price: str = None
+    id: uuid.UUID = dataclasses.field(default_factory=uuid.uuid4)
+
+
+def sleep(latency, method: str):
+    """
+    Sleep for a latency given in seconds, either for every method or per method name
+    """
+    seconds = latency.get(method, 0.0) if isinstance(latency, dict) else latency
+    if seconds:
+        time.sleep(seconds)
+
+
+class FakeBroker:
+    """
+    TradingClient subset. Market orders fill at once at the latest close when
+    `fill_market_orders` is set, other orders stay open until cancelled.
+    """
+
+    def __init__(
+        self,
+        account: dict,
+        positions: list,
+        orders: list,
+        prices: dict,
+        latency=0.0,
+        fill_market_orders: bool = True,
+    ):
+        self.cash = float(account["cash"])
+        self.positions = {
+            position["symbol"]: [
+                float(position["qty"]),
+                float(position["qty_available"]),
+            ]
+            for position in positions
+        }
+        self.orders = [self._order_from_dict(order) for order in orders]
+        self.prices = prices
+        self.latency = latency
+        self.fill_market_orders = fill_market_orders
+        self.submitted = []
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _order_from_dict(order: dict) -> FakeOrder:
+        fields = dict(order)
+        fields["side"] = OrderSide(fields["side"])
+        fields["type"] = OrderType(fields["type"])
+        fields["status"] = OrderStatus(fields["status"])
+        fields["time_in_force"] = TimeInForce(fields.get("time_in_force") or "day")
+        for name in ("submitted_at", "filled_at"):
+            if fields.get(name):
+                fields[name] = datetime.datetime.fromisoformat(fields[name])
+        fields.pop("id", None)
+        return FakeOrder(**fields)
+
+    def _equity(self) -> float:
+        return self.cash + sum(
+            qty * self.prices.get(symbol, 0.0)
+            for symbol, (qty, _) in self.positions.items()
+        )
+
+    def get_account(self):
+        sleep(self.latency, "get_account")
+        with self.lock:
+            return FakeAccount(
+                cash=str(self.cash),
+                buying_power=str(max(self.cash, 0.0)),
+                equity=str(self._equity()),
+            )
+
+    def get_all_assets(self, filter=None):
+        sleep(self.latency, "get_all_assets")
+        return [FakeAsset(symbol) for symbol in self.prices]
+
+    def get_all_positions(self):
+        sleep(self.latency, "get_all_positions")
+        with self.lock:
+            return [
+                FakePosition(symbol, str(qty), str(available))
+                for symbol, (qty, available) in self.positions.items()
+                if qty > 0
+            ]
+
+    def get_orders(self, filter=None):
+        sleep(self.latency, "get_orders")
+        with self.lock:
+            orders = list(self.orders)
+        if filter is not None:
+            if filter.status == QueryOrderStatus.OPEN:
+                orders = [order for order in orders if order.status in OPEN_STATUSES]
+            elif filter.status == QueryOrderStatus.CLOSED:
+                orders = [
+                    order for order in orders if order.status not in OPEN_STATUSES
+                ]
+            if filter.side is not None:
+                orders = [order for order in orders if order.side == filter.side]
+            if filter.symbols:
+                orders = [order for order in orders if order.symbol in filter.symbols]
+            if filter.after is not None:
+                after = pd.Timestamp(filter.after)
+                after = after.tz_localize("UTC") if after.tzinfo is None else after
+                orders = [order for order in orders if order.submitted_at > after]
+            if filter.until is not None:
+                until = pd.Timestamp(filter.until)
+                until = until.tz_localize("UTC") if until.tzinfo is None else until
+                orders = [order for order in orders if order.submitted_at < until]
+        ascending = filter is not None and filter.direction == "asc"
+        orders.sort(key=lambda order: order.submitted_at, reverse=not ascending)
+        limit = filter.limit if filter is not None and filter.limit else 50
+        return orders[:limit]
+
+    def submit_order(self, order_data):
+        sleep(self.latency, "submit_order")
+        now = datetime.datetime.now(datetime.timezone.utc)
+        symbol, side = order_data.symbol, order_data.side
+        with self.lock:
+            held = self.positions.setdefault(symbol, [0.0, 0.0])
+            if side == OrderSide.SELL and order_data.qty > held[1] + 1e-9:
+                raise APIError(
+                    json.dumps(
+                        {
+                            "code": 40310000,
+                            "message": "insufficient qty available for order "
+                            f"(requested: {order_data.qty}, available: {held[1]})",
+                        }
+                    )
+                )
+            order = FakeOrder(
+                symbol=symbol,
+                side=side,
+                type=order_data.type,
+                status=OrderStatus.ACCEPTED,
+                submitted_at=now,
+                qty=None if order_data.qty is None else str(order_data.qty),
+                notional=(
+                    None if order_data.notional is None else str(order_data.notional)
+                ),
+                trail_percent=getattr(order_data, "trail_percent", None),
+                time_in_force=order_data.time_in_force,
+            )
+            price = self.prices[symbol]
+            if order.type == OrderType.MARKET and self.fill_market_orders:
+                qty = (
+                    order_data.qty
+                    if order_data.qty is not None
+                    else order_data.notional / price
+                )
+                signed = qty if side == OrderSide.BUY else -qty
+                held[0] += signed
+                held[1] += signed
+                self.cash -= signed * price
+                order.status = OrderStatus.FILLED
+                order.filled_at = now
+                order.filled_qty = str(qty)
+                order.filled_avg_price = str(price)
+            elif side == OrderSide.SELL:
+                # Open sell orders hold their quantity until filled or cancelled
+                held[1] -= order_data.qty
+            self.orders.append(order)
+            self.submitted.append(order)
+        return order
+
+    def cancel_order_by_id(self, order_id):
+        sleep(self.latency, "cancel_order_by_id")
+        with self.lock:
+            for order in self.orders:
+                if order.id == order_id and order.status in OPEN_STATUSES:
+                    order.status = OrderStatus.CANCELED
+                    if order.side == OrderSide.SELL and order.qty is not None:
+                        self.positions[order.symbol][1] += float(order.qty)
+                    return
+        raise APIError(json.dumps({"code": 40410000, "message": "order not found"}))
+
+
+class FakeMarketData:
+    """
+    StockHistoricalDataClient subset serving recorded daily bars
+    """
+
+    def __init__(self, bars: dict, latency=0.0):
+        # symbol -> (bar timestamps, raw bars as returned by the API)
+        self.bars = {
+            symbol: (pd.DatetimeIndex([bar["t"] for bar in raw]), raw)
+            for symbol, raw in bars.items()
+        }
+        self.latency = latency
+
+    def get_stock_bars(self, request_params):
+        sleep(self.latency, "get_stock_bars")
+        symbols = request_params.symbol_or_symbols
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        start = pd.Timestamp(request_params.start)
+        start = start.tz_localize("UTC") if start.tzinfo is None else start
+        end = request_params.end
+        if end is not None:
+            end = pd.Timestamp(end)
+            end = end.tz_localize("UTC") if end.tzinfo is None else end
+        raw_data = {}
+        for symbol in symbols:
+            if symbol not in self.bars:
+                continue
+            timestamps, raw = self.bars[symbol]
+            lo = timestamps.searchsorted(start, side="left")
+            hi = len(raw) if end is None else timestamps.searchsorted(end, side="right")
+            if hi > lo:
+                raw_data[symbol] = raw[lo:hi]
+        return BarSet(raw_data)
+
+
+def load_day(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def shift_to_today(day: dict) -> dict:
+    """
+    Move every timestamp of a recorded day forward by whole days so the
+    recorded session is today, the strategy requests bars relative to now
+    """
+    recorded = datetime.date.fromisoformat(day["date"])
+    offset = datetime.timedelta(days=(datetime.date.today() - recorded).days)
+
+    def shift(timestamp: str) -> str:
+        return (datetime.datetime.fromisoformat(timestamp) + offset).isoformat()
+
+    shifted = dict(day, date=datetime.date.today().isoformat())
+    shifted["bars"] = {
+        symbol: [dict(bar, t=shift(bar["t"])) for bar in bars]
+        for symbol, bars in day["bars"].items()
+    }
+    shifted["orders"] = [
+        {
+            **order,
+            **{
+                name: shift(order[name])
+                for name in ("submitted_at", "filled_at")
+                if order.get(name)
+            },
+        }
+        for order in day["orders"]
+    ]
+    return shifted
+
+
+def build_clients(day: dict, latency=0.0, fill_market_orders: bool = True):
+    """
+    Build a FakeBroker and FakeMarketData replaying a recorded day
+    """
+    day = shift_to_today(day)
+    prices = {symbol: bars[-1]["c"] for symbol, bars in day["bars"].items() if bars}
+    broker = FakeBroker(
+        day["account"],
+        day["positions"],
+        day["orders"],
+        prices,
+        latency=latency,
+        fill_market_orders=fill_market_orders,
+    )
+    return broker, FakeMarketData(day["bars"], latency=latency)
+
+
+def synthetic_day(symbols: list, days: int = 60, seed: int = 0) -> dict:
+    """
+    Generate a deterministic day: random-walk daily bars, positions in a few
+    stocks protected by trailing stops, and one trailing stop filled overnight
+    """
+    from price_store import fixture_bars
+
+    rng = np.random.default_rng(seed)
+    today = datetime.date.today()
+    bars = fixture_bars(
+        symbols, today - datetime.timedelta(days=days * 7 // 5), days, seed
+    )
+    raw_bars = {}
+    for symbol, df in bars.items():
+        timestamps = df.index.tz_localize("US/Eastern").tz_convert("UTC")
+        raw_bars[symbol] = [
+            {
+                "t": timestamp.isoformat(),
+                "o": row.open,
+                "h": row.high,
+                "l": row.low,
+                "c": row.close,
+                "v": row.volume,
+                "n": 1000,
+                "vw": row.close,
+            }
+            for timestamp, row in zip(timestamps, df.itertuples())
+        ]
+    date = pd.Timestamp(bars[symbols[0]].index[-1]).date()
+    now = datetime.datetime.combine(date, datetime.time(14, 30), datetime.timezone.utc)
+    held = list(rng.choice(symbols, size=min(8, len(symbols)), replace=False))
+    positions, orders = [], []
+    for i, symbol in enumerate(held):
+        qty = int(rng.integers(5, 50))
+        filled = i == 0
+        positions.append(
+            {
+                "symbol": symbol,
+                "qty": str(qty),
+                "qty_available": str(0 if not filled else qty),
+            }
+        )
+        orders.append(
+            {
+                "symbol": symbol,
+                "side": "sell",
+                "type": "trailing_stop",
+                "status": "filled" if filled else "new",
+                "qty": str(qty),
+                "trail_percent": "4",
+                "time_in_force": "gtc",
+                "submitted_at": (now - datetime.timedelta(days=3)).isoformat(),
+                "filled_at": (
+                    (now - datetime.timedelta(hours=12)).isoformat() if filled else None
+                ),
+            }
+        )
+    return {
+        "date": date.isoformat(),
+        "account": {"cash": "100000", "buying_power": "100000", "equity": "100000"},
+        "positions": positions,
+        "orders": orders,
+        "bars": raw_bars,
+    }
+
+
+def record_day(path: str, symbols: list, days: int = 60):
+    """
+    Record today's account, positions, recent orders and daily bars from the
+    live clients into a day file
+    """
+    from alpaca.trading.requests import GetOrdersRequest
+    from config import get_trade_client, get_data_client
+    from order_book import get_all_orders
+    from alpaca.data.requests import StockBarsRequest
+    from alpaca.data.timeframe import TimeFrame
+
+    trade_client = get_trade_client()
+    account = trade_client.get_account()
+    positions = trade_client.get_all_positions()
+    since = datetime.datetime.now() - datetime.timedelta(days=7)
+    orders = get_all_orders(GetOrdersRequest(status=QueryOrderStatus.ALL, after=since))
+    bars = get_data_client().get_stock_bars(
+        StockBarsRequest(
+            symbol_or_symbols=list(
+                dict.fromkeys(symbols + [p.symbol for p in positions])
+            ),
+            timeframe=TimeFrame.Day,
+            start=datetime.datetime.now() - datetime.timedelta(days=days),
+        )
+    )
+    day = {
+        "date": datetime.date.today().isoformat(),
+        "account": {
+            "cash": str(account.cash),
+            "buying_power": str(account.buying_power),
+            "equity": str(account.equity),
+        },
+        "positions": [
+            {
+                "symbol": p.symbol,
+                "qty": str(p.qty),
+                "qty_available": str(p.qty_available),
+            }
+            for p in positions
+        ],
+        "orders": [
+            {
+                "symbol": order.symbol,
+                "side": order.side.value,
+                "type": order.type.value,
+                "status": order.status.value,
+                "qty": None if order.qty is None else str(order.qty),
+                "notional": None if order.notional is None else str(order.notional),
+                "trail_percent": (
+                    None if order.trail_percent is None else str(order.trail_percent)
+                ),
+                "time_in_force": order.time_in_force.value,
+                "submitted_at": order.submitted_at.isoformat(),
+                "filled_at": order.filled_at.isoformat() if order.filled_at else None,
+            }
+            for order in orders
+        ],
+        "bars": {
+            symbol: [
+                {
+                    "t": bar.timestamp.isoformat(),
+                    "o": bar.open,
+                    "h": bar.high,
+                    "l": bar.low,
+                    "c": bar.close,
+                    "v": bar.volume,
+                    "n": bar.trade_count,
+                    "vw": bar.vwap,
+                }
+                for bar in symbol_bars
+            ]
+            for symbol, symbol_bars in bars.data.items()
+        },
+    }
+    with open(path, "w") as file:
+        json.dump(day, file)
@@ -0,0 +1,191 @@
+"""
+Compare API call latency with and without pooled keep-alive connections
+against a local HTTPS stand-in of the Alpaca API.
+
+    python benchmark/keep_alive.py                   # 20 ms simulated round trip
+    python benchmark/keep_alive.py --rtt 40 --calls 100 --threads 8
+
+The stand-in delays every new connection by two round trips (TCP and TLS 1.3
+handshakes) and every request by one, so the handshake cost of a real host
+can be reproduced locally. Needs the openssl command for a throwaway certificate.
+"""
+
+import argparse
+import os
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+import http_pool
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body = b'{"status": "ACTIVE"}'
+
+    def do_GET(self):
+        time.sleep(self.server.rtt)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def do_HEAD(self):
+        time.sleep(self.server.rtt)
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class StandIn(ThreadingHTTPServer):
+    """
+    HTTPS server with a simulated network round trip
+    """
+
+    daemon_threads = True
+
+    def __init__(self, cert: str, key: str, rtt: float):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.rtt = rtt
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(cert, key)
+
+    def finish_request(self, request, client_address):
+        # TCP and TLS handshakes, both paid once per connection
+        time.sleep(2 * self.rtt)
+        try:
+            request = self.context.wrap_socket(request, server_side=True)
+        except (ssl.SSLError, OSError):
+            return
+        super().finish_request(request, client_address)
+
+
+def make_certificate(directory: str):
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=127.0.0.1",
+            "-addext",
+            "subjectAltName=IP:127.0.0.1",
+            "-keyout",
+            key,
+            "-out",
+            cert,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def run_calls(get, url: str, calls: int, threads: int) -> list:
+    """
+    Make `calls` GET requests from `threads` threads, returns the latency of each call
+    """
+
+    def call(_):
+        start = time.perf_counter()
+        get(url).raise_for_status()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(call, range(calls)))
+
+
+def report(name: str, latencies: list, connections):
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    print(
+        f"{name:<28} first {latencies[0] * 1000:7.1f} ms  "
+        f"p50 {statistics.median(latencies_ms):7.1f} ms  "
+        f"p95 {latencies_ms[int(0.95 * (len(latencies_ms) - 1))]:7.1f} ms  "
+        f"connections {connections}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark pooled keep-alive connections"
+    )
+    parser.add_argument(
+        "--rtt", type=float, default=20.0, help="simulated round trip in ms"
+    )
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=config.ORDER_WORKERS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = make_certificate(directory)
+        server = StandIn(cert, key, args.rtt / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"https://127.0.0.1:{server.server_address[1]}/v2/account"
+        print(
+            f"{args.calls} calls, {args.threads} threads, {args.rtt:.0f} ms round trip"
+        )
+        print("-" * 100)
+
+        # A new connection for every call
+        def fresh_get(url):
+            with requests.Session() as session:
+                return session.get(url, verify=cert)
+
+        report(
+            "new connection per call",
+            run_calls(fresh_get, url, args.calls, args.threads),
+            args.calls,
+        )
+
+        # alpaca-py's default session
+        session = requests.Session()
+        latencies = run_calls(
+            lambda u: session.get(u, verify=cert), url, args.calls, args.threads
+        )
+        report("default session", latencies, http_pool.connections_opened(session))
+
+        # Keep-alive pool sized to the threads, cold then warmed before the first call
+        for warmed in (False, True):
+            session = http_pool.configure_session(
+                requests.Session(), args.threads, config.HTTP_KEEPALIVE_IDLE
+            )
+            session.verify = cert
+            # Otherwise REQUESTS_CA_BUNDLE replaces the stand-in's certificate
+            session.trust_env = False
+            if warmed:
+                http_pool.warm(session, url, args.threads)
+            opened = http_pool.connections_opened(session)
+            latencies = run_calls(session.get, url, args.calls, args.threads)
+            report(
+                "keep-alive pool" + (", warmed" if warmed else ""),
+                latencies,
+                http_pool.connections_opened(session) - opened,
+            )
+        # A second run on the same session, as in a warm Lambda invocation
+        opened = http_pool.connections_opened(session)
+        latencies = run_calls(session.get, url, args.calls, args.threads)
+        report(
+            "keep-alive pool, next run",
+            latencies,
+            http_pool.connections_opened(session) - opened,
+        )
+        server.shutdown()
@@ -0,0 +1,142 @@
+"""
+Replay a recorded day through the trading run against the fake broker and
+market data client, and report wall time and API calls per stage.
+
+    python benchmark/run_day.py                    # synthetic day over STOCKS
+    python benchmark/run_day.py --day day.json --latency 30 --repeat 5
+    python benchmark/run_day.py --universe 5000    # screener, 5000 synthetic stocks
+    python benchmark/run_day.py --record day.json  # record today (needs API keys)
+
+Every repeat starts from the same day, so results are reproducible.
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+import metrics
+from api_scheduler import Scheduler, ScheduledClient
+from fake_alpaca import build_clients, load_day, record_day, synthetic_day
+
+STAGES = ("sell_stocks", "place_trailing_stop", "buy_stocks")
+
+
+def fresh_scheduler(api: str) -> Scheduler:
+    """
+    Build a scheduler with full buckets, so a run does not wait on the tokens
+    spent by the run before it
+    """
+    return Scheduler(
+        config.API_REQUESTS_PER_MINUTE[api],
+        config.API_BURST,
+        config.API_MAX_RETRIES,
+        config.API_RETRY_DELAY,
+    )
+
+
+def run_day(day: dict, latency: float = 0.0) -> dict:
+    """
+    Run all stages once on fresh fake clients, returns the run metrics and the
+    orders submitted
+    """
+    import screener
+    import strategy
+    import util
+
+    broker, market_data = build_clients(day, latency=latency)
+    config._trade_client = metrics.InstrumentedClient(
+        ScheduledClient(broker, fresh_scheduler("trading"))
+    )
+    config._data_client = metrics.InstrumentedClient(
+        ScheduledClient(market_data, fresh_scheduler("data"))
+    )
+    util.clear_bar_cache()
+    screener.clear_candidates()
+    metrics.reset()
+    start = time.perf_counter()
+    for stage in STAGES:
+        with metrics.stage(stage):
+            getattr(strategy, stage)()
+    wall = time.perf_counter() - start
+    run = metrics.summary()
+    metrics.reset()
+    util.clear_bar_cache()
+    screener.clear_candidates()
+    run["wall_ms"] = wall * 1000
+    run["orders"] = sorted(
+        (order.symbol, order.side.value, order.type.value, order.qty, order.notional)
+        for order in broker.submitted
+    )
+    return run
+
+
+def report(runs: list):
+    """
+    Print median wall time per stage and the API calls of the run
+    """
+    wall_ms = statistics.median(run["wall_ms"] for run in runs)
+    print(f"\n{len(runs)} runs, median wall time {wall_ms:.1f} ms")
+    print("-" * 60)
+    for stage in STAGES:
+        times = [run["stages_ms"].get(stage, 0.0) for run in runs]
+        print(f"{stage:<25} {statistics.median(times):9.1f} ms")
+    print("-" * 60)
+    for call in runs[-1]["calls"]:
+        print(
+            f"{call['stage']:<20} {call['call']:<20} x{call['count']:<4} "
+            f"total {call['total_ms']:8.1f} ms  payload {call['payload']}"
+        )
+    deterministic = all(run["orders"] == runs[0]["orders"] for run in runs)
+    print("-" * 60)
+    orders = len(runs[0]["orders"])
+    print(f"Orders submitted: {orders}, identical across runs: {deterministic}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the trading run on a recorded day"
+    )
+    parser.add_argument(
+        "--day", help="day file, a synthetic day over STOCKS by default"
+    )
+    parser.add_argument(
+        "--record", help="record today from the live clients into this file"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="milliseconds per API call"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic day")
+    parser.add_argument(
+        "--universe",
+        type=int,
+        help="enable the screener over a synthetic day of this many stocks",
+    )
+    parser.add_argument("--verbose", action="store_true", help="show the strategy logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s"
+    )
+    if args.record:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        record_day(args.record, config.STOCKS)
+        print(f"Recorded {args.record}")
+        sys.exit()
+
+    symbols = config.STOCKS
+    if args.universe:
+        import strategy
+
+        strategy.SCREENER_ENABLED = True
+        symbols = [f"S{i:04d}" for i in range(args.universe)]
+    day = load_day(args.day) if args.day else synthetic_day(symbols, seed=args.seed)
+    runs = [run_day(day, latency=args.latency / 1000) for _ in range(args.repeat)]
+    report(runs)
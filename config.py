@@ -1,20 +1,137 @@
 import os
-from alpaca.trading.client import TradingClient
-from alpaca.data.historical import StockHistoricalDataClient
+import threading
+import time
+from metrics import InstrumentedClient
 
-
-# Alpaca API keys
-ALPACA_API_KEY = os.getenv("ALPACA_API_KEY")
-ALPACA_SECRET_KEY = os.getenv("ALPACA_SECRET_KEY")
+# Alpaca API keys are read from the environment when the clients are first built
 PAPER = True
 
-# Initialize the trading client
-trade_client = TradingClient(
-    api_key=ALPACA_API_KEY, secret_key=ALPACA_SECRET_KEY, paper=PAPER
-)
-data_client = StockHistoricalDataClient(
-    api_key=ALPACA_API_KEY, secret_key=ALPACA_SECRET_KEY
-)
+# Clients are built lazily on first use and reused across warm invocations
+_trade_client = None
+_data_client = None
+_schedulers = {}
+_scheduler_lock = threading.Lock()
+_client_lock = threading.Lock()
+client_init_seconds = {}
+
+
+def get_scheduler(api: str):
+    """
+    Get the request scheduler of the "trading" or "data" API, shared by every
+    client of that API since the rate limit is per account
+    """
+    with _scheduler_lock:
+        if api not in _schedulers:
+            from api_scheduler import Scheduler
+
+            _schedulers[api] = Scheduler(
+                API_REQUESTS_PER_MINUTE[api],
+                API_BURST,
+                API_MAX_RETRIES,
+                API_RETRY_DELAY,
+            )
+    return _schedulers[api]
+
+
+def get_trade_client():
+    """
+    Get the trading client, building it on first use
+    """
+    global _trade_client
+    with _client_lock:
+        if _trade_client is None:
+            start = time.perf_counter()
+            from alpaca.trading.client import TradingClient
+            from api_scheduler import ScheduledClient
+            import http_pool
+
+            client = TradingClient(
+                api_key=os.getenv("ALPACA_API_KEY"),
+                secret_key=os.getenv("ALPACA_SECRET_KEY"),
+                paper=PAPER,
+            )
+            scheduler = get_scheduler("trading")
+            http_pool.configure_session(
+                client._session,
+                HTTP_POOL_SIZE["trading"],
+                HTTP_KEEPALIVE_IDLE,
+                scheduler,
+            )
+            # The session takes the tokens, one per page of a paginated call
+            _trade_client = InstrumentedClient(
+                ScheduledClient(client, scheduler, paced=False)
+            )
+            client_init_seconds["trade_client"] = time.perf_counter() - start
+    return _trade_client
+
+
+def get_data_client():
+    """
+    Get the historical market data client, building it on first use
+    """
+    global _data_client
+    with _client_lock:
+        if _data_client is None:
+            start = time.perf_counter()
+            from alpaca.data.historical import StockHistoricalDataClient
+            from api_scheduler import ScheduledClient
+            import http_pool
+
+            client = StockHistoricalDataClient(
+                api_key=os.getenv("ALPACA_API_KEY"),
+                secret_key=os.getenv("ALPACA_SECRET_KEY"),
+            )
+            scheduler = get_scheduler("data")
+            http_pool.configure_session(
+                client._session,
+                HTTP_POOL_SIZE["data"],
+                HTTP_KEEPALIVE_IDLE,
+                scheduler,
+            )
+            # The session takes the tokens, one per page of a paginated call
+            _data_client = InstrumentedClient(
+                ScheduledClient(client, scheduler, paced=False)
+            )
+            client_init_seconds["data_client"] = time.perf_counter() - start
+    return _data_client
+
+
+def warm_clients(connections: int) -> dict:
+    """
+    Open up to `connections` pooled connections of each client ahead of the run,
+    returns the seconds taken per client
+    """
+    import http_pool
+
+    timings = {}
+    for name, api, client in (
+        ("trade_client", "trading", get_trade_client()),
+        ("data_client", "data", get_data_client()),
+    ):
+        timings[name] = http_pool.warm(
+            client._session,
+            getattr(client._base_url, "value", client._base_url),
+            min(connections, HTTP_POOL_SIZE[api]),
+        )
+    return timings
+
+
+def http_connections_opened() -> int:
+    """
+    Connections opened by the clients built so far, stays flat while pooled
+    connections are reused
+    """
+    import http_pool
+
+    sessions = [
+        getattr(client, "_session", None) for client in (_trade_client, _data_client)
+    ]
+    return sum(
+        http_pool.connections_opened(session)
+        for session in sessions
+        if hasattr(session, "adapters")
+    )
+
 
 # List of stocks to trade
 STOCKS = "AMZN GOOGL BAC DELL GOOG TSM LLY XOM PANW WFC ETN GM AXP SPOT ROIV HBAN KEY KMI RF CVE JWN BZ AEO FTI IBN PPL FLEX GLW CFG FITB BAC RRC PNR TAL".split()
@@ -27,3 +144,63 @@ RSI_LOWER = 30
 
 ATR_PERIOD = 7
 ATR_MULTIPLIER = 2
+
+BOLLINGER_PERIOD = 14
+BOLLINGER_STD = 0.8
+
+# Market data parameters
+BARS_CHUNK_SIZE = 200  # Symbols per bulk bars request
+BARS_WORKERS = 4  # Concurrent bulk bars requests
+# Local daily bar store (e.g. /tmp/price_data on Lambda), disabled when unset
+PRICE_STORE_DIR = os.getenv("PRICE_STORE_DIR")
+# Indicator state carried between runs, a local JSON path or s3://bucket/key, disabled
+# when unset
+INDICATOR_STATE_URI = os.getenv("INDICATOR_STATE_URI")
+INDICATOR_STATE_MAX_AGE_DAYS = 5  # Older snapshots are ignored and history is refetched
+# Market data feed for the streaming mode, "iex" (free) or "sip"
+STREAM_FEED = os.getenv("STREAM_FEED", "iex")
+
+# Screener parameters, when enabled ranked candidates from all tradable assets replace
+# STOCKS
+SCREENER_ENABLED = os.getenv("SCREENER_ENABLED", "false").lower() == "true"
+SCREENER_MIN_PRICE = 5
+SCREENER_MAX_PRICE = 1000
+SCREENER_MIN_DOLLAR_VOLUME = 20_000_000  # Average daily dollar volume
+SCREENER_ATR_PERCENTAGE_BAND = (1.5, 8)
+SCREENER_PREFILTER_DAYS = 14  # Enough for the ATR, price and volume
+SCREENER_MAX_CANDIDATES = 50
+
+# API request scheduler parameters
+# The budget counts HTTP requests, so every page of a paginated bars request
+# takes a token, like Alpaca counts them.
+# Alpaca's rate limits per account. The data limit is 10000 with a paid market
+# data plan, raise it here to match, it bounds how fast the screener loads
+# a large universe.
+# The burst lets a run's first requests (BARS_WORKERS bar chunks, ORDER_WORKERS
+# orders) go out at once. Alpaca counts requests per minute, so a full bucket
+# can exceed the limit by up to API_BURST within one minute. A smaller burst
+# is safer, a larger one is faster, and the 429s it causes are retried.
+API_REQUESTS_PER_MINUTE = {"trading": 200, "data": 200}
+API_BURST = 20
+API_MAX_RETRIES = 4
+API_RETRY_DELAY = 0.5  # Seconds, the backoff cap doubles on every retry
+
+# Order parameters
+ORDER_WORKERS = 8  # Concurrent order submissions/cancellations
+ORDERS_PAGE_LIMIT = 500  # Broker maximum orders per get_orders response
+
+# HTTP connection pool parameters
+# Connections kept per host, enough for every thread that calls the API at once
+HTTP_POOL_SIZE = {"trading": ORDER_WORKERS, "data": BARS_WORKERS}
+HTTP_KEEPALIVE_IDLE = 60  # Idle seconds before keepalive probes, below NAT timeouts
+# Connections per client opened before the first call of a cold start, 0 to disable
+HTTP_WARM_CONNECTIONS = int(os.getenv("HTTP_WARM_CONNECTIONS", "0"))
+
+# Metrics of every run are appended as JSON lines to this file, or printed when unset
+METRICS_SINK = os.getenv("METRICS_SINK")
+
+# Slack parameters
+SLACK_CHUNK_SIZE = 3500  # Characters per message, longer records are uploaded as a file
+SLACK_FLUSH_TIMEOUT = 5  # Seconds a run waits for its logs to be delivered
+SLACK_MAX_RETRIES = 3
+SLACK_RETRY_DELAY = 1  # Seconds before the first retry, doubled on every retry
@@ -0,0 +1,133 @@
+"""
+Order fill tracking from the Alpaca trade updates stream.
+
+The tracker loads the order book and positions once, then keeps them current
+from trade updates instead of polling closed orders. It reacts to fills as
+they arrive:
+- A filled trailing stop sells the rest of the position (the fractional
+  shares the stop did not cover), as `sell_stocks` would on its next run.
+- A filled buy gets its trailing stop placed.
+The strategy functions are given the tracker's book and positions, so they
+make no REST calls to look them up.
+"""
+
+import asyncio
+import datetime
+import logging
+from dataclasses import dataclass
+from alpaca.trading.enums import OrderSide, OrderType, QueryOrderStatus, TradeEvent
+import strategy
+from order_book import OrderBook
+from config import get_trade_client
+
+logger = logging.getLogger()
+
+FILL_EVENTS = {TradeEvent.FILL, TradeEvent.PARTIAL_FILL}
+
+
+@dataclass
+class TrackedPosition:
+    """
+    Position with the fields the strategy functions use
+    """
+
+    symbol: str
+    qty: float
+    qty_available: float
+
+
+class FillTracker:
+    """
+    In-memory order book and positions, kept current from trade updates
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.order_book = None
+        self.position_qty = {}
+        # Per stock locks, shared with the signal stream so a fill reaction and a
+        # signal for the same stock never run at the same time
+        self.locks = {}
+
+    def seed(self):
+        """
+        Load open orders, orders closed in the last day and positions
+        """
+        self.order_book = OrderBook.load(closed_after=self.closed_after())
+        self.position_qty = {
+            position.symbol: float(position.qty)
+            for position in get_trade_client().get_all_positions()
+        }
+
+    @staticmethod
+    def closed_after() -> datetime.datetime:
+        return datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1)
+
+    def positions(self, symbols: list = None) -> list:
+        """
+        Current positions, shares held by open sell orders are not available
+        """
+        positions = []
+        for symbol, qty in self.position_qty.items():
+            if symbols is not None and symbol not in symbols:
+                continue
+            held = sum(
+                float(order.qty or 0) - float(order.filled_qty or 0)
+                for order in self.order_book.find(
+                    symbol, side=OrderSide.SELL, status=QueryOrderStatus.OPEN
+                )
+            )
+            positions.append(TrackedPosition(symbol, qty, max(qty - held, 0.0)))
+        return positions
+
+    def apply(self, update):
+        """
+        Apply a trade update to the order book and positions
+        """
+        order = update.order
+        self.order_book.update(order)
+        if update.event in FILL_EVENTS and update.position_qty is not None:
+            qty = float(update.position_qty)
+            if qty:
+                self.position_qty[order.symbol] = qty
+            else:
+                self.position_qty.pop(order.symbol, None)
+
+    async def on_trade_update(self, update):
+        self.apply(update)
+        order = update.order
+        if update.event != TradeEvent.FILL:
+            return
+        symbol = order.symbol
+        logger.info(
+            f"{order.side.value} {order.type.value} order filled for {symbol} "
+            f"{order.filled_qty} at ${float(order.filled_avg_price or 0):.2f}"
+        )
+        self.order_book.prune(self.closed_after())
+        # The strategy calls block on REST requests, they run in a worker thread
+        # so the event loop keeps serving the other streams. Positions are read
+        # here, trade updates change them on the event loop.
+        async with self.locks.setdefault(symbol, asyncio.Lock()):
+            if order.side == OrderSide.SELL and order.type == OrderType.TRAILING_STOP:
+                if symbol in self.position_qty:
+                    await asyncio.to_thread(
+                        strategy.sell_stocks,
+                        [symbol],
+                        order_book=self.order_book,
+                        positions=self.positions(),
+                    )
+            elif order.side == OrderSide.BUY:
+                await asyncio.to_thread(
+                    strategy.place_trailing_stop, [symbol], positions=self.positions()
+                )
+
+    def subscribe(self):
+        self.stream.subscribe_trade_updates(self.on_trade_update)
+
+    def run(self):
+        """
+        Seed the book and process trade updates until the stream stops
+        """
+        self.seed()
+        self.subscribe()
+        self.stream.run()
@@ -0,0 +1,108 @@
+"""
+Keep-alive connection pools for the Alpaca REST clients.
+
+alpaca-py sends every call through one requests Session per client. Its
+default adapter keeps up to 10 connections per host with no TCP keepalive,
+so concurrent chunk or order threads beyond that open fresh TLS connections,
+and idle connections of a warm Lambda container may have been silently
+dropped by the time of the next invocation. The session gets an adapter
+sized to the client's concurrency whose sockets send TCP keepalives, and
+its connections can be opened ahead of the first API call. The adapter sends
+every request through the client's API scheduler, so each page of a paginated
+call counts against the rate budget and is retried on its own.
+"""
+
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+
+def keepalive_options(idle: int) -> list:
+    """
+    Socket options that keep idle pooled connections open, Linux only options are
+    skipped elsewhere
+    """
+    options = HTTPConnection.default_socket_options + [
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    ]
+    for name, value in (
+        ("TCP_KEEPIDLE", idle),
+        ("TCP_KEEPINTVL", idle),
+        ("TCP_KEEPCNT", 3),
+    ):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """
+    HTTP adapter whose pooled connections send TCP keepalives, sending through
+    the scheduler when one is given
+    """
+
+    def __init__(self, pool_size: int, keepalive_idle: int, scheduler=None):
+        self.socket_options = keepalive_options(keepalive_idle)
+        self.scheduler = scheduler
+        # Retries are handled by the API scheduler
+        super().__init__(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0
+        )
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if self.scheduler is None:
+            return super().send(request, **kwargs)
+        return self.scheduler.send(
+            lambda request: super(KeepAliveAdapter, self).send(request, **kwargs),
+            request,
+        )
+
+
+def configure_session(session, pool_size: int, keepalive_idle: int, scheduler=None):
+    """
+    Mount a keep-alive adapter with `pool_size` connections per host on the
+    session, pacing its requests with `scheduler` when given
+    """
+    adapter = KeepAliveAdapter(pool_size, keepalive_idle, scheduler)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def warm(session, url: str, connections: int) -> float:
+    """
+    Open `connections` pooled connections to the host of `url` with concurrent
+    HEAD requests, so the TLS handshakes are done before the first API call.
+    Returns the seconds taken.
+    """
+    start = time.perf_counter()
+
+    def head(_):
+        try:
+            session.head(url, timeout=5).close()
+        except Exception:
+            # A failed warm-up only means the first call opens its own connection
+            pass
+
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        list(executor.map(head, range(connections)))
+    return time.perf_counter() - start
+
+
+def connections_opened(session) -> int:
+    """
+    Number of connections the session has opened so far, over all hosts
+    """
+    opened = 0
+    # The same adapter is mounted for both schemes
+    for adapter in {id(a): a for a in session.adapters.values()}.values():
+        pools = adapter.poolmanager.pools
+        with pools.lock:
+            opened += sum(pool.num_connections for pool in pools._container.values())
+    return opened
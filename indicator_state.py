@@ -0,0 +1,212 @@
+"""
+Per-stock indicator state carried between runs.
+
+A snapshot keeps, for every stock, the completed daily bars of its retrieval
+window and rolling RSI/ATR state advanced to the last of them. The next run
+fetches only the bars after the snapshot and advances the state with them,
+instead of refetching weeks of history.
+
+Snapshots are JSON, saved to a pluggable store: a local file, or an S3
+object so they outlive Lambda containers.
+"""
+
+import datetime
+import json
+import os
+import pandas as pd
+import indicators
+
+FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def session_dates(timestamps: pd.DatetimeIndex):
+    """
+    Trading day (US/Eastern) of each bar timestamp
+    """
+    return timestamps.tz_convert("US/Eastern").date
+
+
+class LocalStateStore:
+    """
+    Snapshot kept in a local JSON file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> dict:
+        if not os.path.isfile(self.path):
+            return None
+        with open(self.path) as file:
+            return json.load(file)
+
+    def save(self, snapshot: dict):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(snapshot, file)
+        os.replace(tmp_path, self.path)
+
+
+class S3StateStore:
+    """
+    Snapshot kept in an S3 object
+    """
+
+    def __init__(self, bucket: str, key: str):
+        self.bucket = bucket
+        self.key = key
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("s3")
+        return self._client
+
+    def load(self) -> dict:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.key)
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return json.loads(response["Body"].read())
+
+    def save(self, snapshot: dict):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Body=json.dumps(snapshot).encode(),
+            ContentType="application/json",
+        )
+
+
+def open_state_store(uri: str):
+    """
+    Open the store for `s3://bucket/key` or a local file path
+    """
+    if uri.startswith("s3://"):
+        bucket, _, key = uri[len("s3://") :].partition("/")
+        return S3StateStore(bucket, key)
+    return LocalStateStore(uri)
+
+
+class IndicatorState:
+    """
+    Completed daily bars of one stock, from `window` days before the last
+    one, and rolling RSI/ATR over all completed bars seen
+    """
+
+    __slots__ = ("symbol", "window", "date", "bars", "rsi", "atr")
+
+    def __init__(self, symbol: str, window: int, rsi_period: int, atr_period: int):
+        self.symbol = symbol
+        self.window = window
+        self.date = None
+        self.bars = None
+        self.rsi = indicators.RollingRSI(rsi_period)
+        self.atr = indicators.RollingATR(atr_period)
+
+    def advance(self, bars: pd.DataFrame, today: datetime.date):
+        """
+        Add the bars (as returned by the data client) completed before today
+        that are newer than the state
+        """
+        if bars is None or bars.empty:
+            return
+        dates = session_dates(bars.index.get_level_values("timestamp"))
+        new = (
+            (dates < today)
+            if self.date is None
+            else (dates > self.date) & (dates < today)
+        )
+        if not new.any():
+            return
+        new_bars = bars[new]
+        for high, low, close in zip(
+            new_bars["high"], new_bars["low"], new_bars["close"]
+        ):
+            self.rsi.update(close)
+            self.atr.update(high, low, close)
+        self.date = dates[new][-1]
+        combined = new_bars if self.bars is None else pd.concat([self.bars, new_bars])
+        keep = session_dates(combined.index.get_level_values("timestamp")) >= (
+            self.date - datetime.timedelta(days=self.window)
+        )
+        self.bars = combined[keep][list(FIELDS)]
+
+    def to_dict(self) -> dict:
+        """
+        Get the state as JSON-serializable values
+        """
+        timestamps = self.bars.index.get_level_values("timestamp")
+        return {
+            "window": self.window,
+            "date": self.date.isoformat(),
+            "bars": {
+                "timestamp": [timestamp.isoformat() for timestamp in timestamps],
+                **{field: self.bars[field].tolist() for field in FIELDS},
+            },
+            "rsi": self.rsi.to_dict(),
+            "atr": self.atr.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, symbol: str, state: dict):
+        """
+        Restore from `to_dict` output
+        """
+        restored = cls.__new__(cls)
+        restored.symbol = symbol
+        restored.window = state["window"]
+        restored.date = datetime.date.fromisoformat(state["date"])
+        timestamps = pd.to_datetime(state["bars"]["timestamp"], utc=True)
+        restored.bars = pd.DataFrame(
+            {field: state["bars"][field] for field in FIELDS},
+            index=pd.MultiIndex.from_arrays(
+                [[symbol] * len(timestamps), timestamps],
+                names=["symbol", "timestamp"],
+            ),
+        )
+        restored.rsi = indicators.RollingRSI.from_dict(state["rsi"])
+        restored.atr = indicators.RollingATR.from_dict(state["atr"])
+        return restored
+
+
+def dump_snapshot(states: dict, rsi_period: int, atr_period: int) -> dict:
+    """
+    Build a snapshot of {symbol: IndicatorState}
+    """
+    return {
+        "rsi_period": rsi_period,
+        "atr_period": atr_period,
+        "saved_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "symbols": {
+            symbol: state.to_dict()
+            for symbol, state in states.items()
+            if state.date is not None
+        },
+    }
+
+
+def load_snapshot(
+    snapshot: dict, rsi_period: int, atr_period: int, oldest: datetime.date
+) -> dict:
+    """
+    Restore {symbol: IndicatorState} from a snapshot. States older than `oldest`
+    and snapshots taken with other indicator periods are dropped.
+    """
+    if (
+        not snapshot
+        or snapshot.get("rsi_period") != rsi_period
+        or snapshot.get("atr_period") != atr_period
+    ):
+        return {}
+    return {
+        symbol: IndicatorState.from_dict(symbol, state)
+        for symbol, state in snapshot["symbols"].items()
+        if datetime.date.fromisoformat(state["date"]) >= oldest
+    }
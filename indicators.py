@@ -0,0 +1,343 @@
+"""
+Vectorized indicators over wide price panels.
+
+Every function accepts either a Series (one stock) or a DataFrame of
+dates x symbols, and computes all symbols at once with rolling kernels.
+The Rolling classes keep the same indicators for one stock as state that is
+updated bar by bar, for streamed prices.
+"""
+
+from collections import deque
+import numpy as np
+import pandas as pd
+
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+
+SMOOTHING_SIMPLE = "simple"
+SMOOTHING_WILDER = "wilder"
+
+
+def smooth(values, period: int, smoothing: str = SMOOTHING_SIMPLE):
+    """
+    Smooth values with a simple moving average or Wilder's moving average.
+    Wilder's average is seeded with the simple average of the first full window,
+    matching backtrader's SmoothedMovingAverage.
+    """
+    sma = values.rolling(window=period).mean()
+    if smoothing == SMOOTHING_SIMPLE:
+        return sma
+    if smoothing != SMOOTHING_WILDER:
+        raise ValueError(f"Unknown smoothing: {smoothing}")
+    is_seed = sma.notna() & sma.shift().isna()
+    seeded = values.where(is_seed.cumsum() > 0).mask(is_seed, sma)
+    return seeded.ewm(alpha=1 / period, adjust=False).mean()
+
+
+def rsi(close, period: int, smoothing: str = SMOOTHING_SIMPLE):
+    """
+    Calculate the Relative Strength Index (RSI)
+    """
+    delta = close.diff()
+    gain = delta.clip(lower=0)
+    loss = -delta.clip(upper=0)
+    rs = smooth(gain, period, smoothing) / smooth(loss, period, smoothing)
+    return 100 - (100 / (1 + rs))
+
+
+def true_range(high, low, close):
+    """
+    Calculate the True Range, undefined on the first bar
+    """
+    prev_close = close.shift()
+    upper = high.where(high > prev_close, prev_close)
+    lower = low.where(low < prev_close, prev_close)
+    return (upper - lower).where(prev_close.notna())
+
+
+def atr(high, low, close, period: int, smoothing: str = SMOOTHING_SIMPLE):
+    """
+    Calculate the Average True Range (ATR)
+    """
+    return smooth(true_range(high, low, close), period, smoothing)
+
+
+def atr_percentage(high, low, close, period: int, smoothing: str = SMOOTHING_SIMPLE):
+    """
+    Calculate the ATR as a percentage of the close
+    """
+    return atr(high, low, close, period, smoothing) / close * 100
+
+
+def bollinger_bands(close, period: int, devfactor: float, ddof: int = 0):
+    """
+    Calculate the Bollinger Bands, returns (mid, top, bot)
+    """
+    mid = close.rolling(window=period).mean()
+    deviation = close.rolling(window=period).std(ddof=ddof) * devfactor
+    return mid, mid + deviation, mid - deviation
+
+
+def bollinger_width(close, period: int, devfactor: float, ddof: int = 0):
+    """
+    Calculate the Bollinger Band width relative to the middle band
+    """
+    mid, top, bot = bollinger_bands(close, period, devfactor, ddof)
+    return (top - bot) / mid
+
+
+def bars_to_panel(bars: dict) -> dict:
+    """
+    Pivot per-symbol bars (as returned by the Alpaca data client) into
+    one dates x symbols DataFrame per field
+    """
+    frames = {symbol: df for symbol, df in bars.items() if not df.empty}
+    if not frames:
+        return {field: pd.DataFrame() for field in PRICE_FIELDS}
+    # Build one long frame from flat arrays and unstack it once: every field
+    # panel is then a single consolidated block, and no per-symbol index is merged
+    timestamps = [df.index.get_level_values(-1) for df in frames.values()]
+    # Column lookups are slow on many small frames, find the field positions
+    # once per distinct column layout and take them from the raw values
+    positions = {}
+    values = []
+    for df in frames.values():
+        columns = tuple(df.columns)
+        if columns not in positions:
+            positions[columns] = [columns.index(field) for field in PRICE_FIELDS]
+        values.append(df.to_numpy(dtype="f8")[:, positions[columns]])
+    combined = pd.DataFrame(
+        np.concatenate(values),
+        columns=PRICE_FIELDS,
+        index=pd.MultiIndex.from_arrays(
+            [
+                timestamps[0].append(timestamps[1:]),
+                np.repeat(list(frames), [len(df) for df in frames.values()]),
+            ],
+            names=["timestamp", "symbol"],
+        ),
+    )
+    wide = combined.unstack(level="symbol").sort_index()
+    return {field: wide[field] for field in PRICE_FIELDS}
+
+
+def compute_indicators(
+    high,
+    low,
+    close,
+    rsi_period: int,
+    atr_period: int,
+    bollinger_period: int,
+    bollinger_std: float,
+    smoothing: str = SMOOTHING_SIMPLE,
+) -> dict:
+    """
+    Calculate RSI, ATR, ATR percentage and Bollinger Bands for every symbol in the panel
+    """
+    mid, top, bot = bollinger_bands(close, bollinger_period, bollinger_std)
+    average_true_range = atr(high, low, close, atr_period, smoothing)
+    return {
+        "rsi": rsi(close, rsi_period, smoothing),
+        "atr": average_true_range,
+        "atr_percentage": average_true_range / close * 100,
+        "bb_mid": mid,
+        "bb_top": top,
+        "bb_bot": bot,
+        "bb_width": (top - bot) / mid,
+    }
+
+
+def latest_values(indicators: dict, close: pd.DataFrame) -> pd.DataFrame:
+    """
+    Collapse full indicator panels into one row of latest values per symbol.
+    Symbols without a close at the panel's last timestamp are left out, rather
+    than reporting the values of an older bar as current.
+    """
+    latest = pd.DataFrame({name: panel.iloc[-1] for name, panel in indicators.items()})
+    return latest[close.iloc[-1].reindex(latest.index).notna()]
+
+
+class RollingAverage:
+    """
+    Simple or Wilder moving average, updated in O(1) per value.
+    Wilder's average is seeded with the simple average of the first `period`
+    values, matching `smooth`.
+    """
+
+    __slots__ = ("period", "smoothing", "window", "total", "average")
+
+    def __init__(self, period: int, smoothing: str = SMOOTHING_SIMPLE):
+        if smoothing not in (SMOOTHING_SIMPLE, SMOOTHING_WILDER):
+            raise ValueError(f"Unknown smoothing: {smoothing}")
+        self.period = period
+        self.smoothing = smoothing
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.average = None
+
+    def update(self, value: float):
+        """
+        Add a value
+        """
+        if self.average is not None and self.smoothing == SMOOTHING_WILDER:
+            self.average = (self.average * (self.period - 1) + value) / self.period
+            return
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(value)
+        self.total += value
+        if len(self.window) == self.period:
+            self.average = self.total / self.period
+
+    def value(self, value: float = None) -> float:
+        """
+        Get the average, optionally with a pending value that is not added,
+        or nan until there are enough values
+        """
+        if value is None:
+            return float("nan") if self.average is None else self.average
+        if self.average is not None and self.smoothing == SMOOTHING_WILDER:
+            return (self.average * (self.period - 1) + value) / self.period
+        total, count = self.total + value, len(self.window) + 1
+        if count > self.period:
+            total -= self.window[0]
+            count -= 1
+        if count < self.period:
+            return float("nan")
+        return total / self.period
+
+    def to_dict(self) -> dict:
+        """
+        Get the state as JSON-serializable values
+        """
+        return {
+            "period": self.period,
+            "smoothing": self.smoothing,
+            # Wilder's average no longer needs the window once seeded
+            "window": (
+                []
+                if self.average is not None and self.smoothing == SMOOTHING_WILDER
+                else list(self.window)
+            ),
+            "total": self.total,
+            "average": self.average,
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict):
+        """
+        Restore from `to_dict` output
+        """
+        average = cls(state["period"], state["smoothing"])
+        average.window.extend(state["window"])
+        average.total = state["total"]
+        average.average = state["average"]
+        return average
+
+
+class RollingRSI:
+    """
+    RSI over completed closes, updated in O(1) per bar.
+    `value(close)` includes a still forming bar whose latest price is `close`.
+    """
+
+    __slots__ = ("gain", "loss", "last_close")
+
+    def __init__(self, period: int, smoothing: str = SMOOTHING_SIMPLE):
+        self.gain = RollingAverage(period, smoothing)
+        self.loss = RollingAverage(period, smoothing)
+        self.last_close = None
+
+    def update(self, close: float):
+        """
+        Add a completed bar
+        """
+        if self.last_close is not None:
+            delta = close - self.last_close
+            self.gain.update(max(delta, 0.0))
+            self.loss.update(max(-delta, 0.0))
+        self.last_close = close
+
+    def value(self, close: float = None) -> float:
+        """
+        Get the RSI, optionally with a forming bar, or nan until there are enough bars
+        """
+        if close is not None and self.last_close is not None:
+            delta = close - self.last_close
+            gain = self.gain.value(max(delta, 0.0))
+            loss = self.loss.value(max(-delta, 0.0))
+        else:
+            gain, loss = self.gain.value(), self.loss.value()
+        if loss == 0:
+            return 100.0 if gain > 0 else float("nan")
+        return 100 - (100 / (1 + gain / loss))
+
+    def to_dict(self) -> dict:
+        """
+        Get the state as JSON-serializable values
+        """
+        return {
+            "gain": self.gain.to_dict(),
+            "loss": self.loss.to_dict(),
+            "last_close": self.last_close,
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict):
+        """
+        Restore from `to_dict` output
+        """
+        rsi = cls.__new__(cls)
+        rsi.gain = RollingAverage.from_dict(state["gain"])
+        rsi.loss = RollingAverage.from_dict(state["loss"])
+        rsi.last_close = state["last_close"]
+        return rsi
+
+
+class RollingATR:
+    """
+    ATR over completed bars, updated in O(1) per bar.
+    `value(high, low, close)` includes a still forming bar.
+    """
+
+    __slots__ = ("true_range", "last_close")
+
+    def __init__(self, period: int, smoothing: str = SMOOTHING_SIMPLE):
+        self.true_range = RollingAverage(period, smoothing)
+        self.last_close = None
+
+    def _true_range(self, high: float, low: float) -> float:
+        return max(high, self.last_close) - min(low, self.last_close)
+
+    def update(self, high: float, low: float, close: float):
+        """
+        Add a completed bar
+        """
+        if self.last_close is not None:
+            self.true_range.update(self._true_range(high, low))
+        self.last_close = close
+
+    def value(
+        self, high: float = None, low: float = None, close: float = None
+    ) -> float:
+        """
+        Get the ATR, optionally with a forming bar, or nan until there are enough bars
+        """
+        if close is not None and self.last_close is not None:
+            return self.true_range.value(self._true_range(high, low))
+        return self.true_range.value()
+
+    def to_dict(self) -> dict:
+        """
+        Get the state as JSON-serializable values
+        """
+        return {"true_range": self.true_range.to_dict(), "last_close": self.last_close}
+
+    @classmethod
+    def from_dict(cls, state: dict):
+        """
+        Restore from `to_dict` output
+        """
+        atr = cls.__new__(cls)
+        atr.true_range = RollingAverage.from_dict(state["true_range"])
+        atr.last_close = state["last_close"]
+        return atr
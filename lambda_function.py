@@ -1,7 +1,11 @@
+import importlib
 import logging
+import sys
+import time
 from dotenv import load_dotenv
-from strategy import sell_stocks, place_trailing_stop, buy_stocks
 from slack_logger import get_slack_handler
+import config
+import metrics
 
 load_dotenv()
 
@@ -20,6 +24,47 @@ logger.addHandler(stream_handler)
 slack_handler = get_slack_handler()
 logger.addHandler(slack_handler)
 
+# Heavy modules are imported on the first invocation, in this order, so the
+# cold start report can attribute import time to each of them. config defers
+# the HTTP pool (requests and urllib3) and the API scheduler to client creation.
+DEFERRED_IMPORTS = (
+    "pandas",
+    "http_pool",
+    "api_scheduler",
+    "alpaca.trading.client",
+    "alpaca.data.historical",
+)
+startup_timings = {}
+startup_reported = False
+
+
+def timed_import(name: str):
+    """
+    Import a module, recording how long it took the first time
+    """
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    startup_timings.setdefault(f"import {name}", time.perf_counter() - start)
+    return module
+
+
+def log_startup_report():
+    """
+    Log import and client init times once per container (cold start)
+    """
+    global startup_reported
+    if startup_reported:
+        return
+    timings = dict(startup_timings)
+    timings.update(
+        (f"init {name}", seconds)
+        for name, seconds in config.client_init_seconds.items()
+    )
+    logger.info("STARTUP TIMINGS" + "-" * 100)
+    for name, seconds in timings.items():
+        logger.info(f"{name:<35} {seconds * 1000:8.1f} ms")
+    startup_reported = True
+
 
 # Lambda handler function
 def lambda_handler(event, context):
@@ -27,16 +72,54 @@ def lambda_handler(event, context):
     Lambda handler function
     """
     try:
-        sell_stocks()
-        place_trailing_stop()
-        buy_stocks()
+        for name in DEFERRED_IMPORTS:
+            timed_import(name)
+        strategy = timed_import("strategy")
+        if not startup_reported and config.HTTP_WARM_CONNECTIONS:
+            startup_timings.update(
+                (f"warm {name}", seconds)
+                for name, seconds in config.warm_clients(
+                    config.HTTP_WARM_CONNECTIONS
+                ).items()
+            )
+        connections = config.http_connections_opened()
+        with metrics.stage("sell_stocks"):
+            strategy.sell_stocks()
+        with metrics.stage("place_trailing_stop"):
+            strategy.place_trailing_stop()
+        with metrics.stage("buy_stocks"):
+            strategy.buy_stocks()
+
+        # Zero on warm invocations while the pooled connections are reused
+        metrics.increment(
+            "http_connections_opened", config.http_connections_opened() - connections
+        )
 
         return {
             "statusCode": 200,
             "body": "Trading strategy executed successfully",
         }
     finally:
-        slack_handler.send_logs_to_slack()
+        log_startup_report()
+        if "util" in sys.modules:
+            util = sys.modules["util"]
+            try:
+                util.save_indicator_state()
+            except Exception as e:
+                logger.info(f"Could not save the indicator state: {e}")
+            util.clear_bar_cache()
+        if "screener" in sys.modules:
+            sys.modules["screener"].clear_candidates()
+        try:
+            metrics.emit(config.METRICS_SINK)
+        except Exception as e:
+            logger.info(f"Could not write the run metrics: {e}")
+        # Bound the wait so a slow Slack never runs into the Lambda timeout,
+        # undelivered logs are sent in the background of the next invocation
+        timeout = config.SLACK_FLUSH_TIMEOUT
+        if context is not None:
+            timeout = min(timeout, context.get_remaining_time_in_millis() / 1000 - 1)
+        slack_handler.send_logs_to_slack(timeout=max(timeout, 0))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,213 @@
+"""
+Instrumentation of the trading run.
+
+API clients are wrapped so every call records its latency and payload size
+(bars, orders or positions returned) under the strategy stage that made it.
+Stages are timed with `stage`. At the end of a run `emit` logs a compact
+summary and writes it as one JSON record to the metrics sink.
+"""
+
+import datetime
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger()
+
+# Latencies kept per stage and call for the percentiles, the most recent ones
+# once a long running process (the stream) has made more calls
+LATENCY_SAMPLES = 1000
+
+_lock = threading.Lock()
+# (stage, call) -> CallStats
+_calls = {}
+# stage -> seconds
+_stages = {}
+# Totals and peaks reported by other components, e.g. the API scheduler
+_counters = {}
+# Stage of the calls being made, shared by order dispatch threads
+_current_stage = "other"
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a stage of the run, client calls made inside it are attributed to it
+    """
+    global _current_stage
+    previous, _current_stage = _current_stage, name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _stages[name] = _stages.get(name, 0.0) + time.perf_counter() - start
+        _current_stage = previous
+
+
+def payload_size(result):
+    """
+    Number of records in an API response: bars of a bar set, items of a list, else 1
+    """
+    data = getattr(result, "data", None)
+    if isinstance(data, dict):
+        return sum(len(values) for values in data.values())
+    if isinstance(result, list):
+        return len(result)
+    return 0 if result is None else 1
+
+
+class CallStats:
+    """
+    Totals of one API call made in one stage, with its latest latencies
+    """
+
+    __slots__ = ("count", "seconds", "payload", "latencies")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.payload = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, seconds: float, size: int):
+        self.count += 1
+        self.seconds += seconds
+        self.payload += size
+        self.latencies.append(seconds)
+
+
+def record(call: str, seconds: float, size: int):
+    with _lock:
+        stats = _calls.get((_current_stage, call))
+        if stats is None:
+            stats = _calls[(_current_stage, call)] = CallStats()
+        stats.add(seconds, size)
+
+
+def increment(name: str, amount: float = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def peak(name: str, value: float):
+    with _lock:
+        _counters[name] = max(_counters.get(name, value), value)
+
+
+class InstrumentedClient:
+    """
+    Proxy of an API client that records every method call
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, attribute):
+        value = getattr(self._client, attribute)
+        if not callable(value) or attribute.startswith("_"):
+            return value
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = None
+            try:
+                result = value(*args, **kwargs)
+                return result
+            finally:
+                record(attribute, time.perf_counter() - start, payload_size(result))
+
+        return timed
+
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    Nearest-rank percentile
+    """
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def summary() -> dict:
+    """
+    Stage durations and per stage call counts, latency percentiles and payload sizes
+    """
+    with _lock:
+        calls = {
+            key: (stats.count, stats.seconds, stats.payload, list(stats.latencies))
+            for key, stats in _calls.items()
+        }
+        stages = dict(_stages)
+        counters = dict(_counters)
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "stages_ms": {
+            name: round(seconds * 1000, 1) for name, seconds in stages.items()
+        },
+        "calls": [
+            {
+                "stage": stage_name,
+                "call": call,
+                "count": count,
+                "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+                "total_ms": round(seconds * 1000, 1),
+                "payload": payload,
+            }
+            for (stage_name, call), (
+                count,
+                seconds,
+                payload,
+                latencies,
+            ) in calls.items()
+        ],
+        "counters": {name: round(value, 1) for name, value in counters.items()},
+    }
+
+
+def log_summary(metrics: dict):
+    logger.info("RUN METRICS" + "-" * 100)
+    for name, ms in metrics["stages_ms"].items():
+        logger.info(f"{name:<25} {ms:9.1f} ms")
+    for call in metrics["calls"]:
+        logger.info(
+            f"{call['stage']:<20} {call['call']:<20} x{call['count']:<4} "
+            f"p50 {call['p50_ms']:7.1f} ms  p95 {call['p95_ms']:7.1f} ms  "
+            f"payload {call['payload']}"
+        )
+    for name, value in metrics["counters"].items():
+        logger.info(f"{name:<25} {value:9.1f}")
+
+
+def write_metrics(metrics: dict, sink: str = None):
+    """
+    Append the metrics as one JSON line to the sink file, or print it to
+    stdout (picked up by CloudWatch Logs) when no sink is configured
+    """
+    line = json.dumps(metrics)
+    if sink:
+        with open(sink, "a") as file:
+            file.write(line + "\n")
+    else:
+        print(line)
+
+
+def emit(sink: str = None):
+    """
+    Log and write the metrics of the run, then start over for the next run
+    """
+    metrics = summary()
+    log_summary(metrics)
+    write_metrics(metrics, sink)
+    reset()
+    return metrics
+
+
+def reset():
+    with _lock:
+        _calls.clear()
+        _stages.clear()
+        _counters.clear()
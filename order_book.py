@@ -0,0 +1,146 @@
+import datetime
+import logging
+from collections import defaultdict
+from alpaca.common.enums import Sort
+from alpaca.trading.requests import GetOrdersRequest
+from alpaca.trading.enums import OrderSide, OrderStatus, QueryOrderStatus
+from config import get_trade_client, ORDERS_PAGE_LIMIT
+
+logger = logging.getLogger()
+
+# Final order statuses, orders in any other status are open
+CLOSED_ORDER_STATUSES = {
+    OrderStatus.FILLED,
+    OrderStatus.CANCELED,
+    OrderStatus.EXPIRED,
+    OrderStatus.REPLACED,
+    OrderStatus.REJECTED,
+}
+
+
+def get_all_orders(filter: GetOrdersRequest) -> list:
+    """
+    Get every order matching the filter, paging backwards in time while pages are full
+    """
+    orders = {}
+    until = filter.until
+    oldest = None
+    while True:
+        page_filter = GetOrdersRequest(
+            **{
+                **filter.model_dump(exclude_none=True),
+                "limit": ORDERS_PAGE_LIMIT,
+                "until": until,
+                "direction": Sort.DESC,
+            }
+        )
+        page = get_trade_client().get_orders(filter=page_filter)
+        orders.update((order.id, order) for order in page)
+        if len(page) < ORDERS_PAGE_LIMIT:
+            return list(orders.values())
+        # `until` is exclusive. The next page ends just after the oldest order,
+        # so orders sharing its timestamp that did not fit are fetched too, and
+        # the ids already seen are dropped. Once a page reaches no older order
+        # the next one ends at that timestamp.
+        page_oldest = min(order.submitted_at for order in page)
+        if page_oldest != oldest:
+            until = page_oldest + datetime.timedelta(microseconds=1)
+        elif until != page_oldest:
+            until = page_oldest
+        else:
+            return list(orders.values())
+        oldest = page_oldest
+
+
+class OrderBook:
+    """
+    Snapshot of recent orders indexed by symbol, side, type and status.
+    Status is the query status (open or closed) the order was fetched with.
+    """
+
+    def __init__(self):
+        self.index = defaultdict(list)
+        self.by_symbol = defaultdict(list)
+
+    def add(self, order, status: QueryOrderStatus):
+        """
+        Add an order to the book
+        """
+        self.index[(order.symbol, order.side, order.type, status)].append(order)
+        self.by_symbol[order.symbol].append((order, status))
+
+    def update(self, order):
+        """
+        Add an order or replace the earlier version of it, filed under the
+        status it is now in
+        """
+        status = (
+            QueryOrderStatus.CLOSED
+            if order.status in CLOSED_ORDER_STATUSES
+            else QueryOrderStatus.OPEN
+        )
+        self.remove(order)
+        self.add(order, status)
+
+    def remove(self, order):
+        """
+        Remove an order from the book, matched by id
+        """
+        for status in (QueryOrderStatus.OPEN, QueryOrderStatus.CLOSED):
+            key = (order.symbol, order.side, order.type, status)
+            if key in self.index:
+                self.index[key] = [o for o in self.index[key] if o.id != order.id]
+        if order.symbol in self.by_symbol:
+            self.by_symbol[order.symbol] = [
+                (o, status)
+                for o, status in self.by_symbol[order.symbol]
+                if o.id != order.id
+            ]
+
+    def prune(self, closed_before: datetime.datetime):
+        """
+        Drop orders that closed before `closed_before`, as `load` would not have
+        fetched them
+        """
+        for orders in list(self.by_symbol.values()):
+            for order, status in orders:
+                closed_at = order.filled_at or getattr(order, "updated_at", None)
+                if (
+                    status == QueryOrderStatus.CLOSED
+                    and closed_at is not None
+                    and closed_at < closed_before
+                ):
+                    self.remove(order)
+
+    def find(self, symbol: str, side=None, type=None, status=None) -> list:
+        """
+        Find orders for a symbol, optionally filtered by side, type and status
+        """
+        if side is not None and type is not None and status is not None:
+            return list(self.index.get((symbol, side, type, status), []))
+        return [
+            order
+            for order, order_status in self.by_symbol.get(symbol, [])
+            if (side is None or order.side == side)
+            and (type is None or order.type == type)
+            and (status is None or order_status == status)
+        ]
+
+    @classmethod
+    def load(cls, closed_after: datetime.datetime, side: OrderSide = OrderSide.SELL):
+        """
+        Load all open orders and all orders closed after `closed_after`, two
+        paged requests in total
+        """
+        book = cls()
+        for status, after in (
+            (QueryOrderStatus.OPEN, None),
+            (QueryOrderStatus.CLOSED, closed_after),
+        ):
+            filter = GetOrdersRequest(status=status, side=side, after=after)
+            for order in get_all_orders(filter):
+                book.add(order, status)
+        logger.info(
+            f"Loaded {sum(len(orders) for orders in book.by_symbol.values())} orders"
+        )
+        return book
@@ -0,0 +1,85 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from alpaca.trading.requests import OrderRequest
+from util import submit_order
+from config import get_trade_client, ORDER_WORKERS
+
+logger = logging.getLogger()
+
+
+@dataclass
+class OrderResult:
+    symbol: str
+    action: str
+    status: str  # submitted, pdt_blocked, cancelled, failed or skipped
+    response: object = None
+    error: Exception = None
+
+
+class OrderDispatcher:
+    """
+    Queue order submissions and cancellations, then send them concurrently.
+    Actions queued for the same symbol run one after another in queue order,
+    so a cancel always completes before a later sell of the same symbol.
+    """
+
+    def __init__(self, max_workers: int = ORDER_WORKERS):
+        self.max_workers = max_workers
+        self.queued = {}
+
+    def submit(self, order: OrderRequest):
+        """
+        Queue an order submission
+        """
+        self.queued.setdefault(order.symbol, []).append(("submit", order))
+
+    def cancel(self, order):
+        """
+        Queue the cancellation of an existing order
+        """
+        self.queued.setdefault(order.symbol, []).append(("cancel", order))
+
+    def run(self) -> list:
+        """
+        Send all queued actions and wait for them to finish.
+        Failed actions are logged and the first failure is raised once every
+        symbol is done.
+        """
+        queued, self.queued = self.queued, {}
+        if not queued:
+            return []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self._run_symbol, symbol, actions)
+                for symbol, actions in queued.items()
+            ]
+            results = [result for future in futures for result in future.result()]
+
+        failed = [result for result in results if result.status == "failed"]
+        for result in failed:
+            logger.error(f"Failed to {result.action} {result.symbol}: {result.error}")
+        if failed:
+            raise failed[0].error
+        return results
+
+    def _run_symbol(self, symbol: str, actions: list) -> list:
+        """
+        Run the actions for one symbol in order, skipping the rest after a failure
+        """
+        results = []
+        for action, order in actions:
+            if results and results[-1].status in ("failed", "skipped"):
+                results.append(OrderResult(symbol, action, "skipped"))
+                continue
+            try:
+                if action == "cancel":
+                    get_trade_client().cancel_order_by_id(order.id)
+                    results.append(OrderResult(symbol, action, "cancelled"))
+                else:
+                    response = submit_order(order)
+                    status = "submitted" if response is not None else "pdt_blocked"
+                    results.append(OrderResult(symbol, action, status, response))
+            except Exception as e:
+                results.append(OrderResult(symbol, action, "failed", error=e))
+        return results
@@ -0,0 +1,181 @@
+"""
+Local on-disk store of daily OHLCV bars.
+
+Each symbol is kept in one NumPy file of date-sorted records that is opened
+memory-mapped, so loading history does not need the network or a parser.
+A fetch function fills in only the date ranges the store has not covered yet,
+and without one the store works fully offline.
+"""
+
+import datetime
+import json
+import os
+import numpy as np
+import pandas as pd
+
+FIELDS = ("open", "high", "low", "close", "volume")
+BAR_DTYPE = np.dtype([("date", "datetime64[D]")] + [(field, "f8") for field in FIELDS])
+
+
+def to_date(value) -> np.datetime64:
+    """Convert a date, datetime or ISO string to a numpy day."""
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return np.datetime64(value, "D")
+
+
+class PriceStore:
+    def __init__(self, root: str, fetch=None):
+        """
+        `fetch(symbols, start, end)` returns {symbol: DataFrame} of daily bars with
+        lowercase OHLCV columns and a date index, `end` inclusive, and raises if
+        the download failed. Without a fetch function the store only serves what
+        is already on disk.
+        """
+        self.root = root
+        self.fetch = fetch
+        os.makedirs(root, exist_ok=True)
+        self.coverage_path = os.path.join(root, "coverage.json")
+        self.coverage = {}
+        if os.path.isfile(self.coverage_path):
+            with open(self.coverage_path) as file:
+                self.coverage = json.load(file)
+
+    def path(self, symbol: str) -> str:
+        return os.path.join(self.root, f"{symbol}.npy")
+
+    def read(self, symbol: str) -> np.ndarray:
+        """
+        Get all stored bars for a symbol as a read-only memory-mapped record array
+        """
+        path = self.path(symbol)
+        if not os.path.isfile(path):
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.load(path, mmap_mode="r")
+
+    def write(self, symbol: str, bars: pd.DataFrame):
+        """
+        Merge bars into the stored bars of a symbol, replacing the file atomically
+        """
+        new = np.empty(len(bars), dtype=BAR_DTYPE)
+        new["date"] = (
+            pd.DatetimeIndex(bars.index)
+            .tz_localize(None)
+            .values.astype("datetime64[D]")
+        )
+        for field in FIELDS:
+            new[field] = bars[field].to_numpy(dtype="f8")
+        merged = np.concatenate([np.array(self.read(symbol)), new])
+        # Keep the most recently written bar for each date
+        _, last = np.unique(merged["date"][::-1], return_index=True)
+        merged = merged[len(merged) - 1 - last]
+        tmp_path = self.path(symbol) + ".tmp"
+        with open(tmp_path, "wb") as file:
+            np.save(file, merged)
+        os.replace(tmp_path, self.path(symbol))
+
+    def missing_ranges(self, symbol: str, start, end) -> list:
+        """
+        Get the (start, end) date ranges not yet covered for a symbol
+        """
+        start, end = to_date(start), to_date(end)
+        if symbol not in self.coverage:
+            return [(start, end)]
+        covered_start, covered_end = (to_date(day) for day in self.coverage[symbol])
+        ranges = []
+        if start < covered_start:
+            ranges.append((start, covered_start - 1))
+        if end > covered_end:
+            ranges.append((covered_end + 1, end))
+        return ranges
+
+    def update(self, symbols: list, start, end):
+        """
+        Fetch and store only the date ranges that are missing, batching symbols
+        that miss the same range into one fetch. A fetched range is covered even
+        without bars in it (holidays, a symbol not listed yet), so it is not
+        requested again.
+        """
+        if self.fetch is None:
+            return
+        by_range = {}
+        for symbol in dict.fromkeys(symbols):
+            for missing in self.missing_ranges(symbol, start, end):
+                by_range.setdefault(missing, []).append(symbol)
+        for (range_start, range_end), range_symbols in by_range.items():
+            if range_start > range_end:
+                continue
+            fetched = self.fetch(
+                range_symbols, range_start.astype(object), range_end.astype(object)
+            )
+            fetched = {
+                symbol: bars.dropna(subset=["close"])
+                for symbol, bars in fetched.items()
+                if bars is not None
+            }
+            for symbol in range_symbols:
+                bars = fetched.get(symbol)
+                if bars is not None and not bars.empty:
+                    self.write(symbol, bars)
+                covered = [range_start, range_end]
+                if symbol in self.coverage:
+                    old_start, old_end = (to_date(d) for d in self.coverage[symbol])
+                    covered = [min(old_start, range_start), max(old_end, range_end)]
+                self.coverage[symbol] = [str(day) for day in covered]
+        tmp_path = self.coverage_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.coverage, file)
+        os.replace(tmp_path, self.coverage_path)
+
+    def get_bars(self, symbol: str, start, end=None) -> pd.DataFrame:
+        """
+        Get stored bars for a symbol between start and end (inclusive) as a
+        date-indexed DataFrame
+        """
+        bars = self.read(symbol)
+        lo = np.searchsorted(bars["date"], to_date(start), side="left")
+        hi = len(bars)
+        if end is not None:
+            hi = np.searchsorted(bars["date"], to_date(end), side="right")
+        window = bars[lo:hi]
+        return pd.DataFrame(
+            {field: window[field] for field in FIELDS},
+            index=pd.DatetimeIndex(window["date"], name="Date"),
+        )
+
+    def load_frame(self, symbols: list, start, end=None, update=True) -> pd.DataFrame:
+        """
+        Load bars for many symbols as one wide frame with (field, ticker) columns,
+        shaped like a yfinance download. Missing ranges are fetched first.
+        End defaults to yesterday so only completed sessions are stored.
+        """
+        if end is None:
+            end = datetime.date.today() - datetime.timedelta(days=1)
+        if update:
+            self.update(symbols, start, end)
+        frames = {symbol: self.get_bars(symbol, start, end) for symbol in symbols}
+        data = pd.concat(frames, axis=1).sort_index()
+        data = data.swaplevel(axis=1)
+        data = data.rename(columns=str.capitalize, level=0)
+        data.columns.names = ["Price", "Ticker"]
+        return data[[field.capitalize() for field in FIELDS]]
+
+
+def fixture_bars(symbols: list, start, periods: int, seed: int = 0) -> dict:
+    """
+    Generate a deterministic random-walk dataset, for offline runs and benchmarks
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(start, periods=periods)
+    bars = {}
+    for symbol in symbols:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, periods)))
+        open = close * np.exp(rng.normal(0, 0.005, periods))
+        high = np.maximum(open, close) * (1 + np.abs(rng.normal(0, 0.01, periods)))
+        low = np.minimum(open, close) * (1 - np.abs(rng.normal(0, 0.01, periods)))
+        volume = rng.integers(100_000, 1_000_000, periods).astype("f8")
+        bars[symbol] = pd.DataFrame(
+            {"open": open, "high": high, "low": low, "close": close, "volume": volume},
+            index=index,
+        )
+    return bars
@@ -0,0 +1,120 @@
+"""
+Screener that replaces the static STOCKS list with ranked candidates from
+every tradable asset.
+
+The asset list is pre-filtered in two passes over bulk daily bars, both
+fetched in chunks with bounded concurrency:
+1. A short window gives the price, average dollar volume and ATR percentage
+   of every asset, which must fall inside the configured bands.
+2. The survivors get the full indicator window, RSI and Bollinger Bands are
+   computed per chunk on wide panels, and they are ranked by RSI, most
+   oversold first.
+"""
+
+import datetime
+import logging
+import pandas as pd
+from alpaca.trading.enums import AssetClass, AssetExchange, AssetStatus
+from alpaca.trading.requests import GetAssetsRequest
+import indicators
+import util
+from config import (
+    get_trade_client,
+    ATR_PERIOD,
+    BARS_CHUNK_SIZE,
+    SCREENER_MIN_PRICE,
+    SCREENER_MAX_PRICE,
+    SCREENER_MIN_DOLLAR_VOLUME,
+    SCREENER_ATR_PERCENTAGE_BAND,
+    SCREENER_PREFILTER_DAYS,
+    SCREENER_MAX_CANDIDATES,
+)
+
+logger = logging.getLogger()
+
+# Candidates of the current run, cleared with the bar cache
+_candidates = None
+
+
+def get_universe() -> list:
+    """
+    Get the symbols of all active, tradable and fractionable US equities outside OTC.
+    Fractionable because buys are placed as notional orders.
+    """
+    assets = get_trade_client().get_all_assets(
+        GetAssetsRequest(status=AssetStatus.ACTIVE, asset_class=AssetClass.US_EQUITY)
+    )
+    return [
+        asset.symbol
+        for asset in assets
+        if asset.tradable and asset.fractionable and asset.exchange != AssetExchange.OTC
+    ]
+
+
+def prefilter(symbols: list) -> pd.DataFrame:
+    """
+    Get price, average dollar volume and ATR percentage over a short window,
+    keeping only stocks inside the configured bands
+    """
+    start_date = datetime.datetime.now() - datetime.timedelta(
+        days=SCREENER_PREFILTER_DAYS
+    )
+    panel = indicators.bars_to_panel(util.get_historical_data_bulk(symbols, start_date))
+    if panel["close"].empty:
+        return pd.DataFrame()
+    close = panel["close"]
+    stats = pd.DataFrame(
+        {
+            "price": close.ffill().iloc[-1],
+            "dollar_volume": (close * panel["volume"]).mean(),
+            "atr_percentage": indicators.atr_percentage(
+                panel["high"], panel["low"], close, ATR_PERIOD
+            )
+            .ffill()
+            .iloc[-1],
+        }
+    )
+    low, high = SCREENER_ATR_PERCENTAGE_BAND
+    return stats[
+        stats["price"].between(SCREENER_MIN_PRICE, SCREENER_MAX_PRICE)
+        & (stats["dollar_volume"] >= SCREENER_MIN_DOLLAR_VOLUME)
+        & stats["atr_percentage"].between(low, high)
+    ]
+
+
+def screen(symbols: list = None) -> pd.DataFrame:
+    """
+    Screen the universe (or the given symbols) and return the latest indicators
+    of the candidates, ranked by RSI, most oversold first
+    """
+    symbols = get_universe() if symbols is None else list(dict.fromkeys(symbols))
+    survivors = prefilter(symbols).index.tolist()
+    logger.info(f"Screener: {len(survivors)}/{len(symbols)} stocks pass the pre-filter")
+    if not survivors:
+        return pd.DataFrame()
+
+    util.load_bars(survivors)
+    latest = pd.concat(
+        [
+            util.calculate_indicators(survivors[i : i + BARS_CHUNK_SIZE])
+            for i in range(0, len(survivors), BARS_CHUNK_SIZE)
+        ]
+    )
+    ranked = latest.dropna(subset=["rsi"]).sort_values("rsi")
+    return ranked.head(SCREENER_MAX_CANDIDATES)
+
+
+def get_candidates() -> list:
+    """
+    Get the ranked candidate stocks, screened once per run
+    """
+    global _candidates
+    if _candidates is None:
+        _candidates = screen().index.tolist()
+        logger.info(f"Screener candidates: {_candidates}")
+    return _candidates
+
+
+def clear_candidates():
+    global _candidates
+    _candidates = None
@@ -1,39 +1,143 @@
 import logging
 import os
-from dotenv import load_dotenv
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
-from io import StringIO
-
-load_dotenv()
+import queue
+import threading
+import time
+from config import (
+    SLACK_CHUNK_SIZE,
+    SLACK_FLUSH_TIMEOUT,
+    SLACK_MAX_RETRIES,
+    SLACK_RETRY_DELAY,
+)
 
 
 class SlackHandler(logging.Handler):
-    def __init__(self, slack_token, slack_channel):
+    """
+    Queue log records and deliver them to Slack from a background thread.
+    Records are batched into messages of at most SLACK_CHUNK_SIZE characters,
+    a single record longer than that is uploaded as a file.
+    """
+
+    def __init__(self, slack_token, slack_channel, client=None):
         logging.Handler.__init__(self)
-        self.client = WebClient(token=slack_token)
+        self.slack_token = slack_token
+        self.client = client
         self.channel = slack_channel
-        self.log_capture_string = StringIO()
+        self.queue = queue.Queue()
+        self.worker = None
+        self.worker_lock = threading.Lock()
+        # slack_sdk logs through the root logger this handler is attached to,
+        # its own warnings must not be queued for delivery to Slack
+        self.addFilter(lambda record: not record.name.startswith("slack_sdk"))
 
     def emit(self, record):
-        log_entry = self.format(record)
-        self.log_capture_string.write(log_entry + "\n")
+        try:
+            log_entry = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        self.start_worker()
+        self.queue.put(log_entry)
 
-    def send_logs_to_slack(self):
-        log_contents = self.log_capture_string.getvalue()
-        if log_contents:
-            try:
-                response = self.client.chat_postMessage(
-                    channel=self.channel, text=log_contents
+    def start_worker(self):
+        with self.worker_lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(
+                    target=self.deliver_logs, name="slack-logger", daemon=True
                 )
-            except SlackApiError as e:
-                print(f"Error sending log to Slack: {e.response['error']}")
+                self.worker.start()
+
+    def deliver_logs(self):
+        """
+        Background loop: send a message whenever the next record would not fit
+        in the current chunk, and send everything pending on a flush request
+        """
+        lines, size = [], 0
+        while True:
+            item = self.queue.get()
+            if isinstance(item, threading.Event):
+                if lines:
+                    self.post_message("\n".join(lines))
+                    lines, size = [], 0
+                item.set()
+                continue
+            if len(item) > SLACK_CHUNK_SIZE:
+                if lines:
+                    self.post_message("\n".join(lines))
+                    lines, size = [], 0
+                self.upload_file(item)
+                continue
+            if size + len(item) + 1 > SLACK_CHUNK_SIZE:
+                self.post_message("\n".join(lines))
+                lines, size = [], 0
+            lines.append(item)
+            size += len(item) + 1
+
+    def get_client(self):
+        if self.client is None:
+            # slack_sdk is only imported when there is something to send
+            from slack_sdk import WebClient
+
+            self.client = WebClient(token=self.slack_token)
+        return self.client
+
+    def post_message(self, text: str):
+        self.call_with_retry("chat_postMessage", channel=self.channel, text=text)
+
+    def upload_file(self, content: str):
+        self.call_with_retry(
+            "files_upload_v2", channel=self.channel, content=content, filename="log.txt"
+        )
+
+    def call_with_retry(self, method: str, **kwargs):
+        """
+        Call a Slack API method, retrying rate limits (after Retry-After),
+        server errors and connection errors with exponential backoff
+        """
+        for attempt in range(SLACK_MAX_RETRIES + 1):
+            delay = SLACK_RETRY_DELAY * 2**attempt
+            try:
+                return getattr(self.get_client(), method)(**kwargs)
+            except Exception as e:
+                response = getattr(e, "response", None)
+                status = getattr(response, "status_code", None)
+                if status is not None and status != 429 and status < 500:
+                    # Not every error response carries Slack's "error" field
+                    detail = response.get("error", e) if hasattr(response, "get") else e
+                    print(f"Error sending log to Slack: {detail}")
+                    return None
+                if status == 429:
+                    headers = getattr(response, "headers", None) or {}
+                    delay = float(
+                        headers.get("Retry-After")
+                        or headers.get("retry-after")
+                        or delay
+                    )
+                error = e
+            if attempt < SLACK_MAX_RETRIES:
+                time.sleep(delay)
+        print(f"Error sending log to Slack after {SLACK_MAX_RETRIES} retries: {error}")
+        return None
+
+    def send_logs_to_slack(self, timeout: float = SLACK_FLUSH_TIMEOUT) -> bool:
+        """
+        Wait up to `timeout` seconds for queued records to be delivered.
+        Returns whether everything was sent, what is left is sent in the background.
+        """
+        if self.worker is None:
+            return True
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def flush(self):
+        self.send_logs_to_slack()
 
 
-def get_slack_handler():
+def get_slack_handler(client=None):
     slack_token = os.getenv("SLACK_API_TOKEN")
     slack_channel = os.getenv("SLACK_CHANNEL")
-    slack_handler = SlackHandler(slack_token, slack_channel)
+    slack_handler = SlackHandler(slack_token, slack_channel, client=client)
     slack_handler.setLevel(logging.INFO)
     formatter = logging.Formatter("%(message)s")
     slack_handler.setFormatter(formatter)
@@ -4,18 +4,22 @@ from pytz import timezone
 from alpaca.trading.requests import (
     OrderRequest,
     TrailingStopOrderRequest,
-    GetOrdersRequest,
 )
 from alpaca.trading.enums import OrderSide, OrderType, TimeInForce, QueryOrderStatus
 from util import (
     calculate_rsi,
     calculate_atr_percentage,
+    calculate_indicators,
     get_current_price,
-    submit_order,
+    load_bars,
 )
+from order_dispatch import OrderDispatcher
+from order_book import OrderBook
+import screener
 from config import (
-    trade_client,
+    get_trade_client,
     STOCKS,
+    SCREENER_ENABLED,
     RSI_LOWER,
     RSI_UPPER,
     ATR_MULTIPLIER,
@@ -25,13 +29,29 @@ from config import (
 logger = logging.getLogger()
 
 
-def sell_stocks():
+def sell_stocks(
+    symbols: list = None, order_book: OrderBook = None, positions: list = None
+):
     """
-    Sell stocks based on the RSI indicator
+    Sell stocks based on the RSI indicator, only positions in `symbols` if given.
+    The order book and positions are fetched unless given, e.g. by the fill tracker.
     """
     logger.info("SELLING STOCKS" + "-" * 100)
 
-    positions = trade_client.get_all_positions()
+    positions = [
+        position
+        for position in (
+            get_trade_client().get_all_positions() if positions is None else positions
+        )
+        if symbols is None or position.symbol in symbols
+    ]
+    load_bars([position.symbol for position in positions])
+    if order_book is None:
+        order_book = OrderBook.load(
+            closed_after=datetime.datetime.now(datetime.timezone.utc)
+            - datetime.timedelta(days=1)
+        )
+    dispatcher = OrderDispatcher()
     for position in positions:
         symbol = position.symbol
         qty = float(position.qty)
@@ -40,19 +60,15 @@ def sell_stocks():
         # Pre-selling checks:
         # 1. Check if there is a FILLED trailing stop order in the last 24 hours
         # 2. Close the position because it's not profitable
-        filter = GetOrdersRequest(
-            symbols=[symbol],
-            status=QueryOrderStatus.CLOSED,
+        existing_orders = order_book.find(
+            symbol,
             side=OrderSide.SELL,
-            after=datetime.datetime.now() - datetime.timedelta(days=1),
+            type=OrderType.TRAILING_STOP,
+            status=QueryOrderStatus.CLOSED,
         )
-        existing_orders = trade_client.get_orders(filter=filter)
         filled_trailing_stop_symbols = set()
         for order in existing_orders:
-            if (
-                order.type == OrderType.TRAILING_STOP
-                and symbol not in filled_trailing_stop_symbols
-            ):
+            if symbol not in filled_trailing_stop_symbols:
                 time_filled_at = order.filled_at.astimezone(timezone("US/Eastern"))
                 logger.info(
                     f"Trailing stop order filled at {time_filled_at} for {order.symbol} {order.qty}"
@@ -67,7 +83,7 @@ def sell_stocks():
                 logger.info(
                     f"Selling {qty} of {symbol} at ${current_price:.2f} due to FILLED trailing stop order"
                 )
-                submit_order(order)
+                dispatcher.submit(order)
                 filled_trailing_stop_symbols.add(symbol)
 
         # Main selling logic:
@@ -76,15 +92,14 @@ def sell_stocks():
         rsi = calculate_rsi(symbol)
         if rsi > RSI_UPPER:
             # Cancel all open (sell trailing stop) orders
-            filter = GetOrdersRequest(
-                symbols=[symbol], status="open", side=OrderSide.SELL
+            existing_orders = order_book.find(
+                symbol, side=OrderSide.SELL, status=QueryOrderStatus.OPEN
             )
-            existing_orders = trade_client.get_orders(filter=filter)
             for order in existing_orders:
                 logger.info(
                     f"Cancelling order: {order.symbol} {order.qty} {order.type}"
                 )
-                trade_client.cancel_order_by_id(order.id)
+                dispatcher.cancel(order)
 
             # Close the position
             order = OrderRequest(
@@ -95,15 +110,27 @@ def sell_stocks():
                 time_in_force=TimeInForce.DAY,
             )
             logger.info(f"Selling {qty} of {symbol} at ${current_price:.2f}")
-            submit_order(order)
+            dispatcher.submit(order)
+
+    dispatcher.run()
 
 
-def place_trailing_stop():
+def place_trailing_stop(symbols: list = None, positions: list = None):
     """
-    Place a sell trailing stop loss order for all positions
+    Place a sell trailing stop loss order for all positions, only positions in
+    `symbols` if given.
+    Positions are fetched unless given.
     """
     logger.info("TRAILING STOP ORDERS" + "-" * 100)
-    positions = trade_client.get_all_positions()
+    positions = [
+        position
+        for position in (
+            get_trade_client().get_all_positions() if positions is None else positions
+        )
+        if symbols is None or position.symbol in symbols
+    ]
+    load_bars([position.symbol for position in positions])
+    dispatcher = OrderDispatcher()
     for position in positions:
         symbol = position.symbol
         available_qty = float(position.qty_available)
@@ -118,20 +145,40 @@ def place_trailing_stop():
                 time_in_force=TimeInForce.GTC,
             )
             logger.info(f"Placing trailing stop order for {qty_to_cover} of {symbol}")
-            submit_order(order)
+            dispatcher.submit(order)
+
+    dispatcher.run()
+
+
+def get_stocks() -> list:
+    """
+    Get the stocks to buy from: the screener's ranked candidates when it is enabled,
+    else STOCKS
+    """
+    if SCREENER_ENABLED:
+        return screener.get_candidates()
+    return STOCKS
 
 
-def buy_stocks():
+def buy_stocks(symbols: list = None):
     """
-    Buy stocks based on the RSI indicator
+    Buy stocks based on the RSI indicator.
+    With `symbols` only those stocks are bought, with the same budget per stock
+    as if every eligible stock were bought.
     """
     logger.info("BUYING STOCKS" + "-" * 100)
-    account = trade_client.get_account()
+    account = get_trade_client().get_account()
     available_buying_power = float(account.buying_power)
     logger.info(f"Available buying power: ${available_buying_power:.2f}")
 
     # Check stocks to buy
-    eligible_stocks = [stock for stock in STOCKS if calculate_rsi(stock) < RSI_LOWER]
+    stocks = get_stocks()
+    latest = calculate_indicators(stocks)
+    eligible_stocks = [
+        stock
+        for stock in stocks
+        if stock in latest.index and latest.at[stock, "rsi"] < RSI_LOWER
+    ]
     logger.info(f"Eligible stocks to buy: {eligible_stocks}")
     if not eligible_stocks:
         return  # No buying opportunity
@@ -140,7 +187,10 @@ def buy_stocks():
     available_buying_power *= 0.9  # Keep 10% as reserve
     budget_per_stock = available_buying_power / len(eligible_stocks)
     budget_per_stock = round(budget_per_stock, 2)
+    if symbols is not None:
+        eligible_stocks = [stock for stock in eligible_stocks if stock in symbols]
     if budget_per_stock >= 1.0:
+        dispatcher = OrderDispatcher()
         for stock in eligible_stocks:
             current_price = get_current_price(stock)
             order = OrderRequest(
@@ -153,10 +203,11 @@ def buy_stocks():
             logger.info(
                 f"Buying ${budget_per_stock} of {stock} at ${current_price:.2f}"
             )
-            submit_order(order)
+            dispatcher.submit(order)
+        dispatcher.run()
     else:
         logger.info(f"Insufficient Budget per stock: ${budget_per_stock:}")
 
     # Log account portfolio
-    account = trade_client.get_account()
+    account = get_trade_client().get_account()
     logger.info(f"Total Equity: ${account.equity}")
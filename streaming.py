@@ -0,0 +1,299 @@
+"""
+Long-running streaming mode for the live strategy.
+
+Minute bars from the Alpaca market data websocket are folded into each stock's
+forming daily bar. RSI and ATR are kept as rolling state, updated in O(1) per
+bar, and the selling or buying logic runs for a stock only when its RSI crosses
+RSI_UPPER or RSI_LOWER. Before it runs, the forming daily bars are written into
+the bar cache, so it trades on streamed prices without refetching history.
+The strategy calls block on REST requests, so they run in worker threads, one
+at a time per stock, while the event loop keeps processing bars.
+
+Run with `python streaming.py`.
+
+With a FillTracker the trade updates stream runs in the same event loop: the
+strategy gets the tracked order book and positions instead of fetching them,
+and trailing stops are placed as soon as a buy fills.
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+import pandas as pd
+from pytz import timezone
+import indicators
+import strategy
+import util
+from config import (
+    get_trade_client,
+    PAPER,
+    STOCKS,
+    RSI_PERIOD,
+    RSI_UPPER,
+    RSI_LOWER,
+    ATR_PERIOD,
+    DATA_RETRIEVAL_PERIOD,
+    BOLLINGER_PERIOD,
+    STREAM_FEED,
+)
+
+logger = logging.getLogger()
+
+ZONE_UPPER = "upper"
+ZONE_LOWER = "lower"
+ZONE_NEUTRAL = "neutral"
+
+
+def rsi_zone(rsi: float) -> str:
+    if rsi > RSI_UPPER:
+        return ZONE_UPPER
+    if rsi < RSI_LOWER:
+        return ZONE_LOWER
+    return ZONE_NEUTRAL
+
+
+def session_date(timestamp) -> datetime.date:
+    """
+    Trading day of a bar timestamp
+    """
+    return pd.Timestamp(timestamp).tz_convert("US/Eastern").date()
+
+
+async def run_streams(streams: list):
+    """
+    Run alpaca-py streams together in the running event loop until they stop
+    """
+    # The streams only offer run(), which blocks in an event loop of its own.
+    # _run_forever() is the coroutine it runs, private API of alpaca-py 0.28.1
+    # (pinned in requirements.txt), to be checked again on upgrades.
+    await asyncio.gather(*(stream._run_forever() for stream in streams))
+
+
+class SymbolState:
+    """
+    Rolling indicators of one stock over completed daily bars, plus the forming
+    daily bar
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.rsi = indicators.RollingRSI(RSI_PERIOD)
+        self.atr = indicators.RollingATR(ATR_PERIOD)
+        self.day = None
+        self.bar = None
+        self.zone = ZONE_NEUTRAL
+
+    def seed(self, bars: pd.DataFrame, today: datetime.date):
+        """
+        Load daily bars, today's bar becomes the forming bar
+        """
+        for timestamp, row in bars.droplevel("symbol").iterrows():
+            day = session_date(timestamp)
+            if day < today:
+                self.rsi.update(row["close"])
+                self.atr.update(row["high"], row["low"], row["close"])
+            else:
+                self.day = day
+                self.bar = {
+                    field: row[field]
+                    for field in ("open", "high", "low", "close", "volume")
+                }
+        self.zone = rsi_zone(self.current_rsi())
+
+    def on_bar(self, bar) -> bool:
+        """
+        Fold a streamed bar into the forming daily bar.
+        Returns whether the RSI moved into a different zone.
+        """
+        day = session_date(bar.timestamp)
+        if self.day is not None and day > self.day:
+            # A new session started, the forming bar is now complete
+            self.rsi.update(self.bar["close"])
+            self.atr.update(self.bar["high"], self.bar["low"], self.bar["close"])
+            self.bar = None
+        if self.bar is None:
+            self.day = day
+            self.bar = {
+                "open": bar.open,
+                "high": bar.high,
+                "low": bar.low,
+                "close": bar.close,
+                "volume": bar.volume,
+            }
+        else:
+            self.bar["high"] = max(self.bar["high"], bar.high)
+            self.bar["low"] = min(self.bar["low"], bar.low)
+            self.bar["close"] = bar.close
+            self.bar["volume"] += bar.volume
+        zone = rsi_zone(self.current_rsi())
+        crossed = zone != self.zone
+        self.zone = zone
+        return crossed
+
+    def current_rsi(self) -> float:
+        return self.rsi.value(self.bar["close"] if self.bar else None)
+
+    def current_atr_percentage(self) -> float:
+        if not self.bar:
+            return float("nan")
+        atr = self.atr.value(self.bar["high"], self.bar["low"], self.bar["close"])
+        return atr / self.bar["close"] * 100
+
+
+class SignalStream:
+    """
+    Run the live strategy for a stock when its streamed RSI crosses a threshold
+    """
+
+    def __init__(self, stream, symbols: list = None, fills=None):
+        self.stream = stream
+        self.fills = fills
+        self.symbols = list(dict.fromkeys(symbols or STOCKS))
+        self.states = {symbol: SymbolState(symbol) for symbol in self.symbols}
+        self.trailing_stop_pending = set()
+        # Fill reactions take the same per stock locks as the strategy calls
+        self.locks = fills.locks if fills else {}
+        self.tasks = set()
+
+    def seed(self):
+        """
+        Load daily bars once and build the rolling state of every stock
+        """
+        days = max(RSI_PERIOD, ATR_PERIOD, BOLLINGER_PERIOD) + DATA_RETRIEVAL_PERIOD
+        util.load_bars(self.symbols, days)
+        today = datetime.datetime.now(timezone("US/Eastern")).date()
+        for symbol, state in self.states.items():
+            bars = util.get_bars(symbol, days)
+            if bars is not None and not bars.empty:
+                state.seed(bars, today)
+
+    def flush_forming_bars(self):
+        """
+        Write every stock's forming daily bar into the bar cache
+        """
+        for symbol, state in self.states.items():
+            if state.bar:
+                timestamp = pd.Timestamp(state.day, tz="US/Eastern").tz_convert("UTC")
+                util.update_cached_bar(symbol, timestamp, state.bar)
+
+    def dispatch(self, symbol: str, function, *args, **kwargs):
+        """
+        Run a blocking strategy call in a worker thread, so the event loop keeps
+        processing bars meanwhile. Calls for the same stock run one at a time,
+        in the order they were dispatched. `positions` may be given as a function,
+        it is then read when the call starts.
+        """
+        task = asyncio.create_task(
+            self.call_in_thread(symbol, function, *args, **kwargs)
+        )
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def call_in_thread(self, symbol: str, function, *args, **kwargs):
+        async with self.locks.setdefault(symbol, asyncio.Lock()):
+            if callable(kwargs.get("positions")):
+                # Read on the event loop, where trade updates change them
+                kwargs["positions"] = kwargs["positions"]()
+            try:
+                await asyncio.to_thread(function, *args, **kwargs)
+            except Exception:
+                logger.exception(f"{function.__name__} failed for {symbol}")
+
+    async def drain(self):
+        """
+        Wait for every dispatched strategy call to finish
+        """
+        while self.tasks:
+            await asyncio.gather(*self.tasks)
+
+    async def on_bar(self, bar):
+        state = self.states.get(bar.symbol)
+        if state is None:
+            return
+        if bar.symbol in self.trailing_stop_pending:
+            # Protect stocks bought on an earlier bar once the position exists
+            self.trailing_stop_pending.discard(bar.symbol)
+            self.dispatch(bar.symbol, strategy.place_trailing_stop, [bar.symbol])
+        if not state.on_bar(bar):
+            return
+
+        rsi = state.current_rsi()
+        logger.info(
+            f"{bar.symbol} RSI {rsi:.2f} crossed into {state.zone} zone "
+            f"(ATR {state.current_atr_percentage():.2f}%)"
+        )
+        if state.zone == ZONE_NEUTRAL:
+            return
+        self.flush_forming_bars()
+        if state.zone == ZONE_UPPER:
+            if self.fills:
+                self.dispatch(
+                    bar.symbol,
+                    strategy.sell_stocks,
+                    [bar.symbol],
+                    order_book=self.fills.order_book,
+                    positions=self.fills.positions,
+                )
+            else:
+                self.dispatch(bar.symbol, strategy.sell_stocks, [bar.symbol])
+        else:
+            self.dispatch(bar.symbol, strategy.buy_stocks, [bar.symbol])
+            if not self.fills:
+                # Without fill tracking the position is only known on a later bar
+                self.trailing_stop_pending.add(bar.symbol)
+
+    def run(self):
+        """
+        Seed the rolling state and process streamed bars, and trade updates
+        when tracking fills, until the streams stop
+        """
+        self.seed()
+        self.stream.subscribe_bars(self.on_bar, *self.symbols)
+        streams = [self.stream]
+        if self.fills:
+            self.fills.seed()
+            self.fills.subscribe()
+            streams.append(self.fills.stream)
+
+        async def run():
+            try:
+                await run_streams(streams)
+            finally:
+                await self.drain()
+
+        asyncio.run(run())
+
+
+def run_stream():
+    """
+    Stream minute bars for the stocks to buy from and current positions,
+    and track order fills, until interrupted
+    """
+    from alpaca.data.enums import DataFeed
+    from alpaca.data.live import StockDataStream
+    from alpaca.trading.stream import TradingStream
+    from fill_tracker import FillTracker
+
+    stream = StockDataStream(
+        api_key=os.getenv("ALPACA_API_KEY"),
+        secret_key=os.getenv("ALPACA_SECRET_KEY"),
+        feed=DataFeed(STREAM_FEED),
+    )
+    fills = FillTracker(
+        TradingStream(
+            api_key=os.getenv("ALPACA_API_KEY"),
+            secret_key=os.getenv("ALPACA_SECRET_KEY"),
+            paper=PAPER,
+        )
+    )
+    positions = [position.symbol for position in get_trade_client().get_all_positions()]
+    SignalStream(stream, strategy.get_stocks() + positions, fills=fills).run()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    run_stream()
@@ -0,0 +1,12 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules live at the repo root (the Lambda package) and in backtesting/,
+# whose scripts import each other and `parameters` by bare name. The fake
+# broker lives with the benchmarks in benchmark/.
+sys.path[:0] = [
+    ROOT,
+    os.path.join(ROOT, "backtesting"),
+    os.path.join(ROOT, "benchmark"),
+]
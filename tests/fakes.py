@@ -0,0 +1,132 @@
+"""
+Local stand-ins for the external services the tests replace.
+"""
+
+import asyncio
+import time
+import pandas as pd
+
+
+class SlackError(Exception):
+    """
+    Error shaped like slack_sdk's SlackApiError: a response with a status
+    code, headers and a dict-like body
+    """
+
+    class Response(dict):
+        def __init__(self, status_code: int, headers: dict = None, body: dict = None):
+            super().__init__(body or {})
+            self.status_code = status_code
+            self.headers = headers or {}
+
+    def __init__(self, status_code: int, headers: dict = None, body: dict = None):
+        super().__init__(f"Slack API error {status_code}")
+        self.response = self.Response(status_code, headers, body)
+
+
+class FakeSlackClient:
+    """
+    Local stand-in for slack_sdk's WebClient that records what would be sent.
+    The first calls raise the given errors in order, to exercise retries.
+    """
+
+    def __init__(self, errors: list = None, latency: float = 0.0):
+        self.errors = list(errors or [])
+        self.latency = latency
+        self.messages = []
+        self.files = []
+        self.calls = 0
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.errors:
+            raise self.errors.pop(0)
+
+    def chat_postMessage(self, channel, text, **kwargs):
+        self._call()
+        self.messages.append(text)
+        return {"ok": True}
+
+    def files_upload_v2(self, channel, content, **kwargs):
+        self._call()
+        self.files.append(content)
+        return {"ok": True}
+
+
+class ReplayStream:
+    """
+    Local stand-in for StockDataStream that replays recorded bars in time order
+    """
+
+    def __init__(self, bars: list):
+        self.bars = bars
+        self.handlers = {}
+
+    @classmethod
+    def from_frame(cls, bars: pd.DataFrame):
+        """
+        Build a replay from bars with a (symbol, timestamp) index, as returned
+        by the data client
+        """
+        from alpaca.data.models import Bar
+
+        return cls(
+            [
+                Bar(
+                    symbol,
+                    {
+                        "t": timestamp,
+                        "o": row["open"],
+                        "h": row["high"],
+                        "l": row["low"],
+                        "c": row["close"],
+                        "v": row["volume"],
+                        "n": row.get("trade_count", 0),
+                        "vw": row.get("vwap", row["close"]),
+                    },
+                )
+                for (symbol, timestamp), row in bars.iterrows()
+            ]
+        )
+
+    def subscribe_bars(self, handler, *symbols):
+        for symbol in symbols:
+            self.handlers[symbol] = handler
+
+    def run(self):
+        asyncio.run(self._run_forever())
+
+    async def _run_forever(self):
+        for bar in sorted(self.bars, key=lambda bar: bar.timestamp):
+            handler = self.handlers.get(bar.symbol)
+            if handler is not None:
+                await handler(bar)
+
+    def stop(self):
+        pass
+
+
+class ReplayTradingStream:
+    """
+    Local stand-in for TradingStream that replays recorded trade updates in order
+    """
+
+    def __init__(self, updates: list):
+        self.updates = updates
+        self.handler = None
+
+    def subscribe_trade_updates(self, handler):
+        self.handler = handler
+
+    def run(self):
+        asyncio.run(self._run_forever())
+
+    async def _run_forever(self):
+        for update in sorted(self.updates, key=lambda update: update.timestamp):
+            if self.handler is not None:
+                await self.handler(update)
+
+    def stop(self):
+        pass
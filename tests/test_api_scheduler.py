@@ -0,0 +1,107 @@
+import datetime
+import json
+import threading
+import time
+from alpaca.data.requests import StockBarsRequest
+from alpaca.data.timeframe import TimeFrame
+import api_scheduler
+
+
+def bars_request(end: datetime.datetime) -> StockBarsRequest:
+    return StockBarsRequest(
+        symbol_or_symbols=["AMZN", "BAC"],
+        timeframe=TimeFrame.Day,
+        start=end - datetime.timedelta(days=30),
+        end=end,
+    )
+
+
+def test_request_keys_match_within_the_minute():
+    end = datetime.datetime(2024, 5, 1, 15, 40, 10)
+
+    key = api_scheduler.request_key((bars_request(end),), {})
+
+    later = end + datetime.timedelta(seconds=45, microseconds=5)
+    assert api_scheduler.request_key((bars_request(later),), {}) == key
+    next_minute = end + datetime.timedelta(seconds=50)
+    assert api_scheduler.request_key((bars_request(next_minute),), {}) != key
+    assert api_scheduler.request_key((), {"request_params": bars_request(end)}) != key
+
+
+def test_concurrent_reads_share_one_call_with_the_exact_times():
+    sent = []
+
+    def get_stock_bars(request_params):
+        sent.append(request_params)
+        time.sleep(0.1)
+        return len(sent)
+
+    scheduler = api_scheduler.Scheduler(6000, 10, 0, 0.0)
+    end = datetime.datetime(2024, 5, 1, 15, 40, 10, 123456)
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda seconds=seconds: results.append(
+                scheduler.call(
+                    get_stock_bars,
+                    True,
+                    bars_request(end + datetime.timedelta(seconds=seconds)),
+                )
+            )
+        )
+        for seconds in (0, 5, 10)
+    ]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert results == [1, 1, 1]
+    # The request that went out is not truncated
+    assert [request.end for request in sent] == [end]
+
+
+def bars_page(close: float, page_token: str = None) -> dict:
+    bar = {"t": "2024-05-01T04:00:00Z", "o": 1, "h": 1, "l": 1, "c": close}
+    bar.update(v=1, n=1, vw=1)
+    return {"bars": {"AMZN": [bar]}, "next_page_token": page_token}
+
+
+def test_every_page_takes_a_token_and_is_retried_on_its_own(monkeypatch):
+    from alpaca.data.historical import StockHistoricalDataClient
+    from requests.adapters import HTTPAdapter
+    from requests.models import Response
+    import http_pool
+
+    responses = [
+        (200, bars_page(1.0, "page-2")),
+        (429, {"message": "too many requests"}),
+        (200, bars_page(2.0)),
+    ]
+    sent = []
+
+    def send(adapter, request, **kwargs):
+        sent.append(request.url)
+        status, body = responses[len(sent) - 1]
+        response = Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode()
+        response._content_consumed = True
+        response.request = request
+        return response
+
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    scheduler = api_scheduler.Scheduler(60, 10, 2, 0.0)
+    client = StockHistoricalDataClient(api_key="key", secret_key="secret")
+    http_pool.configure_session(client._session, 2, 60, scheduler)
+    scheduled = api_scheduler.ScheduledClient(client, scheduler, paced=False)
+
+    bars = scheduled.get_stock_bars(bars_request(datetime.datetime(2024, 5, 2)))
+
+    assert [bar.close for bar in bars.data["AMZN"]] == [1.0, 2.0]
+    # The rate limited second page was sent again, not the whole call
+    assert len(sent) == 3
+    assert "page_token" not in sent[0]
+    assert "page_token=page-2" in sent[1] and sent[2] == sent[1]
+    assert round(scheduler.bucket.tokens) == 10 - 3
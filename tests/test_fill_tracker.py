@@ -0,0 +1,220 @@
+import asyncio
+import datetime
+import time
+from types import SimpleNamespace
+import pytest
+from alpaca.trading.enums import (
+    OrderSide,
+    OrderStatus,
+    OrderType,
+    QueryOrderStatus,
+    TradeEvent,
+)
+import config
+import strategy
+import util
+from fake_alpaca import FakeOrder, build_clients, synthetic_day
+from fill_tracker import FillTracker
+from order_book import OrderBook
+from streaming import SignalStream
+from fakes import ReplayTradingStream
+
+
+def now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def trade_update(event: TradeEvent, order, position_qty: str):
+    """
+    Trade update with the fields the tracker reads
+    """
+    return SimpleNamespace(
+        event=event,
+        order=order,
+        position_qty=position_qty,
+        timestamp=order.filled_at or now(),
+    )
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    """
+    Fake broker holding 10.5 AMZN, 10 of them under an open trailing stop,
+    and 3.2 BAC
+    """
+    day = synthetic_day(["AMZN", "BAC"], seed=1)
+    day["positions"] = [
+        {"symbol": "AMZN", "qty": "10.5", "qty_available": "0.5"},
+        {"symbol": "BAC", "qty": "3.2", "qty_available": "3.2"},
+    ]
+    day["orders"] = [
+        {
+            "symbol": "AMZN",
+            "side": "sell",
+            "type": "trailing_stop",
+            "status": "new",
+            "qty": "10",
+            "trail_percent": "4",
+            "time_in_force": "gtc",
+            "submitted_at": (now() - datetime.timedelta(days=2)).isoformat(),
+        }
+    ]
+    broker, data = build_clients(day)
+    monkeypatch.setattr(config, "_trade_client", broker)
+    monkeypatch.setattr(config, "_data_client", data)
+    monkeypatch.setattr(util, "_bar_cache", {})
+    return broker
+
+
+def count_calls(monkeypatch, broker) -> list:
+    """
+    Record the order and position lookups made on the broker
+    """
+    calls = []
+    for name in ("get_orders", "get_all_positions"):
+        method = getattr(broker, name)
+
+        def recorded(*args, method=method, name=name, **kwargs):
+            calls.append(name)
+            return method(*args, **kwargs)
+
+        monkeypatch.setattr(broker, name, recorded)
+    return calls
+
+
+def test_trailing_stop_fill_sells_the_fractional_remainder(broker, monkeypatch):
+    tracker = FillTracker(ReplayTradingStream([]))
+    tracker.seed()
+    stop = broker.orders[0]
+    assert tracker.order_book.find(
+        "AMZN", OrderSide.SELL, OrderType.TRAILING_STOP, QueryOrderStatus.OPEN
+    ) == [stop]
+    calls = count_calls(monkeypatch, broker)
+
+    # The broker fills the stop, 0.5 shares it did not cover are left
+    stop.status = OrderStatus.FILLED
+    stop.filled_at = now()
+    stop.filled_qty = "10"
+    stop.filled_avg_price = "100"
+    broker.positions["AMZN"] = [0.5, 0.5]
+    asyncio.run(tracker.on_trade_update(trade_update(TradeEvent.FILL, stop, "0.5")))
+
+    assert [(o.symbol, o.side, o.type, o.qty) for o in broker.submitted] == [
+        ("AMZN", OrderSide.SELL, OrderType.MARKET, "0.5")
+    ]
+    # The stop is filed again as closed, the book and positions came from updates
+    assert tracker.order_book.find("AMZN", status=QueryOrderStatus.OPEN) == []
+    assert tracker.order_book.find("AMZN", status=QueryOrderStatus.CLOSED) == [stop]
+    assert tracker.position_qty["AMZN"] == 0.5
+    assert calls == []
+
+
+def test_buy_fill_places_the_trailing_stop(broker):
+    buy = FakeOrder(
+        symbol="BAC",
+        side=OrderSide.BUY,
+        type=OrderType.MARKET,
+        status=OrderStatus.FILLED,
+        submitted_at=now(),
+        notional="160",
+        filled_at=now(),
+        filled_qty="3.2",
+        filled_avg_price="50",
+    )
+    tracker = FillTracker(
+        ReplayTradingStream([trade_update(TradeEvent.FILL, buy, "3.2")])
+    )
+
+    tracker.run()
+
+    assert [(o.symbol, o.side, o.type, o.qty) for o in broker.submitted] == [
+        ("BAC", OrderSide.SELL, OrderType.TRAILING_STOP, "3.0")
+    ]
+    assert tracker.position_qty["BAC"] == 3.2
+    assert tracker.order_book.find("BAC", status=QueryOrderStatus.CLOSED) == [buy]
+
+
+def test_fill_and_signal_for_one_stock_run_one_at_a_time(broker, monkeypatch):
+    tracker = FillTracker(ReplayTradingStream([]))
+    tracker.seed()
+    signals = SignalStream(ReplayTradingStream([]), ["AMZN"], fills=tracker)
+    calls = []
+
+    def sell_stocks(symbols, **kwargs):
+        calls.append(("start", symbols))
+        time.sleep(0.05)
+        calls.append(("end", symbols))
+
+    monkeypatch.setattr(strategy, "sell_stocks", sell_stocks)
+    stop = broker.orders[0]
+    stop.status = OrderStatus.FILLED
+    stop.filled_at = now()
+    stop.filled_qty = "10"
+    stop.filled_avg_price = "100"
+
+    async def replay():
+        # An upper zone signal and the stop's fill arrive together
+        signals.dispatch(
+            "AMZN",
+            strategy.sell_stocks,
+            ["AMZN"],
+            order_book=tracker.order_book,
+            positions=tracker.positions,
+        )
+        await tracker.on_trade_update(trade_update(TradeEvent.FILL, stop, "0.5"))
+        await signals.drain()
+
+    asyncio.run(replay())
+
+    assert calls == [
+        ("start", ["AMZN"]),
+        ("end", ["AMZN"]),
+        ("start", ["AMZN"]),
+        ("end", ["AMZN"]),
+    ]
+
+
+def test_partial_fill_only_updates_the_book(broker):
+    tracker = FillTracker(ReplayTradingStream([]))
+    tracker.seed()
+    stop = broker.orders[0]
+    stop.status = OrderStatus.PARTIALLY_FILLED
+    stop.filled_qty = "4"
+    broker.positions["AMZN"] = [6.5, 0.5]
+
+    asyncio.run(
+        tracker.on_trade_update(trade_update(TradeEvent.PARTIAL_FILL, stop, "6.5"))
+    )
+
+    assert broker.submitted == []
+    assert tracker.order_book.find("AMZN", status=QueryOrderStatus.OPEN) == [stop]
+    # The unfilled 6 shares of the stop stay held
+    assert [(p.symbol, p.qty, p.qty_available) for p in tracker.positions()] == [
+        ("AMZN", 6.5, 0.5),
+        ("BAC", 3.2, 3.2),
+    ]
+
+
+def test_closed_orders_are_refiled_and_pruned():
+    book = OrderBook()
+    order = FakeOrder(
+        symbol="AMZN",
+        side=OrderSide.SELL,
+        type=OrderType.TRAILING_STOP,
+        status=OrderStatus.NEW,
+        submitted_at=now() - datetime.timedelta(days=3),
+        qty="10",
+    )
+    book.update(order)
+    assert book.find("AMZN", status=QueryOrderStatus.OPEN) == [order]
+
+    order.status = OrderStatus.FILLED
+    order.filled_at = now() - datetime.timedelta(days=2)
+    book.update(order)
+    assert book.find("AMZN", status=QueryOrderStatus.OPEN) == []
+    assert book.find(
+        "AMZN", OrderSide.SELL, OrderType.TRAILING_STOP, QueryOrderStatus.CLOSED
+    ) == [order]
+
+    book.prune(FillTracker.closed_after())
+    assert book.find("AMZN") == []
@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+from indicator_cache import IndicatorCache
+from price_store import fixture_bars
+
+TICKERS = ["AAA", "BBB"]
+
+
+@pytest.fixture
+def data():
+    bars = fixture_bars(TICKERS, "2024-01-01", 120)
+    return pd.concat(
+        {
+            field.capitalize(): pd.DataFrame(
+                {ticker: df[field] for ticker, df in bars.items()}
+            )
+            for field in ("open", "high", "low", "close", "volume")
+        },
+        axis=1,
+    )
+
+
+def test_frames_are_capped_and_lines_reused(data):
+    cache = IndicatorCache(data, max_frames=6)
+    first = cache.indicators(TICKERS, bollinger_period=10)
+    cache.indicators(TICKERS, bollinger_period=20)
+
+    assert len(cache.frames) == 6
+    # The rsi and atr frames were used again, the first Bollinger frames dropped
+    assert ("bb_top", 10, 0.8, tuple(TICKERS)) not in cache.frames
+    assert ("rsi", 14, None, tuple(TICKERS)) in cache.frames
+    computed = cache.computed
+
+    again = cache.indicators(TICKERS, bollinger_period=10)
+    # Dropped frames are rebuilt from the cached lines, nothing is recomputed
+    assert cache.computed == computed
+    pd.testing.assert_frame_equal(again["bb_top"], first["bb_top"])
@@ -0,0 +1,122 @@
+import datetime
+import pandas as pd
+import pytest
+from pytz import timezone
+import config
+import indicators
+import util
+from config import ATR_PERIOD, RSI_PERIOD
+from fake_alpaca import FakeMarketData, build_clients, synthetic_day
+from indicator_state import LocalStateStore, session_dates
+
+SYMBOLS = ["AMZN", "BAC"]
+DAYS = 40
+
+
+class RecordingMarketData(FakeMarketData):
+    """
+    Fake market data serving only the bars before `cutoff`, recording the
+    requested start times
+    """
+
+    def __init__(self, bars: dict, cutoff: datetime.date = None):
+        super().__init__(
+            {
+                symbol: [
+                    bar
+                    for bar in raw
+                    if cutoff is None
+                    or session_dates(pd.DatetimeIndex([bar["t"]]))[0] < cutoff
+                ]
+                for symbol, raw in bars.items()
+            }
+        )
+        self.starts = []
+
+    def get_stock_bars(self, request_params):
+        self.starts.append(request_params.start)
+        return super().get_stock_bars(request_params)
+
+
+@pytest.fixture
+def bars(tmp_path, monkeypatch):
+    """
+    Raw bars of a synthetic day, with a temporary indicator state store
+    """
+    monkeypatch.setattr(util, "_bar_cache", {})
+    monkeypatch.setattr(util, "_indicator_state", {})
+    monkeypatch.setattr(util, "_state_snapshot", None)
+    monkeypatch.setattr(util, "_price_store", None)
+    monkeypatch.setattr(util, "PRICE_STORE_DIR", None)
+    monkeypatch.setattr(
+        util, "_state_store", LocalStateStore(str(tmp_path / "state.json"))
+    )
+    _, market_data = build_clients(synthetic_day(SYMBOLS, seed=2))
+    return {symbol: raw for symbol, (_, raw) in market_data.bars.items()}
+
+
+def today() -> datetime.date:
+    return datetime.datetime.now(timezone("US/Eastern")).date()
+
+
+def previous_run(bars: dict, monkeypatch):
+    """
+    Load and save the indicator state as a run two days ago would have
+    """
+    monkeypatch.setattr(
+        config,
+        "_data_client",
+        RecordingMarketData(bars, cutoff=today() - datetime.timedelta(days=2)),
+    )
+    util.load_bars(SYMBOLS, DAYS)
+    util.save_indicator_state()
+    util.clear_bar_cache()
+
+
+def test_restored_state_plus_new_bars_equals_a_full_recompute(bars, monkeypatch):
+    previous_run(bars, monkeypatch)
+    saved = util.get_state_store().load()["symbols"]
+
+    data = RecordingMarketData(bars)
+    monkeypatch.setattr(config, "_data_client", data)
+    util.load_bars(SYMBOLS, DAYS)
+
+    # Only the bars after the saved state were requested
+    assert [start.date() for start in data.starts] == [
+        datetime.date.fromisoformat(saved["AMZN"]["date"]) + datetime.timedelta(days=1)
+    ]
+    for symbol in SYMBOLS:
+        full = FakeMarketData(bars).bars[symbol][1]
+        high = pd.Series([bar["h"] for bar in full])
+        low = pd.Series([bar["l"] for bar in full])
+        close = pd.Series([bar["c"] for bar in full])
+        assert util.get_indicator_state(symbol) is not None
+        assert util.calculate_rsi(symbol) == pytest.approx(
+            indicators.rsi(close, RSI_PERIOD).iloc[-1]
+        )
+        assert util.calculate_atr_percentage(symbol) == pytest.approx(
+            indicators.atr_percentage(high, low, close, ATR_PERIOD).iloc[-1]
+        )
+
+
+def test_stale_state_is_ignored(bars, monkeypatch):
+    previous_run(bars, monkeypatch)
+    # Every saved state is now older than the maximum age
+    monkeypatch.setattr(util, "INDICATOR_STATE_MAX_AGE_DAYS", 0)
+
+    data = RecordingMarketData(bars)
+    monkeypatch.setattr(config, "_data_client", data)
+    util.load_bars(SYMBOLS, DAYS)
+
+    # The whole window was fetched again and the state rebuilt from it
+    assert len(data.starts) == 1
+    assert (
+        data.starts[0].date()
+        == (datetime.datetime.now() - datetime.timedelta(days=DAYS)).date()
+    )
+    last = max(
+        date
+        for date in session_dates(pd.DatetimeIndex([bar["t"] for bar in bars["AMZN"]]))
+        if date < today()
+    )
+    assert util._indicator_state["AMZN"].date == last
@@ -0,0 +1,77 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import indicators
+from price_store import fixture_bars
+
+
+def test_latest_values_leave_out_symbols_without_a_current_bar():
+    bars = {}
+    for symbol, df in fixture_bars(["AAA", "BBB"], "2024-01-01", 60).items():
+        df.index = pd.MultiIndex.from_arrays(
+            [[symbol] * len(df), df.index.tz_localize("UTC")],
+            names=["symbol", "timestamp"],
+        )
+        bars[symbol] = df
+    # BBB did not trade on the last day
+    bars["BBB"] = bars["BBB"].iloc[:-1]
+    panel = indicators.bars_to_panel(bars)
+    computed = indicators.compute_indicators(
+        panel["high"],
+        panel["low"],
+        panel["close"],
+        rsi_period=14,
+        atr_period=7,
+        bollinger_period=14,
+        bollinger_std=0.8,
+    )
+
+    latest = indicators.latest_values(computed, panel["close"])
+
+    assert list(latest.index) == ["AAA"]
+    assert latest.at["AAA", "rsi"] == computed["rsi"]["AAA"].iloc[-1]
+
+
+def round_trip(rolling):
+    """
+    Restore a rolling indicator from its state as it is persisted
+    """
+    return type(rolling).from_dict(json.loads(json.dumps(rolling.to_dict())))
+
+
+@pytest.mark.parametrize(
+    "smoothing", [indicators.SMOOTHING_SIMPLE, indicators.SMOOTHING_WILDER]
+)
+def test_rolling_indicators_match_the_kernels(smoothing):
+    bars = fixture_bars(["AAA"], "2024-01-01", 80)["AAA"]
+    high, low, close = bars["high"], bars["low"], bars["close"]
+    expected = {
+        "average": indicators.smooth(close, 10, smoothing),
+        "rsi": indicators.rsi(close, 14, smoothing),
+        "atr": indicators.atr(high, low, close, 7, smoothing),
+    }
+    average = indicators.RollingAverage(10, smoothing)
+    rsi = indicators.RollingRSI(14, smoothing)
+    atr = indicators.RollingATR(7, smoothing)
+
+    for i in range(len(bars)):
+        if i == len(bars) // 2:
+            average, rsi, atr = round_trip(average), round_trip(rsi), round_trip(atr)
+        # The forming bar is included without being added
+        forming = {
+            "average": average.value(close.iloc[i]),
+            "rsi": rsi.value(close.iloc[i]),
+            "atr": atr.value(high.iloc[i], low.iloc[i], close.iloc[i]),
+        }
+        average.update(close.iloc[i])
+        rsi.update(close.iloc[i])
+        atr.update(high.iloc[i], low.iloc[i], close.iloc[i])
+        completed = {
+            "average": average.value(),
+            "rsi": rsi.value(),
+            "atr": atr.value(),
+        }
+        for name, series in expected.items():
+            np.testing.assert_allclose(forming[name], series.iloc[i], rtol=1e-9)
+            np.testing.assert_allclose(completed[name], series.iloc[i], rtol=1e-9)
@@ -0,0 +1,22 @@
+import metrics
+
+
+def test_calls_are_aggregated_with_bounded_latencies(monkeypatch):
+    monkeypatch.setattr(metrics, "LATENCY_SAMPLES", 10)
+    metrics.reset()
+    with metrics.stage("stream"):
+        for i in range(1, 101):
+            metrics.record("get_orders", i / 1000, 2)
+
+    (stats,) = metrics._calls.values()
+    assert len(stats.latencies) == 10
+    (call,) = metrics.summary()["calls"]
+    metrics.reset()
+
+    assert call["stage"] == "stream"
+    assert call["count"] == 100
+    assert call["payload"] == 200
+    assert call["total_ms"] == 5050.0
+    # Percentiles of the latest calls
+    assert call["p50_ms"] == 96.0
+    assert metrics._calls == {}
@@ -0,0 +1,47 @@
+import datetime
+import pytest
+from alpaca.trading.enums import OrderSide, OrderStatus, OrderType, QueryOrderStatus
+from alpaca.trading.requests import GetOrdersRequest
+import config
+import order_book
+from fake_alpaca import FakeBroker, FakeOrder
+
+
+def seconds_ago(*seconds) -> list:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [now - datetime.timedelta(seconds=second) for second in seconds]
+
+
+@pytest.mark.parametrize(
+    "times",
+    [
+        # The oldest order of the first page shares its timestamp with two
+        # orders that only fit on the next page
+        seconds_ago(0, 1, 2, 2, 2, 3),
+        # The whole first page shares one timestamp
+        seconds_ago(2, 2, 2, 3, 4),
+    ],
+)
+def test_paging_keeps_orders_sharing_the_page_boundary(monkeypatch, times):
+    broker = FakeBroker({"cash": "0"}, [], [], {})
+    broker.orders = [
+        FakeOrder(
+            symbol=f"S{i}",
+            side=OrderSide.SELL,
+            type=OrderType.TRAILING_STOP,
+            status=OrderStatus.NEW,
+            submitted_at=submitted_at,
+        )
+        for i, submitted_at in enumerate(times)
+    ]
+    monkeypatch.setattr(config, "_trade_client", broker)
+    # Pages of three orders
+    monkeypatch.setattr(order_book, "ORDERS_PAGE_LIMIT", 3)
+
+    orders = order_book.get_all_orders(
+        GetOrdersRequest(status=QueryOrderStatus.OPEN, side=OrderSide.SELL)
+    )
+
+    assert sorted(order.symbol for order in orders) == [
+        f"S{i}" for i in range(len(times))
+    ]
@@ -0,0 +1,113 @@
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+import order_dispatch
+from order_dispatch import OrderDispatcher
+
+
+class Broker:
+    """
+    Records when every order action starts and ends, `behaviour` maps a
+    symbol to a function run in the middle of its actions
+    """
+
+    def __init__(self, behaviour: dict = None):
+        self.behaviour = behaviour or {}
+        self.events = []
+        self.lock = threading.Lock()
+
+    def act(self, action: str, order):
+        with self.lock:
+            self.events.append(("start", action, order.symbol, order.id))
+        self.behaviour.get(order.symbol, lambda: time.sleep(0.02))()
+        with self.lock:
+            self.events.append(("end", action, order.symbol, order.id))
+        return order
+
+    def submit_order(self, order):
+        return self.act("submit", order)
+
+    def cancel_order_by_id(self, order_id):
+        return self.act("cancel", SimpleNamespace(symbol=order_id[0], id=order_id))
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = Broker()
+    monkeypatch.setattr(order_dispatch, "submit_order", broker.submit_order)
+    monkeypatch.setattr(order_dispatch, "get_trade_client", lambda: broker)
+    return broker
+
+
+def order(symbol: str, number: int):
+    return SimpleNamespace(symbol=symbol, id=(symbol, number))
+
+
+def test_actions_on_one_symbol_run_in_queue_order(broker):
+    dispatcher = OrderDispatcher(max_workers=4)
+    dispatcher.cancel(order("AMZN", 1))
+    dispatcher.submit(order("AMZN", 2))
+    dispatcher.submit(order("AMZN", 3))
+
+    results = dispatcher.run()
+
+    assert [(r.action, r.status) for r in results] == [
+        ("cancel", "cancelled"),
+        ("submit", "submitted"),
+        ("submit", "submitted"),
+    ]
+    # Each action ends before the next one starts
+    assert [(event, number) for event, _, _, (_, number) in broker.events] == [
+        ("start", 1),
+        ("end", 1),
+        ("start", 2),
+        ("end", 2),
+        ("start", 3),
+        ("end", 3),
+    ]
+
+
+def test_different_symbols_run_in_parallel(broker):
+    # Only returns if both symbols are in flight at the same time
+    barrier = threading.Barrier(2, timeout=5)
+    broker.behaviour = {"AMZN": barrier.wait, "BAC": barrier.wait}
+    dispatcher = OrderDispatcher(max_workers=2)
+    dispatcher.submit(order("AMZN", 1))
+    dispatcher.submit(order("BAC", 1))
+
+    results = dispatcher.run()
+
+    assert sorted((r.symbol, r.status) for r in results) == [
+        ("AMZN", "submitted"),
+        ("BAC", "submitted"),
+    ]
+
+
+def test_first_failure_is_raised_after_the_others_finish(broker):
+    def reject(reason: str, delay: float):
+        def fail():
+            time.sleep(delay)
+            raise ValueError(reason)
+
+        return fail
+
+    broker.behaviour = {
+        "AMZN": reject("AMZN rejected", 0.05),
+        "BAC": reject("BAC rejected", 0.0),
+        "MSFT": lambda: time.sleep(0.1),
+    }
+    dispatcher = OrderDispatcher(max_workers=3)
+    dispatcher.submit(order("AMZN", 1))
+    dispatcher.submit(order("AMZN", 2))
+    dispatcher.submit(order("BAC", 1))
+    dispatcher.submit(order("MSFT", 1))
+
+    # The failure of the first queued symbol, though BAC failed earlier
+    with pytest.raises(ValueError, match="AMZN rejected"):
+        dispatcher.run()
+
+    assert ("end", "submit", "MSFT", ("MSFT", 1)) in broker.events
+    # The action queued after a failure on the same symbol is skipped
+    assert ("start", "submit", "AMZN", ("AMZN", 2)) not in broker.events
+    assert dispatcher.queued == {}
@@ -0,0 +1,65 @@
+import contextlib
+import io
+import itertools
+import tempfile
+import pytest
+from parameters import START_DATE
+from backtest import run_backtest
+from indicator_cache import IndicatorCache
+from vector_engine import run_vector_backtest
+from price_store import PriceStore, fixture_bars
+
+PARITY_TICKERS = "AAA BBB CCC DDD EEE".split()
+PARITY_PERIODS = 250
+PARITY_SEEDS = (0, 1, 2)
+PARITY_GRID = {
+    "bollinger_period": [10, 20],
+    "bollinger_std": [0.5, 1.5],
+    "atr_period": [7, 14],
+    "atr_multiplier": [1, 2],
+}
+TOLERANCE = 1e-6
+
+
+@pytest.fixture(scope="module", params=PARITY_SEEDS)
+def prices(request):
+    """
+    A yfinance-shaped download of generated bars, read through a temporary
+    price store, and an indicator cache shared by the grid
+    """
+    with tempfile.TemporaryDirectory() as root:
+        store = PriceStore(root)
+        bars = fixture_bars(PARITY_TICKERS, START_DATE, PARITY_PERIODS, request.param)
+        for ticker, df in bars.items():
+            store.write(ticker, df)
+        index = next(iter(bars.values())).index
+        data = store.load_frame(PARITY_TICKERS, index[0], index[-1], update=False)
+    return data, IndicatorCache(data)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        dict(zip(PARITY_GRID, values))
+        for values in itertools.product(*PARITY_GRID.values())
+    ],
+    ids=lambda params: "-".join(str(value) for value in params.values()),
+)
+def test_vector_engine_matches_backtrader(prices, params):
+    data, cache = prices
+    # backtrader computes its indicators from scratch, the vector engine
+    # shares the cache across the grid so both paths are checked
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected_value, expected_trades = run_backtest(
+            data, params, tickers=PARITY_TICKERS, trades=True
+        )
+    value, trades = run_vector_backtest(
+        data, PARITY_TICKERS, cache=cache, trades=True, **params
+    )
+
+    assert expected_trades
+    assert len(trades) == len(expected_trades)
+    for trade, expected in zip(sorted(trades), sorted(expected_trades)):
+        assert trade[:3] == expected[:3]
+        assert trade[3] == pytest.approx(expected[3], abs=TOLERANCE)
+    assert value == pytest.approx(expected_value, abs=TOLERANCE)
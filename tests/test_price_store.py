@@ -0,0 +1,71 @@
+import datetime
+import pytest
+import strat
+from price_store import PriceStore, fixture_bars
+
+
+class Fetcher:
+    """
+    Fetch function serving generated bars, recording the requested ranges
+    """
+
+    def __init__(self, bars: dict, error: Exception = None):
+        self.bars = bars
+        self.error = error
+        self.requests = []
+
+    def __call__(self, symbols, start, end):
+        self.requests.append((tuple(symbols), start, end))
+        if self.error is not None:
+            raise self.error
+        return {
+            symbol: self.bars[symbol].loc[str(start) : str(end)] for symbol in symbols
+        }
+
+
+def test_missing_ranges_are_fetched_once(tmp_path):
+    fetch = Fetcher(fixture_bars(["AAA", "BBB"], "2024-01-01", 60))
+    store = PriceStore(str(tmp_path), fetch=fetch)
+    store.update(["AAA", "BBB"], "2024-01-15", "2024-02-15")
+    store.update(["AAA", "BBB"], "2024-01-01", "2024-02-15")
+
+    assert fetch.requests == [
+        (("AAA", "BBB"), datetime.date(2024, 1, 15), datetime.date(2024, 2, 15)),
+        (("AAA", "BBB"), datetime.date(2024, 1, 1), datetime.date(2024, 1, 14)),
+    ]
+    assert len(store.get_bars("AAA", "2024-01-01", "2024-02-15")) == 34
+
+
+def test_empty_ranges_are_covered(tmp_path):
+    fetch = Fetcher(fixture_bars(["AAA"], "2024-01-01", 10))
+    store = PriceStore(str(tmp_path), fetch=fetch)
+    # A weekend has no bars, it is not requested again
+    store.update(["AAA"], "2024-01-06", "2024-01-07")
+    store.update(["AAA"], "2024-01-06", "2024-01-07")
+
+    assert len(fetch.requests) == 1
+    assert store.missing_ranges("AAA", "2024-01-06", "2024-01-07") == []
+    assert PriceStore(str(tmp_path)).coverage == {"AAA": ["2024-01-06", "2024-01-07"]}
+
+
+def test_failed_fetch_leaves_the_range_uncovered(tmp_path):
+    store = PriceStore(str(tmp_path), fetch=Fetcher({}, IOError("timed out")))
+    with pytest.raises(IOError):
+        store.update(["AAA"], "2024-01-01", "2024-01-31")
+
+    assert store.coverage == {}
+
+
+def test_load_prices_generates_fixture_bars_offline(tmp_path, monkeypatch):
+    monkeypatch.setattr(strat, "PRICE_STORE_FIXTURE", True)
+    monkeypatch.setattr(strat, "PRICE_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(strat, "fetch_yfinance", None)
+
+    data = strat.load_prices(["AAA", "BBB"], "2024-01-01", datetime.date(2024, 3, 29))
+
+    assert list(data["Close"].columns) == ["AAA", "BBB"]
+    assert len(data) == 65
+    assert not data.isna().any().any()
+    # Generated once, later runs read the fixture store
+    again = strat.load_prices(["AAA", "BBB"], "2024-01-01", datetime.date(2024, 3, 29))
+    assert again.equals(data)
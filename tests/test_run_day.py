@@ -0,0 +1,18 @@
+import config
+from fake_alpaca import synthetic_day
+from run_day import run_day
+
+
+def test_repeated_runs_take_about_the_same_time(monkeypatch):
+    # run_day replaces the clients, they are restored after the test
+    monkeypatch.setattr(config, "_trade_client", None)
+    monkeypatch.setattr(config, "_data_client", None)
+    day = synthetic_day(config.STOCKS, seed=0)
+
+    runs = [run_day(day) for _ in range(3)]
+
+    first = runs[0]["wall_ms"]
+    assert all(run["orders"] == runs[0]["orders"] for run in runs)
+    # No run waits on the rate limit tokens spent by the runs before it
+    assert all(run["wall_ms"] < 3 * first + 200 for run in runs[1:])
+    assert all(run["counters"].get("scheduler_wait_ms", 0) < 100 for run in runs)
@@ -0,0 +1,132 @@
+import logging
+import threading
+import pytest
+import slack_logger
+from fakes import FakeSlackClient, SlackError
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """
+    Record retry delays instead of sleeping
+    """
+    delays = []
+    monkeypatch.setattr(slack_logger.time, "sleep", delays.append)
+    return delays
+
+
+def make_logger(client) -> tuple:
+    handler = slack_logger.get_slack_handler(client=client)
+    logger = logging.getLogger(f"test-slack-{id(handler)}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    return logger, handler
+
+
+def test_records_are_batched_into_chunks_in_order():
+    client = FakeSlackClient()
+    logger, handler = make_logger(client)
+    records = [f"record {i:04d} " + "x" * 90 for i in range(200)]
+    for record in records:
+        logger.info(record)
+
+    assert handler.send_logs_to_slack(timeout=5)
+    assert len(client.messages) > 1
+    assert all(
+        len(message) <= slack_logger.SLACK_CHUNK_SIZE for message in client.messages
+    )
+    assert "\n".join(client.messages).split("\n") == records
+    assert client.files == []
+
+
+def test_record_longer_than_a_chunk_is_uploaded_as_a_file():
+    client = FakeSlackClient()
+    logger, handler = make_logger(client)
+    long_record = "y" * (slack_logger.SLACK_CHUNK_SIZE + 1)
+    logger.info("before")
+    logger.info(long_record)
+    logger.info("after")
+
+    assert handler.send_logs_to_slack(timeout=5)
+    # Records before the upload are sent first, so the order is kept
+    assert client.messages == ["before", "after"]
+    assert client.files == [long_record]
+
+
+def test_rate_limit_waits_for_retry_after(sleeps):
+    client = FakeSlackClient(errors=[SlackError(429, headers={"Retry-After": "7"})])
+    handler = slack_logger.get_slack_handler(client=client)
+
+    handler.call_with_retry("chat_postMessage", channel="c", text="hello")
+
+    assert sleeps == [7.0]
+    assert client.messages == ["hello"]
+
+
+def test_server_errors_are_retried_with_backoff(sleeps):
+    client = FakeSlackClient(errors=[SlackError(503), SlackError(500)])
+    handler = slack_logger.get_slack_handler(client=client)
+
+    handler.call_with_retry("chat_postMessage", channel="c", text="hello")
+
+    delay = slack_logger.SLACK_RETRY_DELAY
+    assert sleeps == [delay, 2 * delay]
+    assert client.messages == ["hello"]
+
+
+def test_client_errors_are_not_retried(sleeps):
+    # No "error" field in the body, the worker must not crash on it
+    client = FakeSlackClient(errors=[SlackError(400)])
+    handler = slack_logger.get_slack_handler(client=client)
+
+    assert handler.call_with_retry("chat_postMessage", channel="c", text="x") is None
+    assert sleeps == []
+    assert client.calls == 1
+
+
+def test_retries_give_up_after_max_retries(sleeps):
+    errors = [ConnectionError("down")] * (slack_logger.SLACK_MAX_RETRIES + 1)
+    client = FakeSlackClient(errors=errors)
+    handler = slack_logger.get_slack_handler(client=client)
+
+    assert handler.call_with_retry("chat_postMessage", channel="c", text="x") is None
+    assert client.calls == slack_logger.SLACK_MAX_RETRIES + 1
+    assert client.messages == []
+
+
+def test_flush_returns_false_when_delivery_stalls():
+    client = FakeSlackClient(latency=0.5)
+    logger, handler = make_logger(client)
+    logger.info("slow")
+
+    assert handler.send_logs_to_slack(timeout=0.05) is False
+    # What is left is still delivered in the background
+    assert handler.send_logs_to_slack(timeout=5)
+    assert client.messages == ["slow"]
+
+
+def test_slack_sdk_records_are_not_queued():
+    client = FakeSlackClient()
+    handler = slack_logger.get_slack_handler(client=client)
+    slack_sdk_logger = logging.getLogger("slack_sdk.web.base_client")
+    slack_sdk_logger.addHandler(handler)
+    try:
+        slack_sdk_logger.warning("Received a response in a non-JSON format")
+    finally:
+        slack_sdk_logger.removeHandler(handler)
+
+    assert handler.worker is None
+    assert handler.queue.empty()
+
+
+def test_worker_survives_a_failed_delivery():
+    client = FakeSlackClient(errors=[SlackError(404)])
+    logger, handler = make_logger(client)
+    logger.info("lost")
+    assert handler.send_logs_to_slack(timeout=5)
+    logger.info("delivered")
+
+    assert handler.send_logs_to_slack(timeout=5)
+    assert client.messages == ["delivered"]
+    assert isinstance(handler.worker, threading.Thread) and handler.worker.is_alive()
@@ -0,0 +1,182 @@
+import asyncio
+import datetime
+import threading
+import pandas as pd
+import pytest
+from alpaca.data.timeframe import TimeFrame
+from pytz import timezone
+import indicators
+import strategy
+import streaming
+import util
+from config import RSI_PERIOD
+from fakes import ReplayStream
+
+DAYS = 40
+
+
+def daily_bars(symbol: str) -> pd.DataFrame:
+    """
+    Completed daily bars before today, closes alternating up and down so the
+    RSI starts in the neutral zone
+    """
+    today = datetime.datetime.now(timezone("US/Eastern")).date()
+    days = pd.bdate_range(end=today - datetime.timedelta(days=1), periods=DAYS)
+    closes = [100 + (i % 2) for i in range(DAYS)]
+    return pd.DataFrame(
+        {
+            "open": closes,
+            "high": [close + 0.5 for close in closes],
+            "low": [close - 0.5 for close in closes],
+            "close": closes,
+            "volume": 1000,
+        },
+        index=pd.MultiIndex.from_tuples(
+            [
+                (symbol, pd.Timestamp(day, tz="US/Eastern").tz_convert("UTC"))
+                for day in days
+            ],
+            names=["symbol", "timestamp"],
+        ),
+    ).astype(float)
+
+
+def minute_bars(moves: dict, minutes: int = 120) -> pd.DataFrame:
+    """
+    Today's minute bars, each stock's price moving by a fixed step per minute
+    """
+    today = datetime.datetime.now(timezone("US/Eastern")).date()
+    start = pd.Timestamp(f"{today} 09:30", tz="US/Eastern")
+    rows = []
+    for symbol, step in moves.items():
+        price = 100.0
+        for minute in range(minutes):
+            price += step
+            timestamp = (start + pd.Timedelta(minutes=minute)).tz_convert("UTC")
+            rows.append((symbol, timestamp, price, price + 0.05, price - 0.05, price))
+    frame = pd.DataFrame(
+        rows, columns=["symbol", "timestamp", "open", "high", "low", "close"]
+    )
+    frame["volume"] = 10.0
+    return frame.set_index(["symbol", "timestamp"])
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """
+    Serve seeded daily bars from the bar cache and record strategy calls
+    instead of trading
+    """
+    bars = {symbol: daily_bars(symbol) for symbol in ("AMZN", "BAC", "MSFT")}
+    for symbol, frame in bars.items():
+        monkeypatch.setitem(
+            util._bar_cache, (symbol, TimeFrame.Day.value), (100, frame)
+        )
+    monkeypatch.setattr(util, "load_bars", lambda symbols, days: None)
+    monkeypatch.setattr(util, "get_bars", lambda symbol, days: bars[symbol])
+    recorded = []
+    for name in ("sell_stocks", "buy_stocks", "place_trailing_stop"):
+        monkeypatch.setattr(
+            strategy,
+            name,
+            lambda symbols, name=name, **kwargs: recorded.append((name, symbols)),
+        )
+    return recorded
+
+
+def test_crossings_run_the_strategy_for_the_stock(calls):
+    bars = minute_bars({"AMZN": -0.1, "BAC": 0.1, "MSFT": 0.0})
+    stream = streaming.SignalStream(
+        ReplayStream.from_frame(bars), ["AMZN", "BAC", "MSFT"]
+    )
+
+    stream.run()
+
+    assert stream.states["AMZN"].zone == streaming.ZONE_LOWER
+    assert stream.states["BAC"].zone == streaming.ZONE_UPPER
+    assert stream.states["MSFT"].zone == streaming.ZONE_NEUTRAL
+    assert sorted(calls) == [
+        ("buy_stocks", ["AMZN"]),
+        ("place_trailing_stop", ["AMZN"]),
+        ("sell_stocks", ["BAC"]),
+    ]
+    # The trailing stop is placed on the bar after the buy, once
+    assert calls.index(("buy_stocks", ["AMZN"])) < calls.index(
+        ("place_trailing_stop", ["AMZN"])
+    )
+    assert stream.trailing_stop_pending == set()
+
+
+def test_zones_follow_the_rsi_of_the_forming_bar(calls):
+    bars = minute_bars({"AMZN": -0.1})
+    stream = streaming.SignalStream(ReplayStream([]), ["AMZN"])
+    stream.seed()
+    closes = list(daily_bars("AMZN")["close"])
+    state = stream.states["AMZN"]
+
+    async def replay():
+        crossings = []
+        for bar in ReplayStream.from_frame(bars).bars:
+            zone = state.zone
+            await stream.on_bar(bar)
+            rsi = indicators.rsi(pd.Series(closes + [bar.close]), RSI_PERIOD).iloc[-1]
+            assert state.current_rsi() == pytest.approx(rsi)
+            assert state.zone == streaming.rsi_zone(rsi)
+            if state.zone != zone:
+                crossings.append((zone, state.zone))
+                # The position is not known yet, the stop waits for the next bar
+                assert stream.trailing_stop_pending == {"AMZN"}
+        await stream.drain()
+        return crossings
+
+    assert asyncio.run(replay()) == [(streaming.ZONE_NEUTRAL, streaming.ZONE_LOWER)]
+    assert calls == [("buy_stocks", ["AMZN"]), ("place_trailing_stop", ["AMZN"])]
+    assert stream.trailing_stop_pending == set()
+
+
+def test_fill_tracking_replaces_the_pending_trailing_stop(calls):
+    class Fills:
+        order_book = object()
+        read = 0
+
+        def __init__(self):
+            self.locks = {}
+
+        def positions(self):
+            self.read += 1
+            return []
+
+    fills = Fills()
+    stream = streaming.SignalStream(ReplayStream([]), ["AMZN", "BAC"], fills=fills)
+    stream.seed()
+    bars = ReplayStream.from_frame(minute_bars({"AMZN": -0.1, "BAC": 0.1}))
+
+    async def replay():
+        for bar in sorted(bars.bars, key=lambda bar: bar.timestamp):
+            await stream.on_bar(bar)
+        await stream.drain()
+
+    asyncio.run(replay())
+
+    assert sorted(calls) == [("buy_stocks", ["AMZN"]), ("sell_stocks", ["BAC"])]
+    assert stream.trailing_stop_pending == set()
+    # Positions are read from the tracker when the sell starts
+    assert fills.read == 1
+
+
+def test_blocking_strategy_call_does_not_stall_other_stocks(calls, monkeypatch):
+    bought = threading.Event()
+    sold = []
+
+    def sell_stocks(symbols, **kwargs):
+        # Only returns early if AMZN bars keep being processed meanwhile
+        sold.append(bought.wait(timeout=5))
+
+    monkeypatch.setattr(strategy, "sell_stocks", sell_stocks)
+    monkeypatch.setattr(strategy, "buy_stocks", lambda symbols: bought.set())
+    bars = minute_bars({"BAC": 0.2, "AMZN": -0.1})
+    stream = streaming.SignalStream(ReplayStream.from_frame(bars), ["AMZN", "BAC"])
+
+    stream.run()
+
+    assert sold == [True]
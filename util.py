@@ -1,5 +1,6 @@
 import datetime
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from alpaca.data.requests import (
     StockBarsRequest,
 )
@@ -7,97 +8,424 @@ from alpaca.trading.requests import (
     OrderRequest,
 )
 import pandas as pd
+from pytz import timezone
 from alpaca.data.timeframe import TimeFrame
 from alpaca.common.exceptions import APIError
+import indicators
+import indicator_state
+from price_store import PriceStore
 from config import (
-    trade_client,
-    data_client,
+    get_trade_client,
+    get_data_client,
     RSI_PERIOD,
     DATA_RETRIEVAL_PERIOD,
     ATR_PERIOD,
+    BOLLINGER_PERIOD,
+    BOLLINGER_STD,
+    BARS_CHUNK_SIZE,
+    BARS_WORKERS,
+    PRICE_STORE_DIR,
+    INDICATOR_STATE_URI,
+    INDICATOR_STATE_MAX_AGE_DAYS,
 )
 
 logger = logging.getLogger()
 
+# Run-scoped bar cache: (symbol, timeframe) -> (window in days, bars).
+# Only the widest window fetched is kept, smaller windows are served as slices of it.
+_bar_cache = {}
+_price_store = None
+# Run-scoped rolling indicator state of daily bars: symbol -> IndicatorState.
+# The previous run's snapshot is loaded once per run, only when a state store is
+# configured.
+_indicator_state = {}
+_state_snapshot = None
+_state_store = None
+
 
 def calculate_atr_percentage(symbol: str) -> float:
     """
     Calculate the Average True Range (ATR) for a given stock
     """
-    data = get_historical_data(
-        symbol,
-        datetime.datetime.now()
-        - datetime.timedelta(days=ATR_PERIOD + DATA_RETRIEVAL_PERIOD),
+    current = get_indicator_state(symbol)
+    if current is not None:
+        state, bar = current
+        if bar is None:
+            return state.atr.value() / state.atr.last_close * 100
+        return (
+            state.atr.value(bar["high"], bar["low"], bar["close"]) / bar["close"] * 100
+        )
+    data = get_bars(symbol, ATR_PERIOD + DATA_RETRIEVAL_PERIOD)
+    atr_percentage = indicators.atr_percentage(
+        data["high"], data["low"], data["close"], ATR_PERIOD
     )
-    tr = pd.DataFrame()
-    tr["h-l"] = data["high"] - data["low"]
-    tr["h-pc"] = abs(data["high"] - data["close"].shift())
-    tr["l-pc"] = abs(data["low"] - data["close"].shift())
-    tr["tr"] = tr[["h-l", "h-pc", "l-pc"]].max(axis=1)
-    atr = tr["tr"].rolling(window=ATR_PERIOD).mean()
-    latest_atr = atr.iloc[-1]
-    latest_close = data["close"].iloc[-1]
-    atr_percentage = (latest_atr / latest_close) * 100
-    return atr_percentage
+    return atr_percentage.iloc[-1]
 
 
 def calculate_rsi(symbol: str) -> float:
     """
     Calculate the Relative Strength Index (RSI) for a given stock
     """
-    data = get_historical_data(
-        symbol,
-        datetime.datetime.now()
-        - datetime.timedelta(days=RSI_PERIOD + DATA_RETRIEVAL_PERIOD),
-    )
-    delta = data["close"].diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
+    current = get_indicator_state(symbol)
+    if current is not None:
+        state, bar = current
+        return state.rsi.value(None if bar is None else bar["close"])
+    data = get_bars(symbol, RSI_PERIOD + DATA_RETRIEVAL_PERIOD)
+    rsi = indicators.rsi(data["close"], RSI_PERIOD)
+    return rsi.iloc[-1]
 
-    avg_gain = gain.rolling(window=RSI_PERIOD).mean()
-    avg_loss = loss.rolling(window=RSI_PERIOD).mean()
 
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi.iloc[-1]
+def calculate_indicators(symbols: list) -> pd.DataFrame:
+    """
+    Calculate the latest RSI, ATR percentage and Bollinger Bands for many stocks at
+    once.
+    Returns one row per stock.
+    """
+    days = max(RSI_PERIOD, ATR_PERIOD, BOLLINGER_PERIOD) + DATA_RETRIEVAL_PERIOD
+    load_bars(symbols, days)
+    panel = indicators.bars_to_panel(
+        {
+            symbol: get_bars(symbol, days)
+            for symbol in dict.fromkeys(symbols)
+            if (symbol, TimeFrame.Day.value) in _bar_cache
+        }
+    )
+    if panel["close"].empty:
+        return pd.DataFrame()
+    return indicators.latest_values(
+        indicators.compute_indicators(
+            panel["high"],
+            panel["low"],
+            panel["close"],
+            rsi_period=RSI_PERIOD,
+            atr_period=ATR_PERIOD,
+            bollinger_period=BOLLINGER_PERIOD,
+            bollinger_std=BOLLINGER_STD,
+        ),
+        panel["close"],
+    )
 
 
 def get_historical_data(
     symbol: str,
     start_date: datetime.datetime,
-    end_date: datetime.datetime = datetime.datetime.now()
-    - datetime.timedelta(minutes=20),
+    end_date: datetime.datetime = None,
+    timeframe: TimeFrame = TimeFrame.Day,
 ):
     """
     Get historical data for a given stock
     """
+    if end_date is None:
+        end_date = datetime.datetime.now() - datetime.timedelta(minutes=20)
     request_params = StockBarsRequest(
         symbol_or_symbols=symbol,
-        timeframe=TimeFrame.Day,
+        timeframe=timeframe,
         start=start_date,
         end=end_date,
     )
-    bars = data_client.get_stock_bars(request_params)
+    bars = get_data_client().get_stock_bars(request_params)
     return bars.df
 
 
+def get_historical_data_bulk(
+    symbols: list,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime = None,
+    timeframe: TimeFrame = TimeFrame.Day,
+) -> dict:
+    """
+    Get historical data for many stocks, one request per chunk of symbols,
+    with up to BARS_WORKERS requests in flight
+    """
+    if end_date is None:
+        end_date = datetime.datetime.now() - datetime.timedelta(minutes=20)
+    symbols = list(dict.fromkeys(symbols))
+
+    def get_chunk(chunk: list) -> pd.DataFrame:
+        request_params = StockBarsRequest(
+            symbol_or_symbols=chunk,
+            timeframe=timeframe,
+            start=start_date,
+            end=end_date,
+        )
+        return get_data_client().get_stock_bars(request_params).df
+
+    chunks = [
+        symbols[i : i + BARS_CHUNK_SIZE]
+        for i in range(0, len(symbols), BARS_CHUNK_SIZE)
+    ]
+    if len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=BARS_WORKERS) as executor:
+            frames = list(executor.map(get_chunk, chunks))
+    else:
+        frames = [get_chunk(chunk) for chunk in chunks]
+    data = {}
+    for df in frames:
+        if df.empty:
+            continue
+        for symbol, symbol_df in df.groupby(level="symbol"):
+            data[symbol] = symbol_df
+    return data
+
+
+def get_price_store():
+    """
+    Get the local daily bar store, or None if PRICE_STORE_DIR is not configured
+    """
+    global _price_store
+    if _price_store is None and PRICE_STORE_DIR:
+        _price_store = PriceStore(PRICE_STORE_DIR, fetch=fetch_completed_daily_bars)
+    return _price_store
+
+
+def fetch_completed_daily_bars(
+    symbols: list, start: datetime.date, end: datetime.date
+) -> dict:
+    """
+    Fetch daily bars between start and end (inclusive) for the price store
+    """
+    data = get_historical_data_bulk(
+        symbols,
+        datetime.datetime.combine(start, datetime.time()),
+        datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time()),
+    )
+    return {
+        symbol: df.droplevel("symbol").tz_convert("US/Eastern")
+        for symbol, df in data.items()
+    }
+
+
+def get_daily_data_from_store(symbols: list, start_date: datetime.datetime) -> dict:
+    """
+    Get daily bars for many stocks: completed sessions come from the price store,
+    which only requests ranges it has not stored yet, and today's bar is always fetched
+    """
+    store = get_price_store()
+    today = datetime.datetime.now(timezone("US/Eastern")).date()
+    store.update(symbols, start_date, today - datetime.timedelta(days=1))
+    recent = get_historical_data_bulk(
+        symbols, datetime.datetime.combine(today, datetime.time())
+    )
+    data = {}
+    for symbol in dict.fromkeys(symbols):
+        history = store.get_bars(symbol, start_date, today - datetime.timedelta(days=1))
+        history.index = pd.MultiIndex.from_arrays(
+            [
+                [symbol] * len(history),
+                history.index.tz_localize("US/Eastern").tz_convert("UTC"),
+            ],
+            names=["symbol", "timestamp"],
+        )
+        if symbol in recent:
+            history = pd.concat([history, recent[symbol][history.columns]])
+        if not history.empty:
+            data[symbol] = history
+    return data
+
+
+def get_state_store():
+    """
+    Get the indicator state store, or None if INDICATOR_STATE_URI is not configured
+    """
+    global _state_store
+    if _state_store is None and INDICATOR_STATE_URI:
+        _state_store = indicator_state.open_state_store(INDICATOR_STATE_URI)
+    return _state_store
+
+
+def load_state_snapshot() -> dict:
+    """
+    Get the indicator states saved by the previous run that are not stale
+    """
+    global _state_snapshot
+    if _state_snapshot is None:
+        today = datetime.datetime.now(timezone("US/Eastern")).date()
+        try:
+            snapshot = get_state_store().load()
+        except Exception as e:
+            logger.info(f"Could not load the indicator state: {e}")
+            snapshot = None
+        _state_snapshot = indicator_state.load_snapshot(
+            snapshot,
+            RSI_PERIOD,
+            ATR_PERIOD,
+            oldest=today - datetime.timedelta(days=INDICATOR_STATE_MAX_AGE_DAYS),
+        )
+    return _state_snapshot
+
+
+def load_bars_from_state(symbols: list, days: int) -> list:
+    """
+    Load bars of stocks with a saved indicator state covering `days` days,
+    fetching only the bars after the state. Returns the stocks that were not loaded.
+    """
+    today = datetime.datetime.now(timezone("US/Eastern")).date()
+    snapshot = load_state_snapshot()
+    by_date = {}
+    for symbol in symbols:
+        state = snapshot.get(symbol)
+        if state is not None and state.window >= days:
+            by_date.setdefault(state.date, []).append(symbol)
+    loaded = set()
+    for date, date_symbols in by_date.items():
+        recent = get_historical_data_bulk(
+            date_symbols,
+            datetime.datetime.combine(
+                date + datetime.timedelta(days=1), datetime.time()
+            ),
+        )
+        for symbol in date_symbols:
+            state = snapshot[symbol]
+            bars = recent.get(symbol)
+            state.advance(bars, today)
+            if bars is not None:
+                dates = indicator_state.session_dates(
+                    bars.index.get_level_values("timestamp")
+                )
+                forming = bars[dates >= today][state.bars.columns]
+                bars = (
+                    pd.concat([state.bars, forming])
+                    if not forming.empty
+                    else state.bars
+                )
+            else:
+                bars = state.bars
+            _bar_cache[(symbol, TimeFrame.Day.value)] = (state.window, bars)
+            _indicator_state[symbol] = state
+            loaded.add(symbol)
+    if loaded:
+        logger.info(
+            f"Loaded bars after the saved indicator state for {len(loaded)} stocks"
+        )
+    return [symbol for symbol in symbols if symbol not in loaded]
+
+
+def get_indicator_state(symbol: str):
+    """
+    Get the rolling indicator state of a stock and its forming bar (None before
+    the first bar of the day), or None if the cached bars are not covered by a state
+    """
+    state = _indicator_state.get(symbol)
+    _, data = _bar_cache.get((symbol, TimeFrame.Day.value), (0, None))
+    if state is None or data is None:
+        return None
+    dates = indicator_state.session_dates(data.index.get_level_values("timestamp"))
+    after = data[dates > state.date]
+    today = datetime.datetime.now(timezone("US/Eastern")).date()
+    if len(after) > 1 or (len(after) == 1 and dates[-1] < today):
+        return None
+    return state, (after.iloc[-1] if len(after) else None)
+
+
+def save_indicator_state():
+    """
+    Save the indicator state of every stock loaded this run, plus the still
+    fresh states of the previous run, for the next run
+    """
+    store = get_state_store()
+    if store is None or not _indicator_state:
+        return
+    states = {**load_state_snapshot(), **_indicator_state}
+    store.save(indicator_state.dump_snapshot(states, RSI_PERIOD, ATR_PERIOD))
+    logger.info(f"Saved the indicator state of {len(states)} stocks")
+
+
+def load_bars(symbols: list, days: int = None, timeframe: TimeFrame = TimeFrame.Day):
+    """
+    Load bars for all given stocks into the bar cache in bulk.
+    Only stocks without a cached window of at least `days` days are requested.
+    """
+    if days is None:
+        days = max(RSI_PERIOD, ATR_PERIOD) + DATA_RETRIEVAL_PERIOD
+    missing = [
+        symbol
+        for symbol in dict.fromkeys(symbols)
+        if _bar_cache.get((symbol, timeframe.value), (0, None))[0] < days
+    ]
+    is_daily = timeframe.value == TimeFrame.Day.value
+    if missing and is_daily and get_state_store() is not None:
+        missing = load_bars_from_state(missing, days)
+    if not missing:
+        return
+    start_date = datetime.datetime.now() - datetime.timedelta(days=days)
+    if is_daily and get_price_store() is not None:
+        data = get_daily_data_from_store(missing, start_date)
+    else:
+        data = get_historical_data_bulk(missing, start_date, timeframe=timeframe)
+    today = datetime.datetime.now(timezone("US/Eastern")).date()
+    for symbol, symbol_df in data.items():
+        _bar_cache[(symbol, timeframe.value)] = (days, symbol_df)
+        if is_daily and get_state_store() is not None:
+            state = indicator_state.IndicatorState(symbol, days, RSI_PERIOD, ATR_PERIOD)
+            state.advance(symbol_df, today)
+            _indicator_state[symbol] = state
+    logger.info(f"Loaded bars for {len(data)}/{len(missing)} stocks")
+
+
+def get_bars(
+    symbol: str, days: int, timeframe: TimeFrame = TimeFrame.Day
+) -> pd.DataFrame:
+    """
+    Get the last `days` days of bars for a given stock, served from the bar cache
+    when possible
+    """
+    start_date = datetime.datetime.now() - datetime.timedelta(days=days)
+    window, data = _bar_cache.get((symbol, timeframe.value), (0, None))
+    if window < days:
+        data = get_historical_data(symbol, start_date, timeframe=timeframe)
+        _bar_cache[(symbol, timeframe.value)] = (days, data)
+        return data
+    # Cached bars are sorted by time, so the window is a positional slice
+    timestamps = data.index.get_level_values("timestamp").as_unit("ns")
+    start = pd.Timestamp(start_date, tz="UTC").as_unit("ns")
+    return data.iloc[timestamps.searchsorted(start) :]
+
+
+def update_cached_bar(symbol: str, timestamp: pd.Timestamp, bar: dict):
+    """
+    Insert or replace one daily bar of a cached stock, so streamed prices are
+    used without refetching. Stocks without cached bars are ignored.
+    """
+    key = (symbol, TimeFrame.Day.value)
+    window, data = _bar_cache.get(key, (0, None))
+    if data is None:
+        return
+    data = data.drop((symbol, timestamp), errors="ignore")
+    row = pd.DataFrame(
+        [bar],
+        index=pd.MultiIndex.from_tuples(
+            [(symbol, timestamp)], names=["symbol", "timestamp"]
+        ),
+    )
+    _bar_cache[key] = (window, pd.concat([data, row]).sort_index())
+
+
+def clear_bar_cache():
+    """
+    Invalidate all cached bars and indicator state, called at the end of every run
+    """
+    global _state_snapshot
+    _bar_cache.clear()
+    _indicator_state.clear()
+    _state_snapshot = None
+
+
 def get_current_price(symbol: str) -> float:
     """
     Get the current price of a stock
     """
-    data = get_historical_data(
-        symbol,
-        datetime.datetime.now() - datetime.timedelta(days=1),
-    )
+    _, data = _bar_cache.get((symbol, TimeFrame.Day.value), (0, None))
+    if data is None:
+        data = get_bars(symbol, 1)
     return data["close"].iloc[-1]
 
 
 def submit_order(order: OrderRequest):
     """
-    Submit an order
+    Submit an order, returns None if pattern day trading protection blocked it
     """
     try:
-        trade_client.submit_order(order_data=order)
+        return get_trade_client().submit_order(order_data=order)
     except APIError as e:
         if "pattern day trading" in str(e).lower():
             logger.info(f"Pattern day trading protection triggered for {order.symbol}")